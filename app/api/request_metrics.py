@@ -0,0 +1,199 @@
+import asyncio
+import logging
+import os
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
+from app.db.query_metrics import N_PLUS_ONE_THRESHOLD, RequestStats, current_request
+
+# per-route request timing: latency and SQL statement histograms for /metrics, and a
+# Server-Timing header splitting each response into database time and everything else.
+# Routes are labelled with their path template, so ids in URLs do not create new series.
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+STATEMENT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+LOOP_LAG_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+LOOP_LAG_INTERVAL = float(os.getenv("LOOP_LAG_INTERVAL", "0.5"))
+
+logger = logging.getLogger(__name__)
+
+RouteKey = Tuple[str, str]
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.total = 0
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        self.total += 1
+        self.sum += value
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+
+    def render(self, name: str, labels: str) -> list:
+        sep = "," if labels else ""
+        lines = [f'{name}_bucket{{{labels}{sep}le="{bound}"}} {count}' for bound, count in zip(self.buckets, self.counts)]
+        lines.append(f'{name}_bucket{{{labels}{sep}le="+Inf"}} {self.total}')
+        suffix = f"{{{labels}}}" if labels else ""
+        lines.append(f"{name}_sum{suffix} {self.sum}")
+        lines.append(f"{name}_count{suffix} {self.total}")
+        return lines
+
+
+class RouteMetrics:
+    def __init__(self):
+        self.latency = Histogram(LATENCY_BUCKETS)
+        self.statements = Histogram(STATEMENT_BUCKETS)
+        self.db_seconds = 0.0
+        self.statuses: Dict[int, int] = {}
+        self.n_plus_one = 0
+
+
+class RequestMetrics:
+    def __init__(self):
+        self.routes: Dict[RouteKey, RouteMetrics] = {}
+        self.loop_lag = Histogram(LOOP_LAG_BUCKETS)
+        self._lock = threading.Lock()
+
+    def record(self, key: RouteKey, status: int, seconds: float, stats: RequestStats, n_plus_one: bool) -> None:
+        with self._lock:
+            route = self.routes.get(key)
+            if route is None:
+                route = self.routes[key] = RouteMetrics()
+            route.latency.observe(seconds)
+            route.statements.observe(stats.statements)
+            route.db_seconds += stats.db_seconds
+            route.statuses[status] = route.statuses.get(status, 0) + 1
+            if n_plus_one:
+                route.n_plus_one += 1
+
+    def record_loop_lag(self, seconds: float) -> None:
+        with self._lock:
+            self.loop_lag.observe(seconds)
+
+
+request_metrics = RequestMetrics()
+
+
+def _route_template(scope) -> str:
+    route = scope.get("route")
+    return getattr(route, "path", None) or "unmatched"
+
+
+class RequestMetricsMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestStats()
+        token = current_request.set(stats)
+        started = time.perf_counter()
+        status = 500
+
+        async def send_with_timing(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                total_ms = (time.perf_counter() - started) * 1000
+                db_ms = stats.db_seconds * 1000
+                timing = f'db;dur={db_ms:.1f};desc="{stats.statements} statements", app;dur={total_ms - db_ms:.1f}'
+                message["headers"] = list(message.get("headers", [])) + [(b"server-timing", timing.encode())]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            current_request.reset(token)
+            seconds = time.perf_counter() - started
+            key = (scope["method"], _route_template(scope))
+            repeated = stats.repeated_statements()
+            for statement, count in repeated:
+                logger.warning("possible N+1: %s %s ran the same statement %d times: %s",
+                               key[0], key[1], count, statement)
+            request_metrics.record(key, status, seconds, stats, bool(repeated))
+
+
+# how late the event loop wakes up a sleeping task; long blocking calls show up here
+class LoopLagMonitor:
+    def __init__(self, interval: float = LOOP_LAG_INTERVAL):
+        self.interval = interval
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            expected = loop.time() + self.interval
+            await asyncio.sleep(self.interval)
+            request_metrics.record_loop_lag(max(loop.time() - expected, 0.0))
+
+
+loop_lag_monitor = LoopLagMonitor()
+
+
+def _labels(key: RouteKey) -> str:
+    method, route = key
+    return f'method="{method}",route="{route}"'
+
+
+def render_request_metrics() -> str:
+    m = request_metrics
+    lines = []
+    with m._lock:
+        routes = sorted(m.routes.items())
+        lines += [
+            "# HELP http_requests_total Requests served, by route template and status.",
+            "# TYPE http_requests_total counter",
+        ]
+        for key, route in routes:
+            lines += [f'http_requests_total{{{_labels(key)},status="{status}"}} {count}'
+                      for status, count in sorted(route.statuses.items())]
+        lines += [
+            "# HELP http_request_duration_seconds Time from receiving a request to the end of its response.",
+            "# TYPE http_request_duration_seconds histogram",
+        ]
+        for key, route in routes:
+            lines += route.latency.render("http_request_duration_seconds", _labels(key))
+        lines += [
+            "# HELP http_request_db_statements SQL statements executed per request.",
+            "# TYPE http_request_db_statements histogram",
+        ]
+        for key, route in routes:
+            lines += route.statements.render("http_request_db_statements", _labels(key))
+        lines += [
+            "# HELP http_request_db_seconds_total Time spent in SQL statements while serving requests.",
+            "# TYPE http_request_db_seconds_total counter",
+        ]
+        lines += [f"http_request_db_seconds_total{{{_labels(key)}}} {route.db_seconds}" for key, route in routes]
+        lines += [
+            f"# HELP http_n_plus_one_total Requests that ran one statement at least {N_PLUS_ONE_THRESHOLD} times.",
+            "# TYPE http_n_plus_one_total counter",
+        ]
+        lines += [f"http_n_plus_one_total{{{_labels(key)}}} {route.n_plus_one}" for key, route in routes]
+        lines += [
+            "# HELP event_loop_lag_seconds How late the event loop resumed a task sleeping for LOOP_LAG_INTERVAL.",
+            "# TYPE event_loop_lag_seconds histogram",
+        ]
+        lines += m.loop_lag.render("event_loop_lag_seconds", "")
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,39 @@
+from functools import lru_cache
+from typing import Iterable, List, Mapping, Optional, Type
+
+from fastapi.responses import Response
+from pydantic import BaseModel, TypeAdapter
+from sqlalchemy import Row, RowMapping
+
+# list responses in one pass: the rows (ORM objects, Row tuples or mappings) are validated
+# by a TypeAdapter over the whole list and written straight to JSON bytes by pydantic-core.
+# With response_model alone FastAPI validates the rows, dumps them back to dicts and then
+# JSON-encodes the dicts. Routes keep response_model for the OpenAPI schema; returning a
+# Response skips FastAPI's own pass. Other routes render through ORJSONResponse (see main.py).
+
+
+@lru_cache(maxsize=None)
+def list_adapter(model: Type[BaseModel]) -> TypeAdapter:
+    return TypeAdapter(List[model])
+
+
+# pydantic reads Row / RowMapping several times slower than a dict, through attribute lookups
+def _plain(row):
+    if isinstance(row, Row):
+        return row._asdict()
+    if isinstance(row, RowMapping):
+        return dict(row)
+    return row
+
+
+def dump_list(model: Type[BaseModel], rows: Iterable) -> bytes:
+    adapter = list_adapter(model)
+    return adapter.dump_json(adapter.validate_python([_plain(row) for row in rows], from_attributes=True))
+
+
+class ModelListResponse(Response):
+    media_type = "application/json"
+
+    def __init__(self, model: Type[BaseModel], rows: Iterable, status_code: int = 200,
+                 headers: Optional[Mapping[str, str]] = None):
+        super().__init__(dump_list(model, rows), status_code, headers)
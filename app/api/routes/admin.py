@@ -0,0 +1,58 @@
+import os
+import secrets
+from typing import Optional
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
+from app.services import bulk_io
+
+router = APIRouter()
+
+# the admin routes are off unless BULK_ADMIN_TOKEN is set; callers send it in X-Admin-Token
+BULK_ADMIN_TOKEN = os.getenv("BULK_ADMIN_TOKEN")
+
+MEDIA_TYPES = {"ndjson": "application/x-ndjson", "csv": "text/csv"}
+
+
+def require_admin(x_admin_token: Optional[str] = Header(None)):
+    if not BULK_ADMIN_TOKEN:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if not x_admin_token or not secrets.compare_digest(x_admin_token, BULK_ADMIN_TOKEN):
+        raise HTTPException(status_code=403, detail="Invalid admin token.")
+
+
+def _check(table: str, format: str):
+    try:
+        bulk_io.get_table(table)
+        bulk_io.check_format(format)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+# the whole table as NDJSON or CSV, streamed while it is read
+@router.get("/admin/export/{table}", dependencies=[Depends(require_admin)])
+async def export_table(table: str, format: str = "ndjson"):
+    _check(table, format)
+    return StreamingResponse(
+        bulk_io.export_table(table, format),
+        media_type=MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="{table}.{format}"'},
+    )
+
+
+# the request body is read as it arrives and inserted batch by batch; the report lists the
+# batches that failed. To resume an interrupted upload, send the same file again with
+# skip set to the `records` of the last report
+@router.post("/admin/import/{table}", dependencies=[Depends(require_admin)])
+async def import_table(
+    table: str,
+    request: Request,
+    format: str = "ndjson",
+    skip: int = Query(0, ge=0),
+    batch_size: int = Query(bulk_io.BULK_BATCH_SIZE, ge=1, le=100000),
+    reconcile: bool = True,
+):
+    _check(table, format)
+    report = await bulk_io.import_table(
+        table, bulk_io.lines_from_chunks(request.stream()), format, batch_size, skip=skip, reconcile=reconcile,
+    )
+    return report.to_dict()
@@ -1,125 +1,188 @@
 # ======================= WebSocket Management =======================
 
-from typing import Dict, List
 import uuid
-from fastapi import APIRouter, Depends, HTTPException ,WebSocket, WebSocketDisconnect
-from sqlalchemy import UUID
-from app.models.models import Conversations , ConversationParticipants, Messages , Users
-from app.schema.chatSchema import Chat, Message, MessageSchema
-from sqlalchemy.orm import Session
-from app.db.database import get_db
+from datetime import datetime
+from typing import List, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, WebSocket, WebSocketDisconnect
+from sqlalchemy import UUID, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.models.models import Conversations , ConversationParticipants, Messages
+from app.api.responses import ModelListResponse
+from app.schema.chatSchema import Chat, InboxEntry, Message, MessageSchema
+from app.db.database import get_async_db, AsyncSessionLocal
+from app.services.chat_broker import broker
+from app.services.message_writer import message_writer
+from app.services.message_cache import recent_messages
+from app.services.presence import presence
+from app.repositories import message_repository, user_repository
+from app.services.room_members import room_members
 
 router = APIRouter()
 
-# Store active WebSocket connections per chat room
-connections: Dict[str, List[WebSocket]] = {}
+# Active WebSocket connections per chat room live in the broker, which also
+# relays messages between nodes
 
 @router.websocket("/ws/{chat_id}/{user_id}")
-async def websocket_endpoint(websocket: WebSocket, chat_id: str, user_id: int, db: Session = Depends(get_db)):
+async def websocket_endpoint(websocket: WebSocket, chat_id: str, user_id: int):
     await websocket.accept()
-
-    if chat_id not in connections:
-        connections[chat_id] = []
-    connections[chat_id].append(websocket)
-
-    user = db.query(Users).filter(Users.id == user_id).first()
-    user_name = user.name if user else f"User-{user_id}"
+    try:
+        room_id = uuid.UUID(chat_id)
+    except ValueError:
+        await websocket.close(code=1008)
+        return
+    chat_id = str(room_id)
+    if not await room_members.is_member(room_id, user_id):
+        await websocket.close(code=1008)
+        return
+
+    # short-lived session: the socket must not pin a pooled connection while it is open
+    async with AsyncSessionLocal() as db:
+        user_name = await user_repository.get_user_name(db, user_id) or f"User-{user_id}"
+
+    # messages delivered from here may not be stored yet when the history is first loaded
+    recent_messages.track(chat_id)
+    await broker.join(chat_id, websocket)
+    presence.connect(user_id)
 
     try:
         while True:
             data = await websocket.receive_text()
-
-            # ✅ Save to database
-            new_msg = Messages(
-                room_id=chat_id,
-                sender_id=user_id,
-                content=data
-            )
-            db.add(new_msg)
-            db.commit()
-            db.refresh(new_msg)
-
-            # ✅ Broadcast to all clients in this chat
-            for client in connections[chat_id]:
-                await client.send_text(f"{user_name}: {data}")
-                await client.send_json({
-                    "message_id": str(new_msg.message_id),
-                    "room_id": str(chat_id),
-                    "sender_id": user_id,
-                    "sender_name": user_name,
-                    "content": data,
-                    "sent_at": new_msg.sent_at.isoformat()
-                })
+            presence.heartbeat(user_id)
+            if not data:
+                # empty frames are heartbeats, they keep the user online without sending anything
+                continue
+            # answered from memory; a member removed from the room is disconnected
+            if not await room_members.is_member(room_id, user_id):
+                await websocket.close(code=1008)
+                break
+
+            # ids and timestamps are assigned here so the message can go out before it is stored
+            message_id = uuid.uuid4()
+            sent_at = datetime.utcnow()
+
+            # ✅ Save to database, batched in the background
+            await message_writer.submit({
+                "message_id": message_id,
+                "room_id": room_id,
+                "sender_id": user_id,
+                "content": data,
+                "sent_at": sent_at
+            })
+
+            # ✅ Broadcast to all clients in this chat, on every node
+            await broker.publish(chat_id, {
+                "message_id": str(message_id),
+                "room_id": str(chat_id),
+                "sender_id": user_id,
+                "sender_name": user_name,
+                "content": data,
+                "sent_at": sent_at.isoformat()
+            })
 
     except WebSocketDisconnect:
-        connections[chat_id].remove(websocket)
+        pass
+    finally:
+        presence.disconnect(user_id)
+        await broker.leave(chat_id, websocket)
 
 
 # ======================= Chat Endpoints =======================
 
 @router.get("/chat/{user_id}")
-async def get_chat(user_id: int, db: Session = Depends(get_db)):
-    chat = db.query(Conversations).filter(Conversations.creator_id == user_id).all()
+async def get_chat(user_id: int, db: AsyncSession = Depends(get_async_db)):
+    chat = (await db.scalars(select(Conversations).where(Conversations.creator_id == user_id))).all()
     if chat:
         return chat
     return {"message": f"Chat for user {user_id} is not implemented yet."}
 
 
+# every room the user takes part in, most recent activity first, with the last message and
+# the unread count; the cursor for the next page is returned in the X-Next-Cursor header
+@router.get("/users/{user_id}/inbox", response_model=List[InboxEntry])
+async def get_inbox(
+    user_id: int,
+    limit: int = Query(message_repository.DEFAULT_INBOX_PAGE_SIZE, ge=1, le=message_repository.MAX_INBOX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    db: AsyncSession = Depends(get_async_db)
+):
+    try:
+        entries, next_cursor = await message_repository.get_inbox_page(db, user_id, limit, cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return ModelListResponse(InboxEntry, entries, headers={"X-Next-Cursor": next_cursor} if next_cursor else None)
+
+
+# mark the room as read up to now, or up to the message a history cursor points at
+@router.post("/chat/{user_id}/{chat_id}/read", status_code=204)
+async def mark_chat_read(
+    user_id: int,
+    chat_id: uuid.UUID,
+    cursor: Optional[str] = None,
+    db: AsyncSession = Depends(get_async_db)
+):
+    if not await room_members.is_member(chat_id, user_id, db):
+        raise HTTPException(status_code=403, detail="User is not a participant.")
+    read_at = datetime.utcnow()
+    if cursor:
+        try:
+            read_at = message_repository.decode_cursor(cursor)[0]
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+    await message_repository.mark_read(db, chat_id, user_id, read_at)
+    return Response(status_code=204)
+
+
 @router.get("/chat/{user_id}/{chat_id}")
-async def get_chat_by_id(user_id: int, chat_id: str, db: Session = Depends(get_db)):
-    chat = db.query(ConversationParticipants).filter(
-        ConversationParticipants.user_id == user_id, ConversationParticipants.room_id == chat_id
-    ).first()
-    if chat:
-        return chat
+async def get_chat_by_id(user_id: int, chat_id: str, db: AsyncSession = Depends(get_async_db)):
+    participant_id = (await room_members.get(chat_id, db)).get(user_id)
+    if participant_id:
+        return {"id": participant_id, "room_id": str(uuid.UUID(chat_id)), "user_id": user_id}
     return {"message": f"Chat with ID {chat_id} for user {user_id} not found."}
 
 
 @router.post("/chat/{user_id}")
-async def create_chat(user_id: int, chat: Chat, db: Session = Depends(get_db)):
+async def create_chat(user_id: int, chat: Chat, db: AsyncSession = Depends(get_async_db)):
+    # ids are set here, not by uuid_generate_v4(), which only exists on PostgreSQL
     new_chat = Conversations(
+        room_id=uuid.uuid4(),
         creator_id=user_id,
-        title=chat.name,
+        name=chat.name,
         is_group=chat.is_group,
+        created_at=datetime.utcnow(),
     )
-    db.add(new_chat)
-    db.commit()
-    db.refresh(new_chat)
-
     participant = ConversationParticipants(
+        id=uuid.uuid4(),
         user_id=user_id,
-        room_id=new_chat.id
+        room_id=new_chat.room_id,
+        last_read_at=new_chat.created_at
     )
-    db.add(participant)
-    db.commit()
-    return {"message": "Chat created successfully", "chat_id": new_chat.id}
+    db.add_all([new_chat, participant])
+    await db.commit()
+    room_members.invalidate(new_chat.room_id)
+    return {"message": "Chat created successfully", "chat_id": new_chat.room_id}
 
 
 @router.post("/chat/{user_id}/{chat_id}/send-message")
 async def send_message(
     user_id: int,
-    chat_id: str,
+    chat_id: uuid.UUID,
     message_data: Message,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
-    participant = db.query(ConversationParticipants).filter(
-        ConversationParticipants.user_id == user_id,
-        ConversationParticipants.room_id == chat_id
-    ).first()
-
-    if not participant:
+    if not await room_members.is_member(chat_id, user_id, db):
         raise HTTPException(status_code=403, detail="User is not a participant.")
 
     new_message = Messages(
+        message_id=uuid.uuid4(),
+        sent_at=datetime.utcnow(),
         room_id=chat_id,
         sender_id=user_id,
         content=message_data.message
     )
     db.add(new_message)
-    db.commit()
-    db.refresh(new_message)
+    await db.commit()
 
-    return {
+    payload = {
         "message_id": str(new_message.message_id),
         "room_id": str(new_message.room_id),
         "sender_id": new_message.sender_id,
@@ -127,44 +190,70 @@ async def send_message(
         "sent_at": new_message.sent_at.isoformat()
     }
 
+    # deliver to members connected over WebSocket
+    user_name = await user_repository.get_user_name(db, user_id)
+    await broker.publish(str(chat_id), {**payload, "sender_name": user_name or f"User-{user_id}"})
+    return payload
+
 
+# one page of history in chronological order: the newest messages by default,
+# `before` / `after` take the X-Before-Cursor / X-After-Cursor of a previous page
 @router.get("/chat/{chat_id}/get-message/")
 async def get_messages(
-    chat_id: str,
-    db: Session = Depends(get_db)
+    chat_id: uuid.UUID,
+    limit: int = Query(message_repository.DEFAULT_PAGE_SIZE, ge=1, le=message_repository.MAX_PAGE_SIZE),
+    before: Optional[str] = None,
+    after: Optional[str] = None,
+    db: AsyncSession = Depends(get_async_db)
 ):
-    participant = db.query(ConversationParticipants).filter(
-        ConversationParticipants.room_id == chat_id
-    ).first()
-
-    if not participant:
+    if not await room_members.get(chat_id, db):
         raise HTTPException(status_code=403, detail="User is not a participant.")
 
-    messages = db.query(Messages).filter(Messages.room_id == chat_id).order_by(Messages.sent_at).all()
+    try:
+        before_key = message_repository.decode_cursor(before) if before else None
+        after_key = message_repository.decode_cursor(after) if after else None
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    room = str(chat_id)
+    messages = None
+    if broker.is_live(room):
+        buffer = recent_messages.track(room)
+        if not buffer.seeded and recent_messages.can_seed(buffer):
+            history = await message_repository.get_messages_page(db, chat_id, recent_messages.per_room)
+            buffer.seed(history, complete=len(history) < recent_messages.per_room)
+        if buffer.seeded:
+            messages = buffer.page(limit, before_key, after_key)
+    if messages is None:
+        messages = await message_repository.get_messages_page(db, chat_id, limit, before_key, after_key)
 
     if not messages:
         return {"message": "No messages found in this chat."}
 
-    return [MessageSchema(
-        user_id=msg.sender_id,
-        room_id=str(msg.room_id),
-        message=msg.content,
-        timestamp=msg.sent_at
-    ) for msg in messages]
+    return ModelListResponse(MessageSchema, [{
+        "message_id": msg["message_id"],
+        "user_id": msg["sender_id"],
+        "room_id": msg["room_id"],
+        "message": msg["content"],
+        "timestamp": msg["sent_at"]
+    } for msg in messages], headers={
+        "X-Before-Cursor": message_repository.encode_cursor(messages[0]["sent_at"], messages[0]["message_id"]),
+        "X-After-Cursor": message_repository.encode_cursor(messages[-1]["sent_at"], messages[-1]["message_id"]),
+    })
 
 
 @router.get("/chat/{chat_id}/participants")
 async def get_chat_participants(
     chat_id: str,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     try:
-        participants = db.query(ConversationParticipants).filter(ConversationParticipants.room_id == chat_id).all()
+        members = await room_members.get(chat_id, db)
 
-        if not participants:
+        if not members:
             return {"message": "No participants found in this chat."}
 
-        return [{"user_id": participant.user_id, "room_id": str(participant.room_id)} for participant in participants]
+        return [{"user_id": user_id, "room_id": str(uuid.UUID(chat_id))} for user_id in sorted(members)]
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
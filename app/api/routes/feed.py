@@ -0,0 +1,29 @@
+from typing import List, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.db.database import get_async_db
+from app.api.responses import ModelListResponse
+from app.schema.schema import PostOut
+from app.repositories import comment_repository, post_repository
+from app.services import feed_service
+
+router = APIRouter()
+
+
+# home timeline: posts from the user and everyone they follow, newest first
+# the cursor for the next page is returned in the X-Next-Cursor header;
+# embed_comments=N includes the first N comments of every post on the page
+@router.get("/users/{user_id}/feed", response_model=List[PostOut])
+async def read_feed(
+    user_id: int,
+    limit: int = Query(post_repository.DEFAULT_PAGE_SIZE, ge=1, le=post_repository.MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    embed_comments: int = Query(0, ge=0, le=comment_repository.MAX_EMBEDDED_COMMENTS),
+    db: AsyncSession = Depends(get_async_db),
+):
+    try:
+        posts, next_cursor = await feed_service.get_feed(db, user_id, limit, cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    posts = await comment_repository.embed_first_comments(db, posts, embed_comments)
+    return ModelListResponse(PostOut, posts, headers={"X-Next-Cursor": next_cursor} if next_cursor else None)
@@ -1,15 +1,17 @@
-from fastapi import APIRouter
-from typing import Annotated, List, Dict, Type
+from fastapi import APIRouter, Query
+from typing import Annotated, List, Dict, Optional, Type
 
 from fastapi.params import Body
-from app.models.models import Users  , Follow
 
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from fastapi import Depends
-from app.db.database import get_db
+from app.db.database import get_async_db
+from app.api.responses import ModelListResponse
 from app.schema.schema import UserOut, UserBase
 from app.repositories.user_repository import get_user_by_id
+from app.repositories import follower_repository
 from app.repositories.follower_repository import get_follower, get_following
+from app.services import feed_service
 
 # following -- user that will be followed
 # follower -- user that is following
@@ -20,32 +22,60 @@ router = APIRouter()
 
 # follow a user
 @router.post("/users/follow/")
-async def follow_user(follower_id: Annotated[int , Body()], following_id: Annotated[int , Body()], db: Session = Depends(get_db)):
+async def follow_user(follower_id: Annotated[int , Body()], following_id: Annotated[int , Body()], db: AsyncSession = Depends(get_async_db)):
     try:
-        new_follow = Follow(follower_id=follower_id, following_id=following_id)
-        db.add(new_follow)
-        db.commit()
-        db.refresh(new_follow)
+        new_follow = await follower_repository.follow_user(db, follower_id, following_id)
+        await feed_service.invalidate_feed(follower_id)
         return {"message": "Followed successfully", "follow": new_follow}
     
     except Exception as e:
-        db.rollback()
+        await db.rollback()
+        return {"error": str(e)}
+
+
+# unfollow a user
+@router.post("/users/unfollow/")
+async def unfollow_user(follower_id: Annotated[int , Body()], following_id: Annotated[int , Body()], db: AsyncSession = Depends(get_async_db)):
+    try:
+        if not await follower_repository.unfollow_user(db, follower_id, following_id):
+            return {"error": "Not following this user"}
+        await feed_service.invalidate_feed(follower_id)
+        return {"message": "Unfollowed successfully"}
+
+    except Exception as e:
+        await db.rollback()
         return {"error": str(e)}
     
 
-# get followers of a user
+# get followers of a user, one page at a time ordered by user id
+# the `after` value for the next page is returned in the X-Next-Cursor header
 @router.get("/users/{user_id}/followers", response_model=List[UserBase])
-async def get_followers(user_id: int, db: Session = Depends(get_db)):   
-    followers = db.query(Follow).filter(Follow.following_id == user_id).all()
-    follower_ids = [follower.follower_id for follower in followers]
-    users = db.query(Users).filter(Users.id.in_(follower_ids)).all()
-    return users
+async def get_followers(
+    user_id: int,
+    limit: int = Query(follower_repository.DEFAULT_PAGE_SIZE, ge=1, le=follower_repository.MAX_PAGE_SIZE),
+    after: Optional[int] = None,
+    db: AsyncSession = Depends(get_async_db),
+):
+    users, next_after = await follower_repository.list_followers(db, user_id, limit, after)
+    return ModelListResponse(UserBase, users, headers={"X-Next-Cursor": str(next_after)} if next_after is not None else None)
 
-# get users that a user is following
+# get users that a user is following, paginated like the followers list
 @router.get("/users/{user_id}/following", response_model=List[UserBase])
-async def get_followers(user_id: int, db: Session = Depends(get_db)):   
-    following = db.query(Follow).filter(Follow.follower_id == user_id).all()
-    following_ids = [following.follower_id for following in following]
-    users = db.query(Users).filter(Users.id.in_(following_ids)).all()
-    return users
+async def get_following_users(
+    user_id: int,
+    limit: int = Query(follower_repository.DEFAULT_PAGE_SIZE, ge=1, le=follower_repository.MAX_PAGE_SIZE),
+    after: Optional[int] = None,
+    db: AsyncSession = Depends(get_async_db),
+):
+    users, next_after = await follower_repository.list_following(db, user_id, limit, after)
+    return ModelListResponse(UserBase, users, headers={"X-Next-Cursor": str(next_after)} if next_after is not None else None)
 
+# check which of many users a user follows, e.g. for a grid of profiles
+@router.post("/users/{user_id}/is-following", response_model=Dict[int, bool])
+async def is_following(
+    user_id: int,
+    user_ids: Annotated[List[int], Body(embed=True, max_length=follower_repository.MAX_LOOKUP_IDS)],
+    db: AsyncSession = Depends(get_async_db),
+):
+    followed = await follower_repository.get_followed_ids(db, user_id, user_ids)
+    return {target_id: target_id in followed for target_id in user_ids}
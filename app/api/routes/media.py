@@ -0,0 +1,68 @@
+import os
+from email.utils import formatdate, parsedate_to_datetime
+
+from fastapi import APIRouter, HTTPException, Request, Response
+from fastapi.responses import FileResponse
+from app.repositories.file_repository import BASE_UPLOAD_PATH, OBJECTS_DIR, TMP_DIR, sniff_media_type
+
+router = APIRouter()
+
+# content-addressed files never change, anything else is revalidated on every use
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+MUTABLE_CACHE_CONTROL = "public, max-age=0, must-revalidate"
+
+
+def _resolve(path: str) -> str:
+    root = os.path.realpath(BASE_UPLOAD_PATH)
+    full_path = os.path.realpath(os.path.join(root, path))
+    if not full_path.startswith(root + os.sep) or path.split("/", 1)[0] == TMP_DIR:
+        raise HTTPException(status_code=404, detail="Not found")
+    return full_path
+
+
+def _not_modified(request: Request, etag: str, mtime: float) -> bool:
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        tags = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+        return "*" in tags or etag.removeprefix("W/") in tags
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since:
+        try:
+            return int(mtime) <= parsedate_to_datetime(if_modified_since).timestamp()
+        except (TypeError, ValueError):
+            return False
+    return False
+
+
+# serve the uploads tree; Range requests are answered by FileResponse, which also hands
+# the file to the server for zero-copy sending when the server supports it
+@router.get("/media/{path:path}")
+async def get_media(path: str, request: Request):
+    full_path = _resolve(path)
+    try:
+        stat = os.stat(full_path)
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="Not found")
+    if not os.path.isfile(full_path):
+        raise HTTPException(status_code=404, detail="Not found")
+
+    media_type = None
+    if path.startswith(OBJECTS_DIR + "/"):
+        # the file name is the SHA-256 of the content, a strong validator
+        stem, ext = os.path.splitext(os.path.basename(path))
+        etag = f'"{stem}"'
+        cache_control = IMMUTABLE_CACHE_CONTROL
+        if not ext:
+            media_type = sniff_media_type(full_path)
+    else:
+        etag = f'W/"{int(stat.st_mtime)}-{stat.st_size}"'
+        cache_control = MUTABLE_CACHE_CONTROL
+
+    headers = {
+        "etag": etag,
+        "cache-control": cache_control,
+        "last-modified": formatdate(stat.st_mtime, usegmt=True),
+    }
+    if _not_modified(request, etag, stat.st_mtime):
+        return Response(status_code=304, headers=headers)
+    return FileResponse(full_path, headers=headers, media_type=media_type, stat_result=stat)
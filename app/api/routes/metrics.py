@@ -0,0 +1,24 @@
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+from app.db.database import async_engine
+from app.db.pool_metrics import render_pool_metrics
+from app.db.query_metrics import render_query_metrics
+from app.api.request_metrics import render_request_metrics
+from app.repositories.cache import render_cache_metrics
+from app.services.chat_broker import render_broker_metrics
+from app.services.room_members import render_room_members_metrics
+
+router = APIRouter()
+
+
+# Prometheus text exposition
+@router.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    return (
+        render_pool_metrics(async_engine.pool)
+        + render_cache_metrics()
+        + render_room_members_metrics()
+        + render_broker_metrics()
+        + render_query_metrics()
+        + render_request_metrics()
+    )
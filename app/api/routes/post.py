@@ -1,85 +1,178 @@
-from typing import List
-from fastapi import Depends , APIRouter
-from sqlalchemy.orm import Session
+import datetime
+import json
+from typing import Annotated, Dict, List, Optional
+from fastapi import Body, Depends , APIRouter, HTTPException, Query, Response
+from fastapi.responses import StreamingResponse
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
 from app.models.models import Posts as Post, Comment
-from app.db.database import get_db
-from app.schema.schema import CommentBase, PostCreate, PostOut, CommentCreate , CommentOut  # ✅ Use Pydantic models here
-from fastapi import Depends
-from sqlalchemy.orm import Session
+from app.db.database import get_async_db, AsyncSessionLocal
+from app.repositories import comment_repository, like_repository, post_repository
+from app.services import feed_service, search_service
+from app.services.like_counter import like_counter
+from app.api.responses import ModelListResponse
+from app.schema.schema import BatchGetRequest, CommentBase, PostCreate, PostOut, CommentCreate , CommentOut, batch_response  # ✅ Use Pydantic models here
 
 
 router = APIRouter()
 
 
-# get all posts in database
+# get all posts in database, newest first, one page at a time
+# the cursor for the next page is returned in the X-Next-Cursor header;
+# embed_comments=N includes the first N comments of every post on the page
 @router.get("/posts" , response_model=List[PostOut])
-async def allPosts(db: Session = Depends(get_db)):
-    db_posts = db.query(Post)
-    return db_posts.all()
+async def allPosts(
+    limit: int = Query(post_repository.DEFAULT_PAGE_SIZE, ge=1, le=post_repository.MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    embed_comments: int = Query(0, ge=0, le=comment_repository.MAX_EMBEDDED_COMMENTS),
+    db: AsyncSession = Depends(get_async_db),
+):
+    try:
+        db_posts, next_cursor = await post_repository.get_posts_page(db, limit, cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    posts = await comment_repository.embed_first_comments(db, db_posts, embed_comments)
+    return ModelListResponse(PostOut, posts, headers={"X-Next-Cursor": next_cursor} if next_cursor else None)
+
+
+async def _stream_posts():
+    # own session: the request-scoped one is closed before the body is streamed
+    async with AsyncSessionLocal() as db:
+        async for post in post_repository.iter_posts(db):
+            yield PostOut.model_validate(post).model_dump_json() + "\n"
+
+
+# stream every post as NDJSON, read from the database in batches
+@router.get("/posts/stream")
+async def stream_posts():
+    return StreamingResponse(_stream_posts(), media_type="application/x-ndjson")
 
 
 # create a new posts
 @router.post("/posts" , response_model=PostOut)
-async def create_post(post: PostCreate, db: Session = Depends(get_db)):
+async def create_post(post: PostCreate, db: AsyncSession = Depends(get_async_db)):
     db_post = Post(
         user_id=post.user_id,
         post_type=post.post_type,
-        post_text=post.post_text
+        post_text=post.post_text,
+        likes=0,
+        created_at=datetime.datetime.utcnow()
     )
     db.add(db_post)
-    db.commit()
-    db.refresh(db_post)
+    await db.commit()
+    await db.refresh(db_post)
+    await post_repository.invalidate_post(db_post.id)
+    search_service.index_post(db, db_post)
+    await feed_service.fan_out_post(db, db_post)
     return db_post
 
 # get a post by id<< Particular Post>>
 @router.get("/posts/{post_id}", response_model=PostOut)
-async def read_post(post_id: int, db: Session = Depends(get_db)):
-    db_post = db.query(Post).filter(Post.id == post_id).first()
-    if db_post is None:
+async def read_post(post_id: int, db: AsyncSession = Depends(get_async_db)):
+    payload = await post_repository.get_post_payload(db, post_id)
+    if payload is None:
         return {"error": "Post not found"}
-    return db_post
+    # already serialized PostOut, skip validation and the JSON encoder
+    return Response(content=payload, media_type="application/json")
 
 # get User posts by user id << User's Posts >>
 @router.get("/user/{user_id}/posts", response_model=List[PostOut])
-async def read_user_posts(user_id: int, db: Session = Depends(get_db)): 
-    db_posts = db.query(Post).filter(Post.user_id == user_id).all()
+async def read_user_posts(
+    user_id: int,
+    embed_comments: int = Query(0, ge=0, le=comment_repository.MAX_EMBEDDED_COMMENTS),
+    db: AsyncSession = Depends(get_async_db),
+):
+    db_posts = (await db.execute(select(*post_repository.POST_COLUMNS).where(Post.user_id == user_id))).all()
     if not db_posts:
         return {"error": "No posts found for this user"}
-    return db_posts
+    return ModelListResponse(PostOut, await comment_repository.embed_first_comments(db, db_posts, embed_comments))
 
 
 #get a post by user id and post id << Particular Post of User>>
 @router.get("/users/{user_id}/posts/{post_id}", response_model=PostOut)
-async def read_user_post(user_id: int, post_id: int, db: Session = Depends(get_db)):
-    db_post = db.query(Post).filter(
-        Post.user_id == user_id, Post.id == post_id
-    ).first()
-    if db_post is None:
+async def read_user_post(user_id: int, post_id: int, db: AsyncSession = Depends(get_async_db)):
+    payload = await post_repository.get_post_payload(db, post_id)
+    if payload is None or json.loads(payload)["user_id"] != user_id:
         return {"error": "Post not found for this user"}
-    return db_post
+    return Response(content=payload, media_type="application/json")
 
-# capture a comment on a post
+# capture a comment on a post, the post's comment_count is bumped in the same transaction
 @router.post("/users/{user_id}/posts/{post_id}/comments", response_model=CommentOut)
-async def create_post_comment(user_id: int, post_id: int, comment: CommentBase, db: Session = Depends(get_db)):
-    db_comment = Comment(
-        user_id=user_id,
-        post_id=post_id,
-        comment_type=comment.comment_type,
-        comment=comment.comment
-    )
-    db.add(db_comment)
-    db.commit()
-    db.refresh(db_comment)
+async def create_post_comment(user_id: int, post_id: int, comment: CommentBase, db: AsyncSession = Depends(get_async_db)):
+    try:
+        db_comment = await comment_repository.create_comment(
+            db, user_id, post_id, comment.comment_type, comment.comment
+        )
+    except IntegrityError:
+        await db.rollback()
+        raise HTTPException(status_code=404, detail="Post or user not found")
+    await post_repository.invalidate_post(post_id)
+    search_service.index_comment(db, db_comment)
     return db_comment
 
 
+# a post's whole thread, oldest first, one page at a time
+# the cursor for the next page is returned in the X-Next-Cursor header
+@router.get("/posts/{post_id}/comments", response_model=List[CommentOut])
+async def read_comment_thread(
+    post_id: int,
+    limit: int = Query(comment_repository.DEFAULT_PAGE_SIZE, ge=1, le=comment_repository.MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    db: AsyncSession = Depends(get_async_db),
+):
+    try:
+        db_comments, next_cursor = await comment_repository.get_comments_page(db, post_id, limit, cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return ModelListResponse(CommentOut, db_comments, headers={"X-Next-Cursor": next_cursor} if next_cursor else None)
+
+
 @router.get("/users/{user_id}/posts/{post_id}/comments", response_model=List[CommentOut])
-async def read_post_comments(user_id: int, post_id: int, db: Session = Depends(get_db)):
-    db_comments = db.query(Comment).filter(
+async def read_post_comments(user_id: int, post_id: int, db: AsyncSession = Depends(get_async_db)):
+    db_comments = (await db.scalars(select(Comment).where(
         Comment.user_id == user_id, Comment.post_id == post_id
-    ).all()
+    ))).all()
     if not db_comments:
         return {"error": "No comments found for this post"}
     return db_comments
 
 
+# like a post, liking twice counts once
+@router.post("/users/{user_id}/posts/{post_id}/like")
+async def like_post(user_id: int, post_id: int, db: AsyncSession = Depends(get_async_db)):
+    try:
+        liked = await like_repository.like_post(db, user_id, post_id)
+    except IntegrityError:
+        await db.rollback()
+        raise HTTPException(status_code=404, detail="Post or user not found")
+    if liked:
+        like_counter.add(post_id, 1)
+    return {"message": "Post liked", "post_id": post_id}
+
+
+# remove a like, unliking a post that was not liked is a no-op
+@router.delete("/users/{user_id}/posts/{post_id}/like")
+async def unlike_post(user_id: int, post_id: int, db: AsyncSession = Depends(get_async_db)):
+    if await like_repository.unlike_post(db, user_id, post_id):
+        like_counter.add(post_id, -1)
+    return {"message": "Post unliked", "post_id": post_id}
+
+
+# which of many posts a user has liked, e.g. to render a feed page
+@router.post("/users/{user_id}/liked-posts", response_model=Dict[int, bool])
+async def liked_posts(
+    user_id: int,
+    post_ids: Annotated[List[int], Body(embed=True, max_length=like_repository.MAX_LOOKUP_IDS)],
+    db: AsyncSession = Depends(get_async_db),
+):
+    liked = await like_repository.get_liked_post_ids(db, user_id, post_ids)
+    return {post_id: post_id in liked for post_id in post_ids}
+
+
+# fetch many posts in one call; `items` follows the order of `ids`, with null for
+# unknown ids, which are also listed in `missing`
+@router.post("/posts:batchGet")
+async def batch_get_posts(request: BatchGetRequest, db: AsyncSession = Depends(get_async_db)):
+    payloads = await post_repository.get_post_payloads(db, list(dict.fromkeys(request.ids)))
+    return Response(content=batch_response(request.ids, payloads), media_type="application/json")
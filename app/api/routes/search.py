@@ -0,0 +1,29 @@
+from typing import List, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.db.database import get_async_db
+from app.schema.schema import SearchKind, SearchResult
+from app.services import search_service
+
+router = APIRouter()
+
+
+# search posts, comments and user profiles, best matches first
+# `type` narrows the search, the cursor for the next page is returned in the X-Next-Cursor header
+@router.get("/search", response_model=List[SearchResult])
+async def search(
+    response: Response,
+    q: str = Query(..., min_length=1, max_length=200),
+    type: Optional[List[SearchKind]] = Query(None),
+    limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = None,
+    db: AsyncSession = Depends(get_async_db),
+):
+    kinds = [kind.value for kind in type] if type else search_service.KINDS
+    try:
+        results, next_cursor = await search_service.search(db, q, kinds, limit, cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return results
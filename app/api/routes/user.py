@@ -1,13 +1,16 @@
-from fastapi import APIRouter 
-from typing import List
+import json
+from fastapi import APIRouter, BackgroundTasks, HTTPException, Response
+from typing import Dict, List, Optional
 from app.models.models import Users
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from fastapi import Depends, UploadFile, File
+from app.services import search_service
 from app.services.user_service import handle_profile_picture_upload
-from app.db.database import get_db
+from app.services.presence import presence
+from app.db.database import get_async_db
 from app.models.models import Users as User
-from app.schema.schema import UserOut , UserBase
-from app.repositories.user_repository import get_user_by_id
+from app.schema.schema import UserOut , UserBase, BatchGetRequest, PresenceOut, batch_response
+from app.repositories import file_repository, user_repository
 from app.repositories.follower_repository import get_follower, get_following
 
 router = APIRouter()
@@ -16,7 +19,7 @@ router = APIRouter()
 
 # ✅ Use Pydantic model as input
 @router.post("/users", response_model=UserOut)
-async def create_user(user: UserBase, db: Session = Depends(get_db)):
+async def create_user(user: UserBase, db: AsyncSession = Depends(get_async_db)):
     db_user = User(
         name=user.name,
         email=user.email,
@@ -26,42 +29,60 @@ async def create_user(user: UserBase, db: Session = Depends(get_db)):
         is_online=user.is_online,
     )
     db.add(db_user)
-    db.commit()
-    db.refresh(db_user)
+    await db.commit()
+    await db.refresh(db_user)
+    search_service.index_user(db, db_user)
     return db_user
 
 
 @router.get("/users/{user_id}")
-async def read_user(user_id: int, db: Session = Depends(get_db)):
-    db_user = db.query(User).filter(User.id == user_id).first()
-    if db_user is None:
+async def read_user(user_id: int, db: AsyncSession = Depends(get_async_db)):
+    payload = await user_repository.get_user_payload(db, user_id)
+    if payload is None:
         return {"error": "User not found"}
-    return {
-     "user":db_user
-    }
+    # already serialized, skip the JSON encoder
+    return Response(content=f'{{"user":{payload}}}', media_type="application/json")
 
 
 @router.post("/users/{user_id}/upload-profile", response_model=UserOut)
-def upload_profile_picture(user_id: int, file: UploadFile = File(...), db: Session = Depends(get_db)):
-    handle_profile_picture_upload(db, user_id, file)
-    user = get_user_by_id(db, user_id)
-    return {
-        "id": user.id,
-        "name": user.name,
-        "email": user.email,
-        "profile_picture": f"/media/user_{user_id}/{user.profile_picture}" if user.profile_picture else None
-    }
+async def upload_profile_picture(user_id: int, background_tasks: BackgroundTasks, file: UploadFile = File(...), db: AsyncSession = Depends(get_async_db)):
+    try:
+        user = await handle_profile_picture_upload(db, user_id, file, background_tasks)
+    except file_repository.UploadTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except file_repository.UnsupportedMediaType as e:
+        raise HTTPException(status_code=415, detail=str(e))
+    if user is None:
+        raise HTTPException(status_code=404, detail="User not found")
+    return UserOut.model_validate(user).model_copy(update={
+        "profile_picture": file_repository.media_url(user_id, user.profile_picture) if user.profile_picture else None
+    })
 
 
 @router.get("/users/{user_id}/profile-picture")
-def get_profile_picture(user_id: int, db: Session = Depends(get_db)):
-    user = get_user_by_id(db, user_id)
-    if not user or not user.profile_picture:
+async def get_profile_picture(user_id: int, size: Optional[int] = None, db: AsyncSession = Depends(get_async_db)):
+    payload = await user_repository.get_user_payload(db, user_id)
+    profile_picture = json.loads(payload)["profile_picture"] if payload else None
+    if not profile_picture:
         return {"error": "Profile picture not found"}
+    if size is not None:
+        # smallest generated thumbnail that is at least `size` pixels, else the original
+        size = next((s for s in sorted(file_repository.THUMBNAIL_SIZES) if s >= size), None)
     return {
-        "profile_picture": f"/media/user_{user_id}/{user.profile_picture}"
+        "profile_picture": file_repository.media_url(user_id, profile_picture, size),
+        "variants": file_repository.media_variants(user_id, profile_picture)
     }
 
 
+# fetch many users in one call; `items` follows the order of `ids`, with null for
+# unknown ids, which are also listed in `missing`
+@router.post("/users:batchGet")
+async def batch_get_users(request: BatchGetRequest, db: AsyncSession = Depends(get_async_db)):
+    payloads = await user_repository.get_user_payloads(db, list(dict.fromkeys(request.ids)))
+    return Response(content=batch_response(request.ids, payloads), media_type="application/json")
 
 
+# online status of many users at once, e.g. for a contact list or the members of a chat
+@router.post("/users:presence", response_model=Dict[int, PresenceOut])
+async def users_presence(request: BatchGetRequest):
+    return await presence.get_many(list(dict.fromkeys(request.ids)))
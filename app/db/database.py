@@ -2,20 +2,76 @@ import os
 from dotenv import load_dotenv
 
 from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from app.db.pool_metrics import MeasuredAsyncPool
+from app.db.query_metrics import instrument
 
 load_dotenv()
 
+# async drivers for the sync urls we accept in DATABASE_URL
+ASYNC_DRIVERS = {
+    "postgresql": "postgresql+asyncpg",
+    "postgresql+psycopg2": "postgresql+asyncpg",
+    "sqlite": "sqlite+aiosqlite",
+}
+
+
+def get_async_database_url(url: str):
+    url = make_url(url)
+    return url.set(drivername=ASYNC_DRIVERS.get(url.drivername, url.drivername))
+
+
+# pool settings are per engine and per worker process, see README for sizing
+def get_pool_options(url) -> dict:
+    options = {
+        "pool_pre_ping": os.getenv("DB_POOL_PRE_PING", "true").lower() in ("1", "true", "yes"),
+        "pool_recycle": int(os.getenv("DB_POOL_RECYCLE", "1800")),
+    }
+    if make_url(url).get_backend_name() != "sqlite":
+        options.update(
+            pool_size=int(os.getenv("DB_POOL_SIZE", "5")),
+            max_overflow=int(os.getenv("DB_MAX_OVERFLOW", "10")),
+            pool_timeout=float(os.getenv("DB_POOL_TIMEOUT", "30")),
+        )
+    return options
+
+
+# the async pool also records checkout waits and timeouts for /metrics; in-memory SQLite
+# keeps its single static connection
+def get_async_pool_options(url) -> dict:
+    options = get_pool_options(url)
+    url = make_url(url)
+    if not (url.get_backend_name() == "sqlite" and url.database in (None, "", ":memory:")):
+        options["poolclass"] = MeasuredAsyncPool
+    return options
+
+
 database_url = os.getenv("DATABASE_URL")
-engine = create_engine(database_url)
+async_database_url = os.getenv("ASYNC_DATABASE_URL") or get_async_database_url(database_url)
+engine = create_engine(database_url, **get_pool_options(database_url))
+async_engine = create_async_engine(async_database_url, **get_async_pool_options(async_database_url))
+instrument(engine)
+instrument(async_engine.sync_engine)
 
 Base = declarative_base()
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
+
+# sync session, for scripts and routes that must stay in the threadpool
 def get_db():
     db = SessionLocal()
     try:
         yield db
     finally:
         db.close()
+
+
+# async session, for async def routes so queries never block the event loop
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
 Base = declarative_base()
\ No newline at end of file
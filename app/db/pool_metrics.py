@@ -0,0 +1,81 @@
+import threading
+import time
+
+from sqlalchemy import exc
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+# connection pool instrumentation, exported by the /metrics route. Checkouts are timed in the
+# async engine's pool itself, so every AsyncSession counts: request-scoped ones from
+# get_async_db as well as those the background services open from AsyncSessionLocal
+
+CHECKOUT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class PoolMetrics:
+    def __init__(self, buckets=CHECKOUT_BUCKETS):
+        self.buckets = buckets
+        self.bucket_counts = [0] * len(buckets)
+        self.checkouts = 0
+        self.checkout_seconds = 0.0
+        self.timeouts = 0
+        self._lock = threading.Lock()
+
+    def record_checkout(self, seconds: float) -> None:
+        with self._lock:
+            self.checkouts += 1
+            self.checkout_seconds += seconds
+            for i, bound in enumerate(self.buckets):
+                if seconds <= bound:
+                    self.bucket_counts[i] += 1
+
+    def record_timeout(self) -> None:
+        with self._lock:
+            self.timeouts += 1
+
+
+pool_metrics = PoolMetrics()
+
+
+class MeasuredAsyncPool(AsyncAdaptedQueuePool):
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except exc.TimeoutError:
+            pool_metrics.record_timeout()
+            raise
+        pool_metrics.record_checkout(time.perf_counter() - start)
+        return connection
+
+
+def render_pool_metrics(pool) -> str:
+    m = pool_metrics
+    if not hasattr(pool, "checkedout"):
+        # StaticPool / NullPool (e.g. in-memory sqlite) keep no counters
+        return ""
+    lines = [
+        "# HELP db_pool_size Configured number of persistent connections.",
+        "# TYPE db_pool_size gauge",
+        f"db_pool_size {pool.size()}",
+        "# HELP db_pool_checked_out Connections currently in use.",
+        "# TYPE db_pool_checked_out gauge",
+        f"db_pool_checked_out {pool.checkedout()}",
+        "# HELP db_pool_checked_in Idle connections held by the pool.",
+        "# TYPE db_pool_checked_in gauge",
+        f"db_pool_checked_in {pool.checkedin()}",
+        "# HELP db_pool_overflow Connections open beyond pool_size.",
+        "# TYPE db_pool_overflow gauge",
+        f"db_pool_overflow {max(pool.overflow(), 0)}",
+        "# HELP db_pool_timeouts_total Checkouts that gave up after pool_timeout.",
+        "# TYPE db_pool_timeouts_total counter",
+        f"db_pool_timeouts_total {m.timeouts}",
+        "# HELP db_pool_checkout_seconds Time spent waiting for a connection.",
+        "# TYPE db_pool_checkout_seconds histogram",
+    ]
+    with m._lock:
+        for bound, count in zip(m.buckets, m.bucket_counts):
+            lines.append(f'db_pool_checkout_seconds_bucket{{le="{bound}"}} {count}')
+        lines.append(f'db_pool_checkout_seconds_bucket{{le="+Inf"}} {m.checkouts}')
+        lines.append(f"db_pool_checkout_seconds_sum {m.checkout_seconds}")
+        lines.append(f"db_pool_checkout_seconds_count {m.checkouts}")
+    return "\n".join(lines) + "\n"
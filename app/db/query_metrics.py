@@ -0,0 +1,106 @@
+import contextvars
+import logging
+import os
+import threading
+import time
+from collections import Counter
+from typing import Optional
+
+from sqlalchemy import event
+
+# SQL instrumentation through engine events: statements and DB time are added to the
+# RequestStats of the request being served (set by the request metrics middleware),
+# slow statements are logged with their parameters.
+
+SLOW_QUERY_SECONDS = float(os.getenv("SLOW_QUERY_SECONDS", "0.2"))
+SLOW_QUERY_LOG_PARAMETERS = os.getenv("SLOW_QUERY_LOG_PARAMETERS", "true").lower() in ("1", "true", "yes")
+# the same statement this many times in one request is reported as an N+1 pattern
+N_PLUS_ONE_THRESHOLD = int(os.getenv("N_PLUS_ONE_THRESHOLD", "10"))
+MAX_LOGGED_PARAMETERS = 1000
+
+logger = logging.getLogger(__name__)
+
+
+class RequestStats:
+    def __init__(self):
+        self.statements = 0
+        self.db_seconds = 0.0
+        self.shapes: Counter = Counter()
+
+    # statements repeated often enough to look like a query per row, with their counts
+    def repeated_statements(self, threshold: int = N_PLUS_ONE_THRESHOLD):
+        return [(statement, count) for statement, count in self.shapes.items() if count >= threshold]
+
+
+current_request: contextvars.ContextVar[Optional[RequestStats]] = contextvars.ContextVar("current_request", default=None)
+
+
+class QueryMetrics:
+    def __init__(self):
+        self.statements = 0
+        self.seconds = 0.0
+        self.slow = 0
+        self._lock = threading.Lock()
+
+    def record(self, seconds: float, slow: bool) -> None:
+        with self._lock:
+            self.statements += 1
+            self.seconds += seconds
+            if slow:
+                self.slow += 1
+
+
+query_metrics = QueryMetrics()
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    seconds = time.perf_counter() - conn.info["query_started"].pop()
+    slow = seconds >= SLOW_QUERY_SECONDS
+    query_metrics.record(seconds, slow)
+
+    stats = current_request.get()
+    if stats is not None:
+        stats.statements += 1
+        stats.db_seconds += seconds
+        stats.shapes[statement] += 1
+
+    if slow:
+        if SLOW_QUERY_LOG_PARAMETERS:
+            logger.warning("slow query (%.3fs): %s parameters=%.*s",
+                           seconds, statement, MAX_LOGGED_PARAMETERS, repr(parameters))
+        else:
+            logger.warning("slow query (%.3fs): %s", seconds, statement)
+
+
+def _handle_error(exception_context):
+    # a failed statement never reaches after_cursor_execute
+    started = exception_context.connection.info.get("query_started") if exception_context.connection else None
+    if started:
+        started.pop()
+
+
+def instrument(engine) -> None:
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+    event.listen(engine, "handle_error", _handle_error)
+
+
+def render_query_metrics() -> str:
+    m = query_metrics
+    with m._lock:
+        lines = [
+            "# HELP db_statements_total SQL statements executed.",
+            "# TYPE db_statements_total counter",
+            f"db_statements_total {m.statements}",
+            "# HELP db_statement_seconds_total Time spent executing SQL statements.",
+            "# TYPE db_statement_seconds_total counter",
+            f"db_statement_seconds_total {m.seconds}",
+            "# HELP db_slow_statements_total Statements slower than SLOW_QUERY_SECONDS.",
+            "# TYPE db_slow_statements_total counter",
+            f"db_slow_statements_total {m.slow}",
+        ]
+    return "\n".join(lines) + "\n"
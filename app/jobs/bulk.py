@@ -0,0 +1,115 @@
+import argparse
+import asyncio
+import json
+import os
+import sys
+from typing import AsyncIterator, Optional
+
+from app.db.database import async_engine
+from app.services import bulk_io
+
+# import and export tables as NDJSON or CSV
+# usage: python -m app.jobs.bulk export users users.ndjson
+#        python -m app.jobs.bulk import users users.ndjson [--checkpoint users.ckpt] [--errors users.errors]
+# FILE may be - for stdin / stdout. Load tables in the order listed by --help. With
+# --checkpoint an interrupted import picks up after the last batch it finished.
+
+
+async def _file_lines(path: str) -> AsyncIterator[str]:
+    f = sys.stdin if path == "-" else open(path, encoding="utf-8", newline="")
+    try:
+        for line in f:
+            yield line.rstrip("\n").rstrip("\r")
+    finally:
+        if f is not sys.stdin:
+            f.close()
+
+
+def _guess_format(path: str, fmt: Optional[str]) -> str:
+    if fmt:
+        return fmt
+    return "csv" if path.lower().endswith(".csv") else "ndjson"
+
+
+async def export(args) -> int:
+    out = sys.stdout if args.file == "-" else open(args.file, "w", encoding="utf-8", newline="")
+    try:
+        async for chunk in bulk_io.export_table(args.table, _guess_format(args.file, args.format), args.batch_size):
+            out.write(chunk)
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    return 0
+
+
+def _read_checkpoint(path: Optional[str], args) -> int:
+    if not path or not os.path.exists(path):
+        return 0
+    with open(path) as f:
+        checkpoint = json.load(f)
+    if checkpoint.get("table") != args.table or checkpoint.get("file") != os.path.abspath(args.file):
+        raise SystemExit(f"{path} is the checkpoint of another import ({checkpoint.get('table')} from {checkpoint.get('file')})")
+    return checkpoint["records"]
+
+
+async def import_(args) -> int:
+    skip = _read_checkpoint(args.checkpoint, args)
+    if skip:
+        print(f"resuming after record {skip}", file=sys.stderr)
+    errors = open(args.errors, "a", encoding="utf-8") if args.errors else None
+    reported = 0
+
+    async def on_batch(report: bulk_io.ImportReport) -> None:
+        nonlocal reported
+        for error in report.errors[reported:]:
+            if errors is not None:
+                errors.write(json.dumps(error) + "\n")
+                errors.flush()
+            print(f"batch {error['batch']} (lines {error['first_line']}-{error['last_line']}): "
+                  f"{error['error'] or str(len(error['rejected'])) + ' records rejected'}", file=sys.stderr)
+        reported = len(report.errors)
+        # the error report is written before the checkpoint, a resumed import never loses one
+        if args.checkpoint:
+            with open(args.checkpoint + ".tmp", "w") as f:
+                json.dump({"table": args.table, "file": os.path.abspath(args.file), "records": report.records}, f)
+            os.replace(args.checkpoint + ".tmp", args.checkpoint)
+
+    try:
+        report = await bulk_io.import_table(
+            args.table, _file_lines(args.file), _guess_format(args.file, args.format), args.batch_size,
+            skip=skip, use_copy=not args.no_copy, reconcile=not args.no_reconcile, on_batch=on_batch,
+        )
+    finally:
+        if errors is not None:
+            errors.close()
+    print(f"{report.table}: {report.inserted} rows inserted, {report.rejected} records rejected, "
+          f"{report.failed_batches} of {report.batches} batches failed", file=sys.stderr)
+    return 1 if report.errors else 0
+
+
+async def main(args) -> int:
+    try:
+        return await (export(args) if args.command == "export" else import_(args))
+    except ValueError as e:
+        print(e, file=sys.stderr)
+        return 2
+    finally:
+        # close pooled connections, aiosqlite's worker threads would keep the process alive
+        await async_engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Bulk import and export of tables as NDJSON or CSV")
+    parser.add_argument("command", choices=("import", "export"))
+    parser.add_argument("table", choices=list(bulk_io.TABLES), help="tables, in the order to import them")
+    parser.add_argument("file", help="NDJSON or CSV file, - for stdin / stdout")
+    parser.add_argument("--format", choices=bulk_io.FORMATS, help="default: csv for .csv files, else ndjson")
+    parser.add_argument("--batch-size", type=int, default=None)
+    parser.add_argument("--checkpoint", metavar="FILE", help="import: progress file to resume from")
+    parser.add_argument("--errors", metavar="FILE", help="import: append the report of failed batches as NDJSON")
+    parser.add_argument("--no-copy", action="store_true", help="import: multi-row INSERTs instead of COPY on PostgreSQL")
+    parser.add_argument("--no-reconcile", action="store_true", help="import: leave follower, like and comment counters as imported")
+    args = parser.parse_args()
+    if args.batch_size is None:
+        args.batch_size = bulk_io.BULK_EXPORT_BATCH_SIZE if args.command == "export" else bulk_io.BULK_BATCH_SIZE
+    sys.exit(asyncio.run(main(args)))
@@ -0,0 +1,130 @@
+import asyncio
+import datetime
+import json
+import re
+import sys
+import uuid
+from typing import Awaitable, Callable, List, Tuple
+
+from sqlalchemy import event, func, select, text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.db.database import AsyncSessionLocal, async_engine
+from app.models.models import Base, ConversationParticipants, Messages, Posts as Post, Users
+from app.repositories import comment_repository, follower_repository, message_repository, post_repository
+from app.services import feed_service, search_service
+
+# check that the queries behind the hot routes are served by indexes: every statement the
+# route's repository call issues is run through EXPLAIN, and any full table scan fails the check.
+# usage: python -m app.jobs.check_query_plans   (against a migrated database, exit code 1 on failure)
+# tests/test_query_plans.py runs the same checks against the test database.
+#
+# PostgreSQL runs the plans with enable_seqscan off, so small or empty tables do not hide a
+# missing index behind a cheaper sequential scan.
+
+Check = Callable[[AsyncSession, dict], Awaitable[object]]
+
+CHECKS: List[Tuple[str, Check]] = [
+    ("posts page", lambda db, ids: post_repository.get_posts_page(db, 20)),
+    ("posts page after cursor", lambda db, ids: post_repository.get_posts_page(
+        db, 20, post_repository.encode_cursor(datetime.datetime.utcnow(), 2**31 - 1))),
+    ("user posts", lambda db, ids: db.scalars(select(Post).where(Post.user_id == ids["user"]))),
+    ("feed", lambda db, ids: feed_service.get_feed(db, ids["user"], 20)),
+    ("comment thread", lambda db, ids: comment_repository.get_comments_page(db, ids["post"], 20)),
+    ("embedded comments", lambda db, ids: comment_repository.get_first_comments(db, [ids["post"]], 3)),
+    ("messages page", lambda db, ids: message_repository.get_messages_page(db, ids["room"], 50)),
+    ("inbox", lambda db, ids: message_repository.get_inbox_page(db, ids["user"], 20)),
+    ("followers", lambda db, ids: follower_repository.list_followers(db, ids["user"])),
+    ("following", lambda db, ids: follower_repository.list_following(db, ids["user"])),
+    ("rooms of user", lambda db, ids: db.scalars(
+        select(ConversationParticipants.room_id).where(ConversationParticipants.user_id == ids["user"]))),
+]
+
+NATIVE_SEARCH_CHECKS: List[Tuple[str, Check]] = [
+    ("search posts and comments", lambda db, ids: search_service.search(db, "hello", ("post", "comment"))),
+    ("search users", lambda db, ids: search_service.search(db, "hello", ("user",))),
+]
+
+# "SCAN posts" is a full scan, "SCAN posts USING INDEX ..." walks an index in order
+_sqlite_scan_re = re.compile(r"^SCAN (\w+)$")
+
+
+async def sample_ids(db: AsyncSession) -> dict:
+    return {
+        "user": await db.scalar(select(func.min(Users.id))) or 1,
+        "post": await db.scalar(select(func.min(Post.id))) or 1,
+        "room": await db.scalar(select(Messages.room_id).limit(1)) or uuid.uuid4(),
+    }
+
+
+async def _capture(db: AsyncSession, check: Check, ids: dict) -> List[Tuple[str, object]]:
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append((statement, parameters))
+
+    event.listen(async_engine.sync_engine, "before_cursor_execute", record)
+    try:
+        await check(db, ids)
+    finally:
+        event.remove(async_engine.sync_engine, "before_cursor_execute", record)
+    return statements
+
+
+def _postgres_seq_scans(node: dict) -> List[str]:
+    scans = [node["Relation Name"]] if node.get("Node Type") == "Seq Scan" else []
+    for child in node.get("Plans", []):
+        scans += _postgres_seq_scans(child)
+    return scans
+
+
+# tables read with a full scan, and the plan as text for the report
+async def _explain(db: AsyncSession, statement: str, parameters) -> Tuple[List[str], str]:
+    conn = await db.connection()
+    if conn.dialect.name == "postgresql":
+        await conn.execute(text("SET LOCAL enable_seqscan = off"))
+        result = await conn.exec_driver_sql("EXPLAIN (FORMAT JSON) " + statement, parameters)
+        plan = result.scalar()
+        plan = json.loads(plan) if isinstance(plan, str) else plan
+        return _postgres_seq_scans(plan[0]["Plan"]), json.dumps(plan[0]["Plan"], indent=2)
+    result = await conn.exec_driver_sql("EXPLAIN QUERY PLAN " + statement, parameters)
+    details = [row[-1] for row in result]
+    # subqueries and CTEs show up as scans too, only base tables count
+    scans = [m.group(1) for m in map(_sqlite_scan_re.match, details) if m and m.group(1) in Base.metadata.tables]
+    return scans, "\n".join(details)
+
+
+# the statements a check issues that read a table with a full scan, as (statement, tables, plan)
+async def find_full_scans(db: AsyncSession, check: Check, ids: dict) -> List[Tuple[str, List[str], str]]:
+    # the feed is read from the database only when it is not in the store yet
+    await feed_service.invalidate_feed(ids["user"])
+    found = []
+    for statement, parameters in await _capture(db, check, ids):
+        scans, plan = await _explain(db, statement, parameters)
+        if scans:
+            found.append((statement, scans, plan))
+    await db.rollback()
+    return found
+
+
+def checks_for(dialect: str) -> List[Tuple[str, Check]]:
+    return CHECKS + NATIVE_SEARCH_CHECKS if dialect == "postgresql" else CHECKS
+
+
+async def main() -> int:
+    failures = 0
+    async with AsyncSessionLocal() as db:
+        ids = await sample_ids(db)
+        for name, check in checks_for(db.bind.dialect.name):
+            found = await find_full_scans(db, check, ids)
+            for statement, scans, plan in found:
+                print(f"FAIL {name}: full scan of {', '.join(scans)}\n{statement}\n{plan}\n")
+            if found:
+                failures += 1
+            else:
+                print(f"ok   {name}")
+    await async_engine.dispose()
+    return 1 if failures else 0
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
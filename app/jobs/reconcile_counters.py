@@ -0,0 +1,23 @@
+import asyncio
+
+from app.db.database import AsyncSessionLocal, async_engine
+from app.repositories import comment_repository, follower_repository, like_repository
+
+# repair denormalized counters that drifted from the rows they count
+# usage: python -m app.jobs.reconcile_counters
+
+
+async def main():
+    async with AsyncSessionLocal() as db:
+        repaired = await follower_repository.reconcile_follow_counts(db)
+        print(f"follow counters repaired for {repaired} users")
+        repaired = await like_repository.reconcile_like_counts(db)
+        print(f"like counters repaired for {repaired} posts")
+        repaired = await comment_repository.reconcile_comment_counts(db)
+        print(f"comment counters repaired for {repaired} posts")
+    # close pooled connections, aiosqlite's worker threads would keep the process alive
+    await async_engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -1,6 +1,6 @@
 from typing import List, Optional
 
-from sqlalchemy import BigInteger, Boolean, CheckConstraint, DateTime, Enum, ForeignKeyConstraint, Integer, PrimaryKeyConstraint, String, Text, UniqueConstraint, Uuid, text
+from sqlalchemy import BigInteger, Boolean, CheckConstraint, DateTime, Enum, ForeignKeyConstraint, Index, Integer, PrimaryKeyConstraint, String, Text, UniqueConstraint, Uuid, text
 from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column, relationship
 import datetime
 import uuid
@@ -15,7 +15,8 @@ class Users(Base):
         CheckConstraint('followers >= 0', name='chk_followers_nonnegative'),
         CheckConstraint('following >= 0', name='chk_following_nonnegative'),
         PrimaryKeyConstraint('id', name='users_pkey'),
-        UniqueConstraint('email', name='users_email_key')
+        UniqueConstraint('email', name='users_email_key'),
+        Index('ix_users_is_online_online_at', 'is_online', 'online_at')
     )
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
@@ -25,6 +26,7 @@ class Users(Base):
     bio: Mapped[Optional[str]] = mapped_column(String(100))
     is_active: Mapped[Optional[bool]] = mapped_column(Boolean)
     is_online: Mapped[Optional[bool]] = mapped_column(Boolean)
+    online_at: Mapped[Optional[datetime.datetime]] = mapped_column(DateTime)
     created_at: Mapped[Optional[datetime.datetime]] = mapped_column(DateTime)
     profile_picture: Mapped[Optional[str]] = mapped_column(Text)
     followers: Mapped[Optional[int]] = mapped_column(Integer, server_default=text('0'))
@@ -64,7 +66,8 @@ class Follow(Base):
         CheckConstraint('follower_id <> following_id', name='not_same_follower'),
         ForeignKeyConstraint(['follower_id'], ['users.id'], name='follow_follower_id_fkey'),
         ForeignKeyConstraint(['following_id'], ['users.id'], name='follow_following_id_fkey'),
-        PrimaryKeyConstraint('follower_id', 'following_id', name='follow_pkey')
+        PrimaryKeyConstraint('follower_id', 'following_id', name='follow_pkey'),
+        Index('ix_follow_following_id', 'following_id', 'follower_id')
     )
 
     follower_id: Mapped[int] = mapped_column(Integer, primary_key=True)
@@ -79,8 +82,11 @@ class Posts(Base):
     __tablename__ = 'posts'
     __table_args__ = (
         CheckConstraint('likes >= 0', name='chk_likes_nonnegative'),
+        CheckConstraint('comment_count >= 0', name='chk_comment_count_nonnegative'),
         ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE', name='posts_user_id_fkey'),
-        PrimaryKeyConstraint('id', name='posts_pkey')
+        PrimaryKeyConstraint('id', name='posts_pkey'),
+        Index('ix_posts_created_at_id', 'created_at', 'id'),
+        Index('ix_posts_user_id_created_at', 'user_id', 'created_at', 'id')
     )
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
@@ -88,7 +94,8 @@ class Posts(Base):
     post_type: Mapped[Optional[str]] = mapped_column(Enum('text', 'image', 'video', name='posttype'))
     post_text: Mapped[Optional[str]] = mapped_column(String(1000))
     likes: Mapped[Optional[int]] = mapped_column(Integer)
-    created_at: Mapped[Optional[datetime.datetime]] = mapped_column(DateTime)
+    created_at: Mapped[datetime.datetime] = mapped_column(DateTime, nullable=False)
+    comment_count: Mapped[Optional[int]] = mapped_column(Integer, server_default=text('0'))
 
     user: Mapped[Optional['Users']] = relationship('Users', back_populates='posts')
     comment: Mapped[List['Comment']] = relationship('Comment', back_populates='post')
@@ -100,7 +107,8 @@ class Comment(Base):
     __table_args__ = (
         ForeignKeyConstraint(['post_id'], ['posts.id'], ondelete='CASCADE', name='comment_post_id_fkey'),
         ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE', name='comment_user_id_fkey'),
-        PrimaryKeyConstraint('id', name='comment_pkey')
+        PrimaryKeyConstraint('id', name='comment_pkey'),
+        Index('ix_comment_post_id_created_at', 'post_id', 'created_at', 'id')
     )
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
@@ -121,12 +129,14 @@ class ConversationParticipants(Base):
         ForeignKeyConstraint(['room_id'], ['conversations.room_id'], ondelete='CASCADE', name='conversation_participants_room_id_fkey'),
         ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE', name='conversation_participants_user_id_fkey'),
         PrimaryKeyConstraint('id', name='conversation_participants_pkey'),
-        UniqueConstraint('room_id', 'user_id', name='conversation_participants_room_id_user_id_key')
+        UniqueConstraint('room_id', 'user_id', name='conversation_participants_room_id_user_id_key'),
+        Index('ix_conversation_participants_user_id', 'user_id', 'room_id')
     )
 
     id: Mapped[uuid.UUID] = mapped_column(Uuid, primary_key=True, server_default=text('uuid_generate_v4()'))
     room_id: Mapped[uuid.UUID] = mapped_column(Uuid)
     user_id: Mapped[int] = mapped_column(Integer)
+    last_read_at: Mapped[Optional[datetime.datetime]] = mapped_column(DateTime)
 
     room: Mapped['Conversations'] = relationship('Conversations', back_populates='conversation_participants')
     user: Mapped['Users'] = relationship('Users', back_populates='conversation_participants')
@@ -137,7 +147,8 @@ class Likes(Base):
     __table_args__ = (
         ForeignKeyConstraint(['post_id'], ['posts.id'], ondelete='CASCADE', name='likes_post_id_fkey'),
         ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE', name='likes_user_id_fkey'),
-        PrimaryKeyConstraint('user_id', 'post_id', name='likes_pkey')
+        PrimaryKeyConstraint('user_id', 'post_id', name='likes_pkey'),
+        Index('ix_likes_post_id', 'post_id')
     )
 
     user_id: Mapped[int] = mapped_column(Integer, primary_key=True)
@@ -153,7 +164,8 @@ class Messages(Base):
     __table_args__ = (
         ForeignKeyConstraint(['room_id'], ['conversations.room_id'], ondelete='CASCADE', name='messages_room_id_fkey'),
         ForeignKeyConstraint(['sender_id'], ['users.id'], name='messages_sender_id_fkey'),
-        PrimaryKeyConstraint('message_id', name='messages_pkey')
+        PrimaryKeyConstraint('message_id', name='messages_pkey'),
+        Index('ix_messages_room_id_sent_at', 'room_id', 'sent_at', 'message_id')
     )
 
     message_id: Mapped[uuid.UUID] = mapped_column(Uuid, primary_key=True, server_default=text('uuid_generate_v4()'))
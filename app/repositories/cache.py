@@ -0,0 +1,169 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+# read-through cache for serialized objects (JSON strings) looked up by the repositories.
+# Keys are "<kind>:<id>"; hit/miss counters are kept per kind for /metrics.
+
+CACHE_URL = os.getenv("CACHE_URL", "")
+CACHE_TTL = float(os.getenv("CACHE_TTL", "60"))
+CACHE_MAX_ENTRIES = int(os.getenv("CACHE_MAX_ENTRIES", "10000"))
+
+
+class CacheStats:
+    def __init__(self):
+        self.hits: Dict[str, int] = {}
+        self.misses: Dict[str, int] = {}
+        self.evictions = 0
+
+    def record(self, key: str, hit: bool) -> None:
+        kind = key.split(":", 1)[0]
+        counter = self.hits if hit else self.misses
+        counter[kind] = counter.get(kind, 0) + 1
+
+
+class ObjectCache:
+    def __init__(self, ttl: float = CACHE_TTL):
+        self.ttl = ttl
+        self.stats = CacheStats()
+
+    async def get(self, key: str) -> Optional[str]:
+        value = await self._get(key)
+        self.stats.record(key, value is not None)
+        return value
+
+    async def get_many(self, keys: List[str]) -> Dict[str, str]:
+        values = await self._get_many(keys)
+        found = {}
+        for key, value in zip(keys, values):
+            self.stats.record(key, value is not None)
+            if value is not None:
+                found[key] = value
+        return found
+
+    async def set(self, key: str, value: str) -> None:
+        await self._set(key, value)
+
+    async def set_many(self, items: Dict[str, str]) -> None:
+        for key, value in items.items():
+            await self._set(key, value)
+
+    async def delete(self, *keys: str) -> None:
+        if keys:
+            await self._delete(keys)
+
+    async def close(self) -> None:
+        pass
+
+    async def _get(self, key: str) -> Optional[str]:
+        raise NotImplementedError
+
+    async def _get_many(self, keys: List[str]) -> List[Optional[str]]:
+        return [await self._get(key) for key in keys]
+
+    async def _set(self, key: str, value: str) -> None:
+        raise NotImplementedError
+
+    async def _delete(self, keys) -> None:
+        raise NotImplementedError
+
+
+# per-process LRU with TTL
+class InMemoryCache(ObjectCache):
+    def __init__(self, ttl: float = CACHE_TTL, max_entries: int = CACHE_MAX_ENTRIES):
+        super().__init__(ttl)
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    async def _get(self, key: str) -> Optional[str]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    async def _set(self, key: str, value: str) -> None:
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.stats.evictions += 1
+
+    async def _delete(self, keys) -> None:
+        with self._lock:
+            for key in keys:
+                self._entries.pop(key, None)
+
+
+# shared between workers; needs the optional `redis` package, eviction is left to Redis
+class RedisCache(ObjectCache):
+    key_prefix = "cache:"
+
+    def __init__(self, url: str, ttl: float = CACHE_TTL):
+        super().__init__(ttl)
+        try:
+            import redis.asyncio as redis
+        except ImportError:
+            raise RuntimeError("CACHE_URL points at Redis but the `redis` package is not installed")
+        self.redis = redis.from_url(url, decode_responses=True)
+
+    async def _get(self, key: str) -> Optional[str]:
+        return await self.redis.get(self.key_prefix + key)
+
+    async def _get_many(self, keys: List[str]) -> List[Optional[str]]:
+        if not keys:
+            return []
+        return await self.redis.mget([self.key_prefix + key for key in keys])
+
+    async def _set(self, key: str, value: str) -> None:
+        await self.redis.set(self.key_prefix + key, value, px=int(self.ttl * 1000))
+
+    async def set_many(self, items: Dict[str, str]) -> None:
+        async with self.redis.pipeline(transaction=False) as pipe:
+            for key, value in items.items():
+                pipe.set(self.key_prefix + key, value, px=int(self.ttl * 1000))
+            await pipe.execute()
+
+    async def _delete(self, keys) -> None:
+        await self.redis.delete(*(self.key_prefix + key for key in keys))
+
+    async def close(self) -> None:
+        await self.redis.close()
+
+
+def create_cache(url: str = CACHE_URL) -> ObjectCache:
+    if url.startswith(("redis://", "rediss://")):
+        return RedisCache(url)
+    return InMemoryCache()
+
+
+object_cache: ObjectCache = create_cache()
+
+
+def render_cache_metrics() -> str:
+    stats = object_cache.stats
+    lines = [
+        "# HELP object_cache_hits_total Cache lookups served from the cache.",
+        "# TYPE object_cache_hits_total counter",
+    ]
+    lines += [f'object_cache_hits_total{{kind="{kind}"}} {count}' for kind, count in sorted(stats.hits.items())]
+    lines += [
+        "# HELP object_cache_misses_total Cache lookups that went to the database.",
+        "# TYPE object_cache_misses_total counter",
+    ]
+    lines += [f'object_cache_misses_total{{kind="{kind}"}} {count}' for kind, count in sorted(stats.misses.items())]
+    lines += [
+        "# HELP object_cache_evictions_total Entries evicted to stay under CACHE_MAX_ENTRIES.",
+        "# TYPE object_cache_evictions_total counter",
+        f"object_cache_evictions_total {stats.evictions}",
+    ]
+    return "\n".join(lines) + "\n"
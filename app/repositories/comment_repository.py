@@ -0,0 +1,106 @@
+import datetime
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import and_, func, select, tuple_, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.models import Comment, Posts as Post
+from app.repositories.post_repository import decode_cursor, encode_cursor
+from app.schema.schema import CommentOut, PostOut
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+MAX_EMBEDDED_COMMENTS = 10
+RECONCILE_BATCH_SIZE = 10000
+
+
+# the comment row and the post's comment_count change in the same transaction
+async def create_comment(db: AsyncSession, user_id: int, post_id: int, comment_type, comment: str) -> Comment:
+    db_comment = Comment(
+        user_id=user_id,
+        post_id=post_id,
+        comment_type=comment_type,
+        comment=comment,
+        likes=0,
+        created_at=datetime.datetime.utcnow()
+    )
+    db.add(db_comment)
+    await db.execute(
+        update(Post)
+        .where(Post.id == post_id)
+        .values(comment_count=func.coalesce(Post.comment_count, 0) + 1)
+        .execution_options(synchronize_session=False)
+    )
+    await db.commit()
+    await db.refresh(db_comment)
+    return db_comment
+
+
+# a post's thread, oldest first, keyset on (created_at, id)
+async def get_comments_page(db: AsyncSession, post_id: int, limit: int = DEFAULT_PAGE_SIZE,
+                            cursor: Optional[str] = None) -> Tuple[List[Comment], Optional[str]]:
+    query = select(Comment).where(Comment.post_id == post_id)
+    if cursor:
+        created_at, comment_id = decode_cursor(cursor)
+        query = query.where(tuple_(Comment.created_at, Comment.id) > tuple_(created_at, comment_id))
+    query = query.order_by(Comment.created_at, Comment.id).limit(limit + 1)
+
+    comments = list(await db.scalars(query))
+    next_cursor = None
+    if len(comments) > limit:
+        comments = comments[:limit]
+        next_cursor = encode_cursor(comments[-1].created_at, comments[-1].id)
+    return comments, next_cursor
+
+
+# the first `count` comments of each post, for a whole page of posts in one query
+async def get_first_comments(db: AsyncSession, post_ids: List[int], count: int) -> Dict[int, List[Comment]]:
+    if not post_ids or count <= 0:
+        return {}
+    position = func.row_number().over(
+        partition_by=Comment.post_id, order_by=(Comment.created_at, Comment.id)
+    ).label("position")
+    ranked = select(Comment.id, position).where(Comment.post_id.in_(post_ids)).subquery()
+    query = (
+        select(Comment)
+        .join(ranked, ranked.c.id == Comment.id)
+        .where(ranked.c.position <= count)
+        .order_by(Comment.post_id, ranked.c.position)
+    )
+    comments: Dict[int, List[Comment]] = {}
+    for comment in await db.scalars(query):
+        comments.setdefault(comment.post_id, []).append(comment)
+    return comments
+
+
+# a page of posts (entities or post_repository.POST_COLUMNS rows) with the start of each thread
+# embedded; posts are returned as-is when count is 0
+async def embed_first_comments(db: AsyncSession, posts: list, count: int) -> list:
+    if count <= 0:
+        return posts
+    first = await get_first_comments(db, [post.id for post in posts], count)
+    return [
+        PostOut.model_validate(post).model_copy(
+            update={"comments": [CommentOut.model_validate(c) for c in first.get(post.id, [])]}
+        )
+        for post in posts
+    ]
+
+
+# recompute posts.comment_count where it drifted, one id range per transaction;
+# returns the number of posts repaired
+async def reconcile_comment_counts(db: AsyncSession, batch_size: int = RECONCILE_BATCH_SIZE) -> int:
+    comments = select(func.count()).where(Comment.post_id == Post.id).scalar_subquery()
+    max_id = await db.scalar(select(func.max(Post.id))) or 0
+
+    repaired = 0
+    for start in range(0, max_id + 1, batch_size):
+        result = await db.execute(
+            update(Post)
+            .where(and_(Post.id >= start, Post.id < start + batch_size, func.coalesce(Post.comment_count, -1) != comments))
+            .values(comment_count=comments)
+            .execution_options(synchronize_session=False)
+        )
+        await db.commit()
+        repaired += result.rowcount
+    return repaired
@@ -1,14 +1,162 @@
-import os, shutil
+import asyncio
+import hashlib
+import logging
+import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Optional
+
 from fastapi import UploadFile
+from fastapi.concurrency import run_in_threadpool
 
 BASE_UPLOAD_PATH = "uploads"
+# content-addressed store: objects/<sha256>, thumbnails next to it as <sha256>_<size>;
+# objects written before names dropped the extension keep it (objects/<sha256><ext>)
+OBJECTS_DIR = "objects"
+TMP_DIR = "tmp"
+
+CHUNK_SIZE = 1024 * 1024
+# checked against Content-Length before the body is read (app/api/upload_limit.py), and
+# again while the spooled upload is copied into the store
+MAX_UPLOAD_BYTES = int(os.getenv("MAX_UPLOAD_BYTES", str(10 * 1024 * 1024)))
+THUMBNAIL_SIZES = [int(size) for size in os.getenv("THUMBNAIL_SIZES", "64,256").split(",") if size]
+THUMBNAIL_WORKERS = int(os.getenv("THUMBNAIL_WORKERS", "2"))
+IMAGE_EXTENSIONS = {".jpg", ".jpeg", ".png", ".gif", ".webp"}
+IMAGE_SIGNATURES = (
+    (b"\xff\xd8\xff", "image/jpeg"),
+    (b"\x89PNG\r\n\x1a\n", "image/png"),
+    (b"GIF87a", "image/gif"),
+    (b"GIF89a", "image/gif"),
+)
+
+logger = logging.getLogger(__name__)
+
+_thumbnail_pool: Optional[ProcessPoolExecutor] = None
+
+
+class UploadTooLarge(ValueError):
+    pass
+
+
+class UnsupportedMediaType(ValueError):
+    pass
+
+
+def _store(source) -> str:
+    tmp_dir = os.path.join(BASE_UPLOAD_PATH, TMP_DIR)
+    objects_dir = os.path.join(BASE_UPLOAD_PATH, OBJECTS_DIR)
+    os.makedirs(tmp_dir, exist_ok=True)
+    os.makedirs(objects_dir, exist_ok=True)
+
+    digest = hashlib.sha256()
+    size = 0
+    fd, tmp_path = tempfile.mkstemp(dir=tmp_dir)
+    try:
+        with os.fdopen(fd, "wb") as buffer:
+            while chunk := source.read(CHUNK_SIZE):
+                size += len(chunk)
+                if size > MAX_UPLOAD_BYTES:
+                    raise UploadTooLarge(f"File is larger than {MAX_UPLOAD_BYTES} bytes")
+                digest.update(chunk)
+                buffer.write(chunk)
+
+        # keyed by content alone, so the same bytes uploaded as .jpg and .jpeg are one file
+        filename = f"{OBJECTS_DIR}/{digest.hexdigest()}"
+        final_path = os.path.join(BASE_UPLOAD_PATH, filename)
+        if os.path.exists(final_path):
+            # identical content was uploaded before, keep the existing copy
+            os.remove(tmp_path)
+        else:
+            os.replace(tmp_path, final_path)
+        return filename
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+# copy the upload, which Starlette has already spooled, in chunks, hashing as it goes, and
+# move it into the object store; returns the path relative to BASE_UPLOAD_PATH
+async def save_file(file: UploadFile) -> str:
+    ext = os.path.splitext(file.filename or "")[1].lower()
+    if ext not in IMAGE_EXTENSIONS:
+        raise UnsupportedMediaType(f"Unsupported file type '{ext}'")
+    return await run_in_threadpool(_store, file.file)
+
+
+# stored names carry no extension, so the type is read from the first bytes of the file
+def sniff_media_type(path: str) -> str:
+    with open(path, "rb") as f:
+        head = f.read(12)
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return "image/webp"
+    for signature, media_type in IMAGE_SIGNATURES:
+        if head.startswith(signature):
+            return media_type
+    return "application/octet-stream"
+
+
+def thumbnail_name(filename: str, size: int) -> str:
+    stem, ext = os.path.splitext(filename)
+    return f"{stem}_{size}{ext}"
+
+
+# runs in a worker process
+def _make_thumbnails(path: str, sizes) -> None:
+    from PIL import Image
+
+    stem, ext = os.path.splitext(path)
+    with Image.open(path) as image:
+        for size in sizes:
+            target = f"{stem}_{size}{ext}"
+            if os.path.exists(target):
+                continue
+            thumbnail = image.copy()
+            thumbnail.thumbnail((size, size))
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=ext)
+            os.close(fd)
+            thumbnail.save(tmp_path, format=image.format)
+            os.replace(tmp_path, target)
+
+
+def _get_thumbnail_pool() -> ProcessPoolExecutor:
+    global _thumbnail_pool
+    if _thumbnail_pool is None:
+        _thumbnail_pool = ProcessPoolExecutor(max_workers=THUMBNAIL_WORKERS)
+    return _thumbnail_pool
+
+
+# meant to run as a background task, after the response is sent
+async def generate_thumbnails(filename: str) -> None:
+    path = os.path.join(BASE_UPLOAD_PATH, filename)
+    try:
+        await asyncio.get_running_loop().run_in_executor(_get_thumbnail_pool(), _make_thumbnails, path, THUMBNAIL_SIZES)
+    except Exception:
+        logger.exception("Generating thumbnails for %s failed", filename)
+
+
+def shutdown_thumbnail_pool() -> None:
+    global _thumbnail_pool
+    if _thumbnail_pool is not None:
+        _thumbnail_pool.shutdown(wait=False, cancel_futures=True)
+        _thumbnail_pool = None
+
 
-def save_file(user_id: int, file: UploadFile) -> str:
-    user_dir = os.path.join(BASE_UPLOAD_PATH, f"user_{user_id}")
-    os.makedirs(user_dir, exist_ok=True)
+# public URL of a stored picture; pictures uploaded before the object store are kept per user
+def media_url(user_id: int, filename: str, size: Optional[int] = None) -> str:
+    if "/" not in filename:
+        return f"/media/user_{user_id}/{filename}"
+    if size is not None:
+        thumbnail = thumbnail_name(filename, size)
+        if os.path.exists(os.path.join(BASE_UPLOAD_PATH, thumbnail)):
+            return f"/media/{thumbnail}"
+    return f"/media/{filename}"
 
-    file_path = os.path.join(user_dir, file.filename)
-    with open(file_path, "wb") as buffer:
-        shutil.copyfileobj(file.file, buffer)
 
-    return file.filename
+def media_variants(user_id: int, filename: str) -> Dict[str, str]:
+    variants = {"original": media_url(user_id, filename)}
+    for size in THUMBNAIL_SIZES:
+        url = media_url(user_id, filename, size)
+        if url != variants["original"]:
+            variants[str(size)] = url
+    return variants
@@ -1,9 +1,118 @@
-from app.models.models import Follow
-from sqlalchemy.orm import Session
+import datetime
+from typing import List, Optional, Set, Tuple
 
-def get_follower(db: Session, user_id: int) -> Follow:
-    return db.query(Follow).filter(Follow.follower_id == user_id).count()
+from app.models.models import Follow, Users
+from app.repositories.user_repository import invalidate_user
+from sqlalchemy import case, delete, func, or_, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
 
+RECONCILE_BATCH_SIZE = 10000
 
-def get_following(db: Session, user_id: int) -> Follow:
-    return db.query(Follow).filter(Follow.following_id == user_id).count()
+
+# number of users `user_id` follows, read from the counter on users
+async def get_follower(db: AsyncSession, user_id: int) -> int:
+    return await db.scalar(select(func.coalesce(Users.following, 0)).where(Users.id == user_id)) or 0
+
+
+# number of users following `user_id`, read from the counter on users
+async def get_following(db: AsyncSession, user_id: int) -> int:
+    return await db.scalar(select(func.coalesce(Users.followers, 0)).where(Users.id == user_id)) or 0
+
+
+# both counters are moved in one statement, in the same transaction as the follow row
+async def _adjust_follow_counts(db: AsyncSession, follower_id: int, following_id: int, delta: int) -> None:
+    await db.execute(
+        update(Users)
+        .where(Users.id.in_([follower_id, following_id]))
+        .values(
+            following=func.coalesce(Users.following, 0) + case((Users.id == follower_id, delta), else_=0),
+            followers=func.coalesce(Users.followers, 0) + case((Users.id == following_id, delta), else_=0),
+        )
+        .execution_options(synchronize_session=False)
+    )
+
+
+async def follow_user(db: AsyncSession, follower_id: int, following_id: int) -> Follow:
+    new_follow = Follow(follower_id=follower_id, following_id=following_id, created_at=datetime.datetime.utcnow())
+    db.add(new_follow)
+    await db.flush()
+    await _adjust_follow_counts(db, follower_id, following_id, 1)
+    await db.commit()
+    await invalidate_user(follower_id, following_id)
+    return new_follow
+
+
+# returns False when there was nothing to unfollow
+async def unfollow_user(db: AsyncSession, follower_id: int, following_id: int) -> bool:
+    result = await db.execute(
+        delete(Follow).where(Follow.follower_id == follower_id, Follow.following_id == following_id)
+    )
+    if not result.rowcount:
+        await db.rollback()
+        return False
+    await _adjust_follow_counts(db, follower_id, following_id, -1)
+    await db.commit()
+    await invalidate_user(follower_id, following_id)
+    return True
+
+
+# recompute the counters from the follow table for users whose stored values drifted,
+# one id range per transaction; returns the number of users repaired
+async def reconcile_follow_counts(db: AsyncSession, batch_size: int = RECONCILE_BATCH_SIZE) -> int:
+    followers = select(func.count()).where(Follow.following_id == Users.id).scalar_subquery()
+    following = select(func.count()).where(Follow.follower_id == Users.id).scalar_subquery()
+    max_id = await db.scalar(select(func.max(Users.id))) or 0
+
+    repaired = 0
+    for start in range(0, max_id + 1, batch_size):
+        result = await db.execute(
+            update(Users)
+            .where(
+                Users.id >= start, Users.id < start + batch_size,
+                or_(func.coalesce(Users.followers, -1) != followers, func.coalesce(Users.following, -1) != following),
+            )
+            .values(followers=followers, following=following)
+            .execution_options(synchronize_session=False)
+        )
+        await db.commit()
+        repaired += result.rowcount
+    return repaired
+
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+MAX_LOOKUP_IDS = 500
+
+
+# users on the other side of `user_id`'s follow rows, one join, ordered by user id;
+# `after` is the last id of the previous page
+async def _list_follow_users(db: AsyncSession, user_column, other_column, user_id: int, limit: int,
+                             after: Optional[int]) -> Tuple[List[dict], Optional[int]]:
+    query = (
+        select(Users.id, Users.name, Users.profile_picture)
+        .join(Follow, other_column == Users.id)
+        .where(user_column == user_id)
+    )
+    if after is not None:
+        query = query.where(Users.id > after)
+    rows = (await db.execute(query.order_by(Users.id).limit(limit + 1))).mappings().all()
+    next_after = rows[limit - 1]["id"] if len(rows) > limit else None
+    return rows[:limit], next_after
+
+
+async def list_followers(db: AsyncSession, user_id: int, limit: int = DEFAULT_PAGE_SIZE,
+                         after: Optional[int] = None) -> Tuple[List[dict], Optional[int]]:
+    return await _list_follow_users(db, Follow.following_id, Follow.follower_id, user_id, limit, after)
+
+
+async def list_following(db: AsyncSession, user_id: int, limit: int = DEFAULT_PAGE_SIZE,
+                         after: Optional[int] = None) -> Tuple[List[dict], Optional[int]]:
+    return await _list_follow_users(db, Follow.follower_id, Follow.following_id, user_id, limit, after)
+
+
+# which of `target_ids` `user_id` follows, in one query
+async def get_followed_ids(db: AsyncSession, user_id: int, target_ids: List[int]) -> Set[int]:
+    if not target_ids:
+        return set()
+    query = select(Follow.following_id).where(Follow.follower_id == user_id, Follow.following_id.in_(target_ids))
+    return set(await db.scalars(query))
@@ -0,0 +1,62 @@
+import datetime
+from typing import List, Set
+
+from sqlalchemy import and_, delete, func, insert, select, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.models import Likes, Posts as Post
+
+MAX_LOOKUP_IDS = 500
+RECONCILE_BATCH_SIZE = 10000
+
+_UPSERT_DIALECTS = {"postgresql": postgresql.insert, "sqlite": sqlite.insert}
+
+
+# returns True when the like is new, liking twice is a no-op
+async def like_post(db: AsyncSession, user_id: int, post_id: int) -> bool:
+    values = {"user_id": user_id, "post_id": post_id, "created_at": datetime.datetime.utcnow()}
+    upsert = _UPSERT_DIALECTS.get(db.bind.dialect.name)
+    if upsert is not None:
+        result = await db.execute(upsert(Likes).values(**values).on_conflict_do_nothing())
+        await db.commit()
+        return result.rowcount == 1
+    if await db.get(Likes, (user_id, post_id)):
+        return False
+    await db.execute(insert(Likes).values(**values))
+    await db.commit()
+    return True
+
+
+# returns True when a like was removed
+async def unlike_post(db: AsyncSession, user_id: int, post_id: int) -> bool:
+    result = await db.execute(delete(Likes).where(Likes.user_id == user_id, Likes.post_id == post_id))
+    await db.commit()
+    return result.rowcount == 1
+
+
+# which of `post_ids` the user has liked, in one query
+async def get_liked_post_ids(db: AsyncSession, user_id: int, post_ids: List[int]) -> Set[int]:
+    if not post_ids:
+        return set()
+    query = select(Likes.post_id).where(Likes.user_id == user_id, Likes.post_id.in_(post_ids))
+    return set(await db.scalars(query))
+
+
+# recompute posts.likes from the likes table where it drifted, one id range per
+# transaction; returns the number of posts repaired
+async def reconcile_like_counts(db: AsyncSession, batch_size: int = RECONCILE_BATCH_SIZE) -> int:
+    likes = select(func.count()).where(Likes.post_id == Post.id).scalar_subquery()
+    max_id = await db.scalar(select(func.max(Post.id))) or 0
+
+    repaired = 0
+    for start in range(0, max_id + 1, batch_size):
+        result = await db.execute(
+            update(Post)
+            .where(and_(Post.id >= start, Post.id < start + batch_size, func.coalesce(Post.likes, -1) != likes))
+            .values(likes=likes)
+            .execution_options(synchronize_session=False)
+        )
+        await db.commit()
+        repaired += result.rowcount
+    return repaired
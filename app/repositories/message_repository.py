@@ -0,0 +1,137 @@
+import base64
+import datetime
+import uuid
+from typing import List, Optional, Tuple
+
+from sqlalchemy import func, or_, select, tuple_, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import aliased
+
+from app.models.models import ConversationParticipants, Conversations, Messages
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+DEFAULT_INBOX_PAGE_SIZE = 20
+MAX_INBOX_PAGE_SIZE = 100
+
+MessageKey = Tuple[datetime.datetime, str]
+
+
+# cursor is an opaque token built from the (sent_at, message_id) of a message
+def encode_cursor(sent_at: datetime.datetime, message_id) -> str:
+    raw = f"{sent_at.isoformat()}|{message_id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_cursor(cursor: str) -> MessageKey:
+    try:
+        raw = base64.urlsafe_b64decode(cursor.encode()).decode()
+        sent_at, message_id = raw.split("|", 1)
+        return datetime.datetime.fromisoformat(sent_at), str(uuid.UUID(message_id))
+    except Exception:
+        raise ValueError("Invalid cursor")
+
+
+def to_dict(message: Messages) -> dict:
+    return {
+        "message_id": str(message.message_id),
+        "room_id": str(message.room_id),
+        "sender_id": message.sender_id,
+        "content": message.content,
+        "sent_at": message.sent_at,
+    }
+
+
+# one page of a room's history in chronological order: the newest messages by default,
+# or the ones right before / after a cursor
+async def get_messages_page(db: AsyncSession, room_id: uuid.UUID, limit: int = DEFAULT_PAGE_SIZE,
+                            before: Optional[MessageKey] = None, after: Optional[MessageKey] = None) -> List[dict]:
+    key = tuple_(Messages.sent_at, Messages.message_id)
+    query = select(Messages).where(Messages.room_id == room_id)
+    if after:
+        query = query.where(key > tuple_(after[0], uuid.UUID(after[1])))
+        query = query.order_by(Messages.sent_at, Messages.message_id).limit(limit)
+        return [to_dict(m) for m in await db.scalars(query)]
+    if before:
+        query = query.where(key < tuple_(before[0], uuid.UUID(before[1])))
+    query = query.order_by(Messages.sent_at.desc(), Messages.message_id.desc()).limit(limit)
+    return [to_dict(m) for m in reversed((await db.scalars(query)).all())]
+
+
+# the rooms a user takes part in, most recent activity first (the last message, or when the room
+# was created), each with its last message and how many messages from others came after the
+# user's read cursor. One statement: the last message and the unread count are correlated
+# subqueries per room, both answered from ix_messages_room_id_sent_at. Keyset on (activity, room_id).
+async def get_inbox_page(db: AsyncSession, user_id: int, limit: int = DEFAULT_INBOX_PAGE_SIZE,
+                         cursor: Optional[str] = None) -> Tuple[List[dict], Optional[str]]:
+    last_message_id = (
+        select(Messages.message_id)
+        .where(Messages.room_id == ConversationParticipants.room_id)
+        .order_by(Messages.sent_at.desc(), Messages.message_id.desc())
+        .limit(1)
+        .scalar_subquery()
+    )
+    rooms = (
+        select(
+            ConversationParticipants.room_id,
+            ConversationParticipants.last_read_at,
+            Conversations.name,
+            Conversations.is_group,
+            Conversations.created_at,
+            last_message_id.label("last_message_id"),
+        )
+        .join(Conversations, Conversations.room_id == ConversationParticipants.room_id)
+        .where(ConversationParticipants.user_id == user_id)
+        .subquery()
+    )
+    # its own alias, the outer query joins messages for the last message
+    counted = aliased(Messages)
+    unread = (
+        select(func.count())
+        .select_from(counted)
+        .where(
+            counted.room_id == rooms.c.room_id,
+            counted.sender_id != user_id,
+            or_(rooms.c.last_read_at.is_(None), counted.sent_at > rooms.c.last_read_at),
+        )
+        .correlate(rooms)
+        .scalar_subquery()
+    )
+    activity = func.coalesce(Messages.sent_at, rooms.c.created_at)
+    query = (
+        select(rooms, Messages, activity.label("activity"), unread.label("unread_count"))
+        .outerjoin(Messages, Messages.message_id == rooms.c.last_message_id)
+    )
+    if cursor:
+        activity_at, room_id = decode_cursor(cursor)
+        query = query.where(tuple_(activity, rooms.c.room_id) < tuple_(activity_at, uuid.UUID(room_id)))
+    query = query.order_by(activity.desc(), rooms.c.room_id.desc()).limit(limit + 1)
+
+    rows = (await db.execute(query)).all()
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1].activity, rows[-1].room_id)
+    return [{
+        "room_id": str(row.room_id),
+        "name": row.name,
+        "is_group": row.is_group,
+        "last_activity": row.activity,
+        "last_message": to_dict(row.Messages) if row.Messages is not None else None,
+        "unread_count": row.unread_count,
+    } for row in rows], next_cursor
+
+
+# move a participant's read cursor forward; an older read_at (a late request from another device) is ignored
+async def mark_read(db: AsyncSession, room_id: uuid.UUID, user_id: int, read_at: datetime.datetime) -> None:
+    await db.execute(
+        update(ConversationParticipants)
+        .where(
+            ConversationParticipants.room_id == room_id,
+            ConversationParticipants.user_id == user_id,
+            or_(ConversationParticipants.last_read_at.is_(None), ConversationParticipants.last_read_at < read_at),
+        )
+        .values(last_read_at=read_at)
+        .execution_options(synchronize_session=False)
+    )
+    await db.commit()
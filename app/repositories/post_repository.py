@@ -0,0 +1,91 @@
+import base64
+import datetime
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+
+from sqlalchemy import Row, select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.models import Posts as Post
+from app.repositories.cache import object_cache
+from app.schema.schema import PostOut
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+STREAM_BATCH_SIZE = 500
+
+# the columns PostOut needs; list pages read these as plain rows instead of loading Post entities
+POST_COLUMNS = (Post.id, Post.user_id, Post.post_type, Post.post_text, Post.likes, Post.comment_count, Post.created_at)
+
+
+# cursor is an opaque token built from the (created_at, id) of the last row on a page
+def encode_cursor(created_at: datetime.datetime, post_id: int) -> str:
+    raw = f"{created_at.isoformat()}|{post_id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime.datetime, int]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor.encode()).decode()
+        created_at, post_id = raw.split("|", 1)
+        return datetime.datetime.fromisoformat(created_at), int(post_id)
+    except Exception:
+        raise ValueError("Invalid cursor")
+
+
+# newest first, keyset on (created_at, id) so every page is an index range scan
+async def get_posts_page(db: AsyncSession, limit: int = DEFAULT_PAGE_SIZE, cursor: Optional[str] = None,
+                         user_id: Optional[int] = None) -> Tuple[List[Row], Optional[str]]:
+    query = select(*POST_COLUMNS)
+    if user_id is not None:
+        query = query.where(Post.user_id == user_id)
+    if cursor:
+        created_at, post_id = decode_cursor(cursor)
+        query = query.where(tuple_(Post.created_at, Post.id) < tuple_(created_at, post_id))
+    query = query.order_by(Post.created_at.desc(), Post.id.desc()).limit(limit + 1)
+
+    posts = (await db.execute(query)).all()
+    next_cursor = None
+    if len(posts) > limit:
+        posts = posts[:limit]
+        last = posts[-1]
+        next_cursor = encode_cursor(last.created_at, last.id)
+    return posts, next_cursor
+
+
+# walk the whole table with a server-side cursor, one batch in memory at a time
+async def iter_posts(db: AsyncSession, batch_size: int = STREAM_BATCH_SIZE) -> AsyncIterator[Post]:
+    query = select(Post).order_by(Post.created_at.desc(), Post.id.desc()).execution_options(yield_per=batch_size)
+    async for post in await db.stream_scalars(query):
+        yield post
+
+
+# PostOut JSON for a post, from the object cache when possible
+async def get_post_payload(db: AsyncSession, post_id: int) -> Optional[str]:
+    key = f"post:{post_id}"
+    payload = await object_cache.get(key)
+    if payload is None:
+        post = await db.get(Post, post_id)
+        if post is None:
+            return None
+        payload = PostOut.model_validate(post).model_dump_json()
+        await object_cache.set(key, payload)
+    return payload
+
+
+# PostOut JSON for many posts: cache first, one IN query for the rest; missing ids are left out
+async def get_post_payloads(db: AsyncSession, post_ids: List[int]) -> Dict[int, str]:
+    cached = await object_cache.get_many([f"post:{post_id}" for post_id in post_ids])
+    payloads = {int(key.split(":", 1)[1]): value for key, value in cached.items()}
+    missing = [post_id for post_id in post_ids if post_id not in payloads]
+    if missing:
+        loaded = {
+            post.id: PostOut.model_validate(post).model_dump_json()
+            for post in await db.scalars(select(Post).where(Post.id.in_(missing)))
+        }
+        await object_cache.set_many({f"post:{post_id}": payload for post_id, payload in loaded.items()})
+        payloads.update(loaded)
+    return payloads
+
+
+async def invalidate_post(*post_ids: int) -> None:
+    await object_cache.delete(*(f"post:{post_id}" for post_id in post_ids))
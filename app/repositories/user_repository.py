@@ -1,14 +1,57 @@
+import json
+from typing import Dict, List, Optional
 from app.models.models import Users as User
-from sqlalchemy.orm import Session
-def get_user_by_id(db: Session, user_id: int) -> User:
-    return db.query(User).filter(User.id == user_id).first()
+from app.repositories.cache import object_cache
+from app.schema.schema import UserOut
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+async def get_user_by_id(db: AsyncSession, user_id: int) -> User:
+    return await db.get(User, user_id)
 
 
+# UserOut JSON for a user, from the object cache when possible
+async def get_user_payload(db: AsyncSession, user_id: int) -> Optional[str]:
+    key = f"user:{user_id}"
+    payload = await object_cache.get(key)
+    if payload is None:
+        user = await db.get(User, user_id)
+        if user is None:
+            return None
+        payload = UserOut.model_validate(user).model_dump_json()
+        await object_cache.set(key, payload)
+    return payload
 
-def update_profile_picture(db: Session, user_id: int, filename: str) -> User:
-    user = db.query(User).filter(User.id == user_id).first()
+
+# display name from the cached UserOut, None for unknown users
+async def get_user_name(db: AsyncSession, user_id: int) -> Optional[str]:
+    payload = await get_user_payload(db, user_id)
+    return json.loads(payload)["name"] if payload is not None else None
+
+
+# UserOut JSON for many users: cache first, one IN query for the rest; missing ids are left out
+async def get_user_payloads(db: AsyncSession, user_ids: List[int]) -> Dict[int, str]:
+    cached = await object_cache.get_many([f"user:{user_id}" for user_id in user_ids])
+    payloads = {int(key.split(":", 1)[1]): value for key, value in cached.items()}
+    missing = [user_id for user_id in user_ids if user_id not in payloads]
+    if missing:
+        loaded = {
+            user.id: UserOut.model_validate(user).model_dump_json()
+            for user in await db.scalars(select(User).where(User.id.in_(missing)))
+        }
+        await object_cache.set_many({f"user:{user_id}": payload for user_id, payload in loaded.items()})
+        payloads.update(loaded)
+    return payloads
+
+
+async def invalidate_user(*user_ids: int) -> None:
+    await object_cache.delete(*(f"user:{user_id}" for user_id in user_ids))
+
+
+async def update_profile_picture(db: AsyncSession, user_id: int, filename: str) -> User:
+    user = await db.get(User, user_id)
     if user:
         user.profile_picture = filename
-        db.commit()
-        db.refresh(user)
+        await db.commit()
+        await db.refresh(user)
+        await invalidate_user(user_id)
     return user
@@ -14,8 +14,23 @@ class Message(BaseModel):
     message:str
 
 class MessageSchema(Message):
+    message_id: Optional[str] = None
     user_id: int
     room_id: str
     timestamp: datetime = datetime.now()
 
-    model_config = ConfigDict(from_attributes=True)
\ No newline at end of file
+    model_config = ConfigDict(from_attributes=True)
+
+class InboxMessage(BaseModel):
+    message_id: str
+    sender_id: int
+    content: Optional[str] = None
+    sent_at: datetime
+
+class InboxEntry(BaseModel):
+    room_id: str
+    name: Optional[str] = None
+    is_group: Optional[bool] = None
+    last_activity: Optional[datetime] = None
+    last_message: Optional[InboxMessage] = None
+    unread_count: int = 0
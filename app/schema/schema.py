@@ -1,4 +1,4 @@
-from pydantic import BaseModel, ConfigDict, EmailStr
+from pydantic import BaseModel, ConfigDict, EmailStr, Field
 from typing import Optional, List
 from datetime import datetime
 from enum import Enum
@@ -28,6 +28,8 @@ class UserOut(UserBase):
     bio: Optional[str] = "."
     is_active: Optional[bool] = True
     is_online: Optional[bool] = False
+    followers: Optional[int] = 0
+    following: Optional[int] = 0
     model_config = ConfigDict(from_attributes=True)
 
   
@@ -44,7 +46,10 @@ class PostCreate(PostBase):
 class PostOut(PostBase):
     user_id: int
     likes: int = 0
+    comment_count: Optional[int] = 0
     created_at: datetime = datetime.now()
+    # first comments of the thread, only when asked for with embed_comments
+    comments: Optional[List["CommentOut"]] = None
     model_config = ConfigDict(from_attributes=True)
 
 
@@ -66,6 +71,9 @@ class CommentOut(CommentBase):
     model_config = ConfigDict(from_attributes=True)
 
 
+PostOut.model_rebuild()
+
+
 # --- Like Schema ---
 class LikeSchema(BaseModel):
     user_id: int
@@ -81,3 +89,35 @@ class FollowSchema(BaseModel):
     created_at: Optional[datetime] = None
     model_config = ConfigDict(from_attributes=True)
 
+
+# --- Search Schema ---
+class SearchKind(str, Enum):
+    post = "post"
+    comment = "comment"
+    user = "user"
+
+
+class SearchResult(BaseModel):
+    kind: SearchKind
+    id: int
+    score: float
+    text: Optional[str] = None
+
+
+# --- Batch lookup Schema ---
+MAX_BATCH_IDS = 500
+
+class BatchGetRequest(BaseModel):
+    ids: List[int] = Field(min_length=1, max_length=MAX_BATCH_IDS)
+
+
+class PresenceOut(BaseModel):
+    online: bool
+    last_seen: Optional[datetime] = None
+
+
+# join already serialized objects into {"items": [...], "missing": [...]}
+def batch_response(ids: List[int], payloads: dict) -> str:
+    items = ",".join(payloads.get(i, "null") for i in ids)
+    missing = ",".join(str(i) for i in ids if i not in payloads)
+    return f'{{"items":[{items}],"missing":[{missing}]}}'
@@ -0,0 +1,316 @@
+import codecs
+import csv
+import datetime
+import io
+import json
+import os
+import uuid
+from typing import AsyncIterator, Awaitable, Callable, Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import Enum, Table, insert, select, text
+
+from app.db.database import AsyncSessionLocal, async_engine
+from app.models.models import Comment, ConversationParticipants, Conversations, Follow, Likes, Messages, Posts, Users
+from app.repositories import comment_repository, follower_repository, like_repository
+
+# bulk import and export of whole tables as NDJSON or CSV, for migrations and for loading
+# benchmark environments; used by `python -m app.jobs.bulk` and the /admin routes.
+# Exports stream the table through a server-side cursor. Imports insert BULK_BATCH_SIZE
+# records per transaction (COPY on PostgreSQL), so memory stays bounded by one batch; a
+# failed batch is rolled back, reported and skipped, and the count of records already
+# processed is the checkpoint an interrupted import resumes from.
+# In CSV files the first row names the columns and empty fields are NULL.
+
+BULK_BATCH_SIZE = int(os.getenv("BULK_BATCH_SIZE", "1000"))
+BULK_EXPORT_BATCH_SIZE = int(os.getenv("BULK_EXPORT_BATCH_SIZE", "1000"))
+BULK_USE_COPY = os.getenv("BULK_USE_COPY", "true").lower() in ("1", "true", "yes")
+FORMATS = ("ndjson", "csv")
+
+# in import order, every table only references the ones before it
+TABLES: Dict[str, Table] = {model.__tablename__: model.__table__ for model in (
+    Users, Follow, Posts, Comment, Likes, Conversations, ConversationParticipants, Messages,
+)}
+# integer ids that come from a sequence on PostgreSQL
+SERIAL_TABLES = ("users", "posts", "comment")
+# denormalized counters computed from the rows of a table
+RECONCILERS = {
+    "follow": follower_repository.reconcile_follow_counts,
+    "likes": like_repository.reconcile_like_counts,
+    "comment": comment_repository.reconcile_comment_counts,
+}
+
+_TRUE = ("true", "t", "1", "yes")
+_FALSE = ("false", "f", "0", "no")
+
+
+def get_table(name: str) -> Table:
+    table = TABLES.get(name)
+    if table is None:
+        raise ValueError(f"Unknown table {name!r}, expected one of: {', '.join(TABLES)}")
+    return table
+
+
+def check_format(fmt: str) -> str:
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown format {fmt!r}, expected one of: {', '.join(FORMATS)}")
+    return fmt
+
+
+# ======================= Export =======================
+
+def _export_value(value):
+    if isinstance(value, (datetime.datetime, datetime.date)):
+        return value.isoformat()
+    if isinstance(value, uuid.UUID):
+        return str(value)
+    return value
+
+
+def _csv_value(value):
+    if value is None:
+        return ""
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    return _export_value(value)
+
+
+def _csv_lines(rows: Iterable[Iterable]) -> str:
+    out = io.StringIO()
+    writer = csv.writer(out, lineterminator="\n")
+    writer.writerows([_csv_value(value) for value in row] for row in rows)
+    return out.getvalue()
+
+
+# the whole table in primary key order, one chunk of text per fetched batch of rows
+async def export_table(name: str, fmt: str = "ndjson", batch_size: int = BULK_EXPORT_BATCH_SIZE) -> AsyncIterator[str]:
+    table = get_table(name)
+    check_format(fmt)
+    columns = table.columns.keys()
+    query = select(table).order_by(*table.primary_key.columns).execution_options(yield_per=batch_size)
+    if fmt == "csv":
+        yield _csv_lines([columns])
+    async with async_engine.connect() as conn:
+        result = await conn.stream(query)
+        async for rows in result.partitions():
+            if fmt == "csv":
+                yield _csv_lines(rows)
+            else:
+                yield "".join(
+                    json.dumps({column: _export_value(value) for column, value in zip(columns, row)}) + "\n"
+                    for row in rows
+                )
+
+
+# ======================= Import =======================
+
+async def lines_from_chunks(chunks: AsyncIterator[bytes]) -> AsyncIterator[str]:
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    pending = ""
+    async for chunk in chunks:
+        pending += decoder.decode(chunk)
+        *lines, pending = pending.split("\n")
+        for line in lines:
+            yield line.rstrip("\r")
+    pending += decoder.decode(b"", final=True)
+    if pending:
+        yield pending.rstrip("\r")
+
+
+# (line number, record or the reason it could not be read); blank NDJSON lines are not records
+async def _read_records(lines: AsyncIterator[str], fmt: str) -> AsyncIterator[Tuple[int, object]]:
+    number = 0
+    header: Optional[List[str]] = None
+    pending: List[str] = []
+    async for line in lines:
+        number += 1
+        if fmt == "ndjson":
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError as e:
+                yield number, f"invalid JSON: {e}"
+                continue
+            yield number, record if isinstance(record, dict) else "expected a JSON object"
+            continue
+
+        # a quoted CSV field may span lines; it is complete once its quotes balance
+        pending.append(line)
+        joined = "\n".join(pending)
+        if joined.count('"') % 2:
+            continue
+        pending = []
+        try:
+            values = next(csv.reader([joined]))
+        except (csv.Error, StopIteration) as e:
+            yield number, f"invalid CSV: {e}"
+            continue
+        if header is None:
+            header = values
+        elif len(values) != len(header):
+            yield number, f"expected {len(header)} fields, got {len(values)}"
+        else:
+            yield number, {column: value if value != "" else None for column, value in zip(header, values)}
+    if pending:
+        yield number, "unterminated quoted field at the end of the file"
+
+
+def _convert(column, value):
+    if value is None:
+        return None
+    python_type = column.type.python_type
+    if python_type is bool:
+        if isinstance(value, bool):
+            return value
+        lowered = str(value).lower()
+        if lowered in _TRUE or lowered in _FALSE:
+            return lowered in _TRUE
+        raise ValueError(f"expected a boolean, got {value!r}")
+    if python_type is datetime.datetime:
+        return value if isinstance(value, datetime.datetime) else datetime.datetime.fromisoformat(value)
+    if python_type is uuid.UUID:
+        return uuid.UUID(str(value))
+    if python_type is int:
+        if isinstance(value, bool):
+            raise ValueError(f"expected an integer, got {value!r}")
+        return int(value)
+    value = str(value)
+    if isinstance(column.type, Enum) and value not in column.type.enums:
+        raise ValueError(f"expected one of {', '.join(column.type.enums)}, got {value!r}")
+    return value
+
+
+def to_row(table: Table, record: dict) -> dict:
+    row = {}
+    for key, value in record.items():
+        column = table.columns.get(key)
+        if column is None:
+            raise ValueError(f"unknown column {key!r}")
+        try:
+            row[key] = _convert(column, value)
+        except (TypeError, ValueError) as e:
+            raise ValueError(f"{key}: {e}")
+    return row
+
+
+class ImportReport:
+    def __init__(self, table: str, skipped: int = 0):
+        self.table = table
+        # records processed so far, counting those skipped from an earlier run; resume from here
+        self.records = skipped
+        self.inserted = 0
+        self.batches = 0
+        self.failed_batches = 0
+        self.rejected = 0
+        # one entry per batch with rejected records or a failed insert
+        self.errors: List[dict] = []
+
+    def to_dict(self) -> dict:
+        return {
+            "table": self.table, "records": self.records, "inserted": self.inserted,
+            "batches": self.batches, "failed_batches": self.failed_batches, "rejected": self.rejected,
+            "errors": self.errors,
+        }
+
+
+# rows with the same columns go into one statement; missing columns keep their server defaults
+async def _write_batch(table: Table, rows: List[dict], use_copy: bool) -> None:
+    groups: Dict[Tuple[str, ...], List[dict]] = {}
+    for row in rows:
+        groups.setdefault(tuple(sorted(row)), []).append(row)
+    async with async_engine.begin() as conn:
+        if use_copy and conn.dialect.name == "postgresql":
+            driver = (await conn.get_raw_connection()).driver_connection
+            async with driver.transaction():
+                for columns, group in groups.items():
+                    await driver.copy_records_to_table(
+                        table.name, columns=list(columns), records=[tuple(row[c] for c in columns) for row in group]
+                    )
+        else:
+            for group in groups.values():
+                await conn.execute(insert(table), group)
+
+
+async def _fix_sequence(name: str) -> None:
+    async with async_engine.begin() as conn:
+        if conn.dialect.name == "postgresql" and name in SERIAL_TABLES:
+            # rows came with explicit ids, move the sequence past them
+            await conn.execute(text(
+                f"SELECT setval(pg_get_serial_sequence('{name}', 'id'), coalesce(max(id), 1), max(id) IS NOT NULL) FROM {name}"
+            ))
+
+
+async def reconcile_counters(name: str) -> Optional[int]:
+    reconcile = RECONCILERS.get(name)
+    if reconcile is None:
+        return None
+    async with AsyncSessionLocal() as db:
+        return await reconcile(db)
+
+
+# insert the records read from `lines` into a table. The first `skip` records were handled by an
+# earlier run and are only read past; on_batch is awaited after every batch, with the report so far
+async def import_table(
+    name: str,
+    lines: AsyncIterator[str],
+    fmt: str = "ndjson",
+    batch_size: int = BULK_BATCH_SIZE,
+    skip: int = 0,
+    use_copy: bool = BULK_USE_COPY,
+    reconcile: bool = True,
+    on_batch: Optional[Callable[[ImportReport], Awaitable[None]]] = None,
+) -> ImportReport:
+    table = get_table(name)
+    check_format(fmt)
+    report = ImportReport(name, skip)
+    seen = 0
+    batch: List[dict] = []
+    rejected: List[dict] = []
+    first_line = last_line = 0
+
+    async def flush() -> None:
+        nonlocal batch, rejected
+        report.batches += 1
+        error = None
+        if batch:
+            try:
+                await _write_batch(table, batch, use_copy)
+                report.inserted += len(batch)
+            except Exception as e:
+                error = str(getattr(e, "orig", None) or e).strip()
+                report.failed_batches += 1
+        report.records += len(batch) + len(rejected)
+        report.rejected += len(rejected)
+        if error or rejected:
+            report.errors.append({
+                "batch": report.batches, "first_line": first_line, "last_line": last_line,
+                "error": error, "rejected": rejected,
+            })
+        batch, rejected = [], []
+        if on_batch is not None:
+            await on_batch(report)
+
+    async for number, record in _read_records(lines, fmt):
+        seen += 1
+        if seen <= skip:
+            continue
+        if not batch and not rejected:
+            first_line = number
+        last_line = number
+        if isinstance(record, str):
+            rejected.append({"line": number, "error": record})
+        else:
+            try:
+                batch.append(to_row(table, record))
+            except ValueError as e:
+                rejected.append({"line": number, "error": str(e)})
+        if len(batch) + len(rejected) >= batch_size:
+            await flush()
+    if batch or rejected:
+        await flush()
+
+    if report.inserted:
+        await _fix_sequence(name)
+        if reconcile:
+            await reconcile_counters(name)
+    return report
@@ -0,0 +1,314 @@
+import asyncio
+import json
+import logging
+import os
+from typing import Dict, List, Set
+
+from fastapi import WebSocket
+
+# room fan-out for the chat WebSocket. Every node keeps its own local connections and
+# only subscribes to a room on the backend while it has at least one member in it, so a
+# message published on any node reaches the room members connected to every other node.
+
+CHAT_BROKER_URL = os.getenv("CHAT_BROKER_URL", "")
+CHAT_SEND_QUEUE_SIZE = int(os.getenv("CHAT_SEND_QUEUE_SIZE", "256"))
+# what to do when a client's queue is full: "drop_oldest" or "disconnect"
+CHAT_SLOW_CONSUMER_POLICY = os.getenv("CHAT_SLOW_CONSUMER_POLICY", "drop_oldest")
+
+# close code sent to clients disconnected for not keeping up (1008: policy violation)
+SLOW_CONSUMER_CLOSE_CODE = 1008
+
+# longest wait, in seconds, between attempts to reconnect to the broker after an error
+CHAT_BROKER_MAX_BACKOFF = float(os.getenv("CHAT_BROKER_MAX_BACKOFF", "30"))
+
+logger = logging.getLogger(__name__)
+
+
+# one connected client: frames are queued and written by the client's own task, so a
+# slow socket never holds up the rest of the room or the sender's receive loop
+class ClientConnection:
+    def __init__(self, websocket: WebSocket, maxsize: int = CHAT_SEND_QUEUE_SIZE,
+                 policy: str = CHAT_SLOW_CONSUMER_POLICY):
+        self.websocket = websocket
+        self.policy = policy
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize)
+        self.dropped = 0
+        self.closed = False
+        self._writer = asyncio.create_task(self._write())
+
+    def send(self, payload: str) -> None:
+        if self.closed:
+            return
+        try:
+            self.queue.put_nowait(payload)
+        except asyncio.QueueFull:
+            if self.policy == "disconnect":
+                self.close(SLOW_CONSUMER_CLOSE_CODE)
+                return
+            self.queue.get_nowait()
+            self.queue.put_nowait(payload)
+            self.dropped += 1
+
+    async def _write(self) -> None:
+        while True:
+            payload = await self.queue.get()
+            try:
+                await self.websocket.send_text(payload)
+            except Exception:
+                # the receive loop sees the disconnect and leaves the room
+                self.closed = True
+                return
+
+    def close(self, code: int = None) -> None:
+        if self.closed:
+            return
+        self.closed = True
+        self._writer.cancel()
+        if code is not None:
+            asyncio.create_task(self._close_socket(code))
+
+    async def _close_socket(self, code: int) -> None:
+        try:
+            await self.websocket.close(code=code)
+        except Exception:
+            pass
+
+
+class ChatBroker:
+    # whether other nodes publish through the same backend
+    shared = True
+
+    def __init__(self):
+        self.connections: Dict[str, List[ClientConnection]] = {}
+        # objects notified of message_delivered(room, payload) and room_unsubscribed(room)
+        self.listeners: List = []
+        self.publish_failures = 0
+
+    # True while this node has members in the room, and so sees every message published to it
+    def is_live(self, room: str) -> bool:
+        return room in self.connections
+
+    async def join(self, room: str, websocket: WebSocket) -> ClientConnection:
+        connection = ClientConnection(websocket)
+        if room not in self.connections:
+            self.connections[room] = []
+            await self._subscribe(room)
+        self.connections[room].append(connection)
+        return connection
+
+    async def leave(self, room: str, websocket: WebSocket) -> None:
+        members = self.connections.get(room)
+        if not members:
+            return
+        for connection in members:
+            if connection.websocket is websocket:
+                connection.close()
+                members.remove(connection)
+                break
+        if not members:
+            del self.connections[room]
+            await self._unsubscribe(room)
+            for listener in self.listeners:
+                listener.room_unsubscribed(room)
+
+    # serialized once here, the same frame is queued for every recipient. Callers store the
+    # message first; a failed publish is logged and counted, never raised, so it cannot
+    # fail the request or close the sender's socket. False when it did not go out
+    async def publish(self, room: str, message: dict) -> bool:
+        try:
+            await self._publish(room, json.dumps(message))
+        except Exception:
+            self.publish_failures += 1
+            logger.exception("Publishing a chat message to room %s failed", room)
+            return False
+        return True
+
+    # queue a published message for the members connected to this node
+    async def deliver(self, room: str, payload: str) -> None:
+        for connection in self.connections.get(room, ()):
+            connection.send(payload)
+        for listener in self.listeners:
+            listener.message_delivered(room, payload)
+
+    async def close(self) -> None:
+        pass
+
+    async def _subscribe(self, room: str) -> None:
+        pass
+
+    async def _unsubscribe(self, room: str) -> None:
+        pass
+
+    async def _publish(self, room: str, payload: str) -> None:
+        raise NotImplementedError
+
+
+# single process: publishing is a direct local delivery
+class InMemoryBroker(ChatBroker):
+    shared = False
+
+    async def _publish(self, room: str, payload: str) -> None:
+        await self.deliver(room, payload)
+
+
+# pub/sub fan-out, one channel per room, over a Redis-style client: client.publish(channel,
+# payload) and client.pubsub() with subscribe / unsubscribe / get_message / close
+class PubSubBroker(ChatBroker):
+    channel_prefix = "chat:"
+    # first wait, in seconds, before reconnecting after an error; doubles up to CHAT_BROKER_MAX_BACKOFF
+    reconnect_delay = 0.5
+
+    def __init__(self, client):
+        super().__init__()
+        self.client = client
+        self.pubsub = client.pubsub()
+        self._reader = None
+
+    async def _subscribe(self, room: str) -> None:
+        await self.pubsub.subscribe(self.channel_prefix + room)
+        if self._reader is None or self._reader.done():
+            self._reader = asyncio.create_task(self._read())
+
+    async def _unsubscribe(self, room: str) -> None:
+        await self.pubsub.unsubscribe(self.channel_prefix + room)
+
+    async def _publish(self, room: str, payload: str) -> None:
+        await self.client.publish(self.channel_prefix + room, payload)
+
+    # runs while this node has members in any room; a lost connection is retried with a
+    # growing delay and every room with local members is subscribed again
+    async def _read(self) -> None:
+        delay = 0.0
+        while self.connections:
+            if delay:
+                await asyncio.sleep(delay)
+                try:
+                    await self._resubscribe()
+                except Exception:
+                    logger.exception("Reconnecting to the chat broker failed, retrying in %.1fs", delay)
+                    delay = min(delay * 2, CHAT_BROKER_MAX_BACKOFF)
+                    continue
+            try:
+                message = await self.pubsub.get_message(ignore_subscribe_messages=True, timeout=1.0)
+            except Exception:
+                delay = min(max(delay * 2, self.reconnect_delay), CHAT_BROKER_MAX_BACKOFF)
+                logger.exception("Reading from the chat broker failed, reconnecting in %.1fs", delay)
+                continue
+            delay = 0.0
+            if message is None:
+                continue
+            try:
+                room = message["channel"][len(self.channel_prefix):]
+                await self.deliver(room, message["data"])
+            except Exception:
+                # one bad payload must not stop delivery for every room
+                logger.exception("Delivering a chat message from the broker failed")
+
+    async def _resubscribe(self) -> None:
+        stale, self.pubsub = self.pubsub, self.client.pubsub()
+        try:
+            await stale.close()
+        except Exception:
+            pass
+        channels = [self.channel_prefix + room for room in self.connections]
+        if channels:
+            await self.pubsub.subscribe(*channels)
+
+    async def close(self) -> None:
+        if self._reader:
+            self._reader.cancel()
+        await self.pubsub.close()
+        await self.client.close()
+
+
+# Redis pub/sub; needs the optional `redis` package
+class RedisBroker(PubSubBroker):
+    def __init__(self, url: str):
+        try:
+            import redis.asyncio as redis
+        except ImportError:
+            raise RuntimeError("CHAT_BROKER_URL points at Redis but the `redis` package is not installed")
+        super().__init__(redis.from_url(url, decode_responses=True))
+
+
+# in-process stand-in for a Redis server's pub/sub: brokers sharing a hub behave like nodes
+# sharing a server, so multi-node fan-out and reconnects can be tested without Redis
+class LocalHub:
+    def __init__(self):
+        self.subscribers: Set["LocalPubSub"] = set()
+
+    def pubsub(self) -> "LocalPubSub":
+        subscriber = LocalPubSub(self)
+        self.subscribers.add(subscriber)
+        return subscriber
+
+    async def publish(self, channel: str, payload: str) -> int:
+        receivers = [s for s in self.subscribers if channel in s.channels]
+        for subscriber in receivers:
+            subscriber.messages.put_nowait({"type": "message", "channel": channel, "data": payload})
+        return len(receivers)
+
+    # drop every subscriber's connection, like a server restart
+    def disconnect(self) -> None:
+        for subscriber in self.subscribers:
+            subscriber.connected = False
+            subscriber.messages.put_nowait(None)
+        self.subscribers.clear()
+
+    async def close(self) -> None:
+        pass
+
+
+class LocalPubSub:
+    def __init__(self, hub: LocalHub):
+        self.hub = hub
+        self.channels: Set[str] = set()
+        self.messages: asyncio.Queue = asyncio.Queue()
+        self.connected = True
+
+    def _check(self) -> None:
+        if not self.connected:
+            raise ConnectionError("pub/sub connection lost")
+
+    async def subscribe(self, *channels: str) -> None:
+        self._check()
+        self.channels.update(channels)
+
+    async def unsubscribe(self, *channels: str) -> None:
+        self._check()
+        self.channels.difference_update(channels)
+
+    async def get_message(self, ignore_subscribe_messages: bool = False, timeout: float = 0.0):
+        self._check()
+        try:
+            message = await asyncio.wait_for(self.messages.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+        self._check()
+        return message
+
+    async def close(self) -> None:
+        self.hub.subscribers.discard(self)
+
+
+class LocalHubBroker(PubSubBroker):
+    def __init__(self, hub: LocalHub):
+        super().__init__(hub)
+
+
+def create_broker(url: str = CHAT_BROKER_URL) -> ChatBroker:
+    if url.startswith(("redis://", "rediss://")):
+        return RedisBroker(url)
+    return InMemoryBroker()
+
+
+broker: ChatBroker = create_broker()
+
+
+def render_broker_metrics() -> str:
+    lines = [
+        "# HELP chat_publish_failures_total Chat messages stored but not published to the broker.",
+        "# TYPE chat_publish_failures_total counter",
+        f"chat_publish_failures_total {broker.publish_failures}",
+    ]
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,243 @@
+import datetime
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import Row, func, or_, select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.models import Follow, Posts as Post, Users
+from app.repositories import post_repository
+
+# home timelines: post ids are pushed into each follower's list when a post is created
+# (fan-out-on-write). Authors with more followers than FEED_FANOUT_LIMIT (users.followers,
+# so every worker agrees) are skipped on write and merged in when the feed is read
+# (fan-out-on-read). Timelines expire after FEED_TTL seconds; with several workers set
+# FEED_STORE_URL=redis://... so a post fanned out by one worker reaches the timelines
+# loaded by the others, the in-process store only sees posts created in its own process.
+
+FEED_MAX_LENGTH = int(os.getenv("FEED_MAX_LENGTH", "800"))
+FEED_MAX_USERS = int(os.getenv("FEED_MAX_USERS", "100000"))
+FEED_FANOUT_LIMIT = int(os.getenv("FEED_FANOUT_LIMIT", "5000"))
+FEED_TTL = float(os.getenv("FEED_TTL", "30"))
+FEED_STORE_URL = os.getenv("FEED_STORE_URL", "")
+
+FeedEntry = Tuple[datetime.datetime, int]
+
+
+class FeedStore:
+    # interface for timeline storage, see create_feed_store()
+    async def get(self, user_id: int) -> Optional[List[FeedEntry]]:
+        raise NotImplementedError
+
+    async def put(self, user_id: int, entries: List[FeedEntry]) -> None:
+        raise NotImplementedError
+
+    # only timelines already loaded are updated, cold ones are rebuilt on read
+    async def push(self, user_ids: List[int], entry: FeedEntry) -> None:
+        raise NotImplementedError
+
+    async def drop(self, user_id: int) -> None:
+        raise NotImplementedError
+
+    async def close(self) -> None:
+        pass
+
+
+class InMemoryFeedStore(FeedStore):
+    # per-process store: bounded timeline length, least recently read timelines evicted first;
+    # the TTL bounds how long posts created through other workers stay missing. Timelines are
+    # kept newest first by (created_at, id), the order the feed cursor pages on
+    def __init__(self, max_length: int = FEED_MAX_LENGTH, max_users: int = FEED_MAX_USERS, ttl: float = FEED_TTL):
+        self.max_length = max_length
+        self.max_users = max_users
+        self.ttl = ttl
+        self._feeds: "OrderedDict[int, Tuple[float, List[FeedEntry]]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    async def get(self, user_id: int) -> Optional[List[FeedEntry]]:
+        with self._lock:
+            item = self._feeds.get(user_id)
+            if item is None:
+                return None
+            if item[0] <= time.monotonic():
+                del self._feeds[user_id]
+                return None
+            self._feeds.move_to_end(user_id)
+            return list(item[1])
+
+    async def put(self, user_id: int, entries: List[FeedEntry]) -> None:
+        with self._lock:
+            self._feeds[user_id] = (time.monotonic() + self.ttl, sorted(entries, reverse=True)[:self.max_length])
+            self._feeds.move_to_end(user_id)
+            while len(self._feeds) > self.max_users:
+                self._feeds.popitem(last=False)
+
+    async def push(self, user_ids: List[int], entry: FeedEntry) -> None:
+        with self._lock:
+            for user_id in user_ids:
+                item = self._feeds.get(user_id)
+                if item is None:
+                    continue
+                timeline = item[1]
+                # posts created concurrently can arrive out of order; new ones land near the front
+                index = 0
+                while index < len(timeline) and timeline[index] > entry:
+                    index += 1
+                if index < len(timeline) and timeline[index] == entry:
+                    continue
+                timeline.insert(index, entry)
+                del timeline[self.max_length:]
+
+    async def drop(self, user_id: int) -> None:
+        with self._lock:
+            self._feeds.pop(user_id, None)
+
+
+# shared between workers; needs the optional `redis` package. A timeline is a list of
+# "created_at|post_id", newest first, expiring FEED_TTL seconds after it was built
+class RedisFeedStore(FeedStore):
+    key_prefix = "feed:"
+
+    def __init__(self, url: str, max_length: int = FEED_MAX_LENGTH, ttl: float = FEED_TTL):
+        try:
+            import redis.asyncio as redis
+        except ImportError:
+            raise RuntimeError("FEED_STORE_URL points at Redis but the `redis` package is not installed")
+        self.redis = redis.from_url(url, decode_responses=True)
+        self.max_length = max_length
+        self.ttl = ttl
+
+    @staticmethod
+    def _encode(entry: FeedEntry) -> str:
+        return f"{entry[0].isoformat()}|{entry[1]}"
+
+    @staticmethod
+    def _decode(value: str) -> FeedEntry:
+        created_at, post_id = value.split("|", 1)
+        return datetime.datetime.fromisoformat(created_at), int(post_id)
+
+    async def get(self, user_id: int) -> Optional[List[FeedEntry]]:
+        key = self.key_prefix + str(user_id)
+        async with self.redis.pipeline(transaction=False) as pipe:
+            pipe.exists(key)
+            pipe.lrange(key, 0, self.max_length - 1)
+            exists, values = await pipe.execute()
+        if not exists:
+            return None
+        # the first element marks a loaded timeline, empty ones included
+        return sorted((self._decode(v) for v in values[1:]), reverse=True)
+
+    async def put(self, user_id: int, entries: List[FeedEntry]) -> None:
+        key = self.key_prefix + str(user_id)
+        async with self.redis.pipeline(transaction=True) as pipe:
+            pipe.delete(key)
+            pipe.rpush(key, "", *(self._encode(e) for e in entries[:self.max_length]))
+            pipe.pexpire(key, int(self.ttl * 1000))
+            await pipe.execute()
+
+    async def push(self, user_ids: List[int], entry: FeedEntry) -> None:
+        value = self._encode(entry)
+        async with self.redis.pipeline(transaction=False) as pipe:
+            for user_id in user_ids:
+                key = self.key_prefix + str(user_id)
+                # LINSERT only touches lists that exist: the entry goes right after the marker
+                pipe.linsert(key, "AFTER", "", value)
+                pipe.ltrim(key, 0, self.max_length)
+            await pipe.execute()
+
+    async def drop(self, user_id: int) -> None:
+        await self.redis.delete(self.key_prefix + str(user_id))
+
+    async def close(self) -> None:
+        await self.redis.close()
+
+
+def create_feed_store(url: str = FEED_STORE_URL) -> FeedStore:
+    if url.startswith(("redis://", "rediss://")):
+        return RedisFeedStore(url)
+    return InMemoryFeedStore()
+
+
+store: FeedStore = create_feed_store()
+
+
+def set_feed_store(new_store: FeedStore) -> None:
+    global store
+    store = new_store
+
+
+async def _follower_ids(db: AsyncSession, user_id: int, limit: int) -> List[int]:
+    query = select(Follow.follower_id).where(Follow.following_id == user_id).limit(limit)
+    return list(await db.scalars(query))
+
+
+# too many followers to fan out to, their posts are pulled when the feed is read
+def _is_pull_author():
+    return func.coalesce(Users.followers, 0) > FEED_FANOUT_LIMIT
+
+
+async def fan_out_post(db: AsyncSession, post: Post) -> None:
+    entry = (post.created_at, post.id)
+    if await db.scalar(select(_is_pull_author()).where(Users.id == post.user_id)):
+        await store.push([post.user_id], entry)
+        return
+    follower_ids = await _follower_ids(db, post.user_id, FEED_FANOUT_LIMIT)
+    await store.push(follower_ids + [post.user_id], entry)
+
+
+# called when the user's follow list changes
+async def invalidate_feed(user_id: int) -> None:
+    await store.drop(user_id)
+
+
+async def _rebuild_feed(db: AsyncSession, user_id: int) -> List[FeedEntry]:
+    followees = select(Follow.following_id).where(Follow.follower_id == user_id)
+    query = (
+        select(Post.created_at, Post.id)
+        .where(or_(Post.user_id == user_id, Post.user_id.in_(followees)), Post.created_at.isnot(None))
+        .order_by(Post.created_at.desc(), Post.id.desc())
+        .limit(FEED_MAX_LENGTH)
+    )
+    entries = [(created_at, post_id) for created_at, post_id in await db.execute(query)]
+    await store.put(user_id, entries)
+    return entries
+
+
+async def _pulled_entries(db: AsyncSession, user_id: int, limit: int, before: Optional[FeedEntry]) -> List[FeedEntry]:
+    authors = list(await db.scalars(
+        select(Follow.following_id)
+        .join(Users, Users.id == Follow.following_id)
+        .where(Follow.follower_id == user_id, _is_pull_author())
+    ))
+    if not authors:
+        return []
+    query = select(Post.created_at, Post.id).where(Post.user_id.in_(authors), Post.created_at.isnot(None))
+    if before:
+        query = query.where(tuple_(Post.created_at, Post.id) < tuple_(*before))
+    query = query.order_by(Post.created_at.desc(), Post.id.desc()).limit(limit)
+    return [(created_at, post_id) for created_at, post_id in await db.execute(query)]
+
+
+async def get_feed(db: AsyncSession, user_id: int, limit: int, cursor: Optional[str] = None) -> Tuple[List[Row], Optional[str]]:
+    before = post_repository.decode_cursor(cursor) if cursor else None
+
+    entries = await store.get(user_id)
+    if entries is None:
+        entries = await _rebuild_feed(db, user_id)
+    if before:
+        entries = [e for e in entries if e < before]
+
+    merged = sorted(set(entries[:limit + 1]) | set(await _pulled_entries(db, user_id, limit + 1, before)), reverse=True)
+    page = merged[:limit]
+    next_cursor = None
+    if len(merged) > limit:
+        next_cursor = post_repository.encode_cursor(*page[-1])
+
+    ids = [post_id for _, post_id in page]
+    posts: Dict[int, Row] = {
+        p.id: p for p in await db.execute(select(*post_repository.POST_COLUMNS).where(Post.id.in_(ids)))
+    } if ids else {}
+    return [posts[i] for i in ids if i in posts], next_cursor
@@ -0,0 +1,95 @@
+import asyncio
+import logging
+import os
+from typing import Dict, Optional
+
+from sqlalchemy import bindparam, case, func, update
+
+from app.db.database import AsyncSessionLocal
+from app.models.models import Posts as Post
+from app.repositories.post_repository import invalidate_post
+
+# posts.likes is not touched per like: deltas are summed in memory per post and written
+# every LIKE_FLUSH_INTERVAL seconds as one batched `likes = likes + n` update, so a viral
+# post takes one row lock per flush instead of one per like
+
+LIKE_FLUSH_INTERVAL = float(os.getenv("LIKE_FLUSH_INTERVAL", "1.0"))
+
+logger = logging.getLogger(__name__)
+
+
+class LikeCounter:
+    def __init__(self, flush_interval: float = LIKE_FLUSH_INTERVAL):
+        self.flush_interval = flush_interval
+        self.pending: Dict[int, int] = {}
+        self._task: Optional[asyncio.Task] = None
+        self._stopping: Optional[asyncio.Event] = None
+
+    def add(self, post_id: int, delta: int) -> None:
+        total = self.pending.get(post_id, 0) + delta
+        if total:
+            self.pending[post_id] = total
+        else:
+            self.pending.pop(post_id, None)
+
+    # likes not written to posts yet
+    def pending_for(self, post_id: int) -> int:
+        return self.pending.get(post_id, 0)
+
+    def start(self) -> None:
+        if self._task is None or self._task.done():
+            self._stopping = asyncio.Event()
+            self._task = asyncio.create_task(self._run())
+
+    # write what is pending and stop, called on shutdown. The loop is let finish its current
+    # flush rather than cancelled in the middle of it, and a failed final write is logged so
+    # the rest of the shutdown still runs
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._stopping.set()
+            await self._task
+            self._task = None
+        try:
+            await self.flush()
+        except Exception:
+            logger.exception("Writing %d pending like counts on shutdown failed", len(self.pending))
+
+    async def _run(self) -> None:
+        while not self._stopping.is_set():
+            try:
+                await asyncio.wait_for(self._stopping.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            try:
+                await self.flush()
+            except Exception:
+                logger.exception("Flushing like counters failed")
+
+    async def flush(self) -> None:
+        if not self.pending:
+            return
+        pending, self.pending = self.pending, {}
+        posts = Post.__table__
+        new_likes = func.coalesce(posts.c.likes, 0) + bindparam("delta")
+        stmt = (
+            update(posts)
+            .where(posts.c.id == bindparam("post_id"))
+            .values(likes=case((new_likes < 0, 0), else_=new_likes))
+        )
+        # sorted so concurrent flushes from several workers lock rows in the same order
+        params = [{"post_id": post_id, "delta": delta} for post_id, delta in sorted(pending.items())]
+        written = False
+        try:
+            async with AsyncSessionLocal() as db:
+                await db.execute(stmt, params)
+                await db.commit()
+            written = True
+        finally:
+            if not written:
+                # failed or cancelled: put the deltas back so the next flush retries them
+                for post_id, delta in pending.items():
+                    self.add(post_id, delta)
+        await invalidate_post(*pending)
+
+
+like_counter = LikeCounter()
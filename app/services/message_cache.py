@@ -0,0 +1,129 @@
+import datetime
+import json
+import os
+import time
+from collections import OrderedDict, deque
+from typing import List, Optional
+
+from app.repositories.message_repository import MessageKey
+from app.services.chat_broker import broker
+from app.services.message_writer import MESSAGE_FLUSH_INTERVAL
+
+# last messages of rooms with members connected to this node, fed by every message the
+# broker delivers here, so opening a chat or backfilling after a reconnect can skip the database
+
+RECENT_MESSAGES_PER_ROOM = int(os.getenv("RECENT_MESSAGES_PER_ROOM", "200"))
+RECENT_MESSAGES_MAX_ROOMS = int(os.getenv("RECENT_MESSAGES_MAX_ROOMS", "10000"))
+# messages published before this node started receiving a room may still be waiting in
+# some node's write-behind queue, in neither the database nor the live stream. The history
+# is only loaded into the buffer once every writer has had a flush interval plus this much
+# database lag to store them; until then pages come from the database.
+RECENT_MESSAGES_SEED_DELAY = float(os.getenv("RECENT_MESSAGES_SEED_DELAY", "2"))
+
+
+def message_key(message: dict) -> MessageKey:
+    return message["sent_at"], message["message_id"]
+
+
+class RoomBuffer:
+    def __init__(self, size: int):
+        self.messages: deque = deque(maxlen=size)
+        # seeded: history has been loaded from the database
+        # complete: the buffer holds the room's whole history
+        # truncated: older messages were pushed out of the buffer
+        self.seeded = False
+        self.complete = False
+        self.truncated = False
+        self.tracked_at = time.monotonic()
+
+    def add(self, message: dict) -> None:
+        if self.messages and message_key(message) < message_key(self.messages[-1]):
+            # out of order delivery, keep the buffer sorted; seeded/complete are left alone
+            self._merge([message])
+            return
+        if len(self.messages) == self.messages.maxlen:
+            self.truncated = True
+            self.complete = False
+        self.messages.append(message)
+
+    def seed(self, history: List[dict], complete: bool) -> None:
+        self._merge(history)
+        self.complete = complete and not self.truncated
+        self.seeded = True
+
+    # the union of the buffer and `messages` by message_id, sorted, newest kept when over size
+    def _merge(self, messages: List[dict]) -> None:
+        merged = {m["message_id"]: m for m in messages}
+        merged.update((m["message_id"], m) for m in self.messages)
+        ordered = sorted(merged.values(), key=message_key)
+        if len(ordered) > self.messages.maxlen:
+            self.truncated = True
+            self.complete = False
+        self.messages = deque(ordered, maxlen=self.messages.maxlen)
+
+    # None when the page may reach past what the buffer holds
+    def page(self, limit: int, before: Optional[MessageKey] = None,
+             after: Optional[MessageKey] = None) -> Optional[List[dict]]:
+        messages = list(self.messages)
+        if after:
+            if not self.complete and (not messages or after < message_key(messages[0])):
+                return None
+            return [m for m in messages if message_key(m) > after][:limit]
+        if before:
+            messages = [m for m in messages if message_key(m) < before]
+        if len(messages) < limit and not self.complete:
+            return None
+        return messages[-limit:]
+
+
+class RecentMessages:
+    def __init__(self, per_room: int = RECENT_MESSAGES_PER_ROOM, max_rooms: int = RECENT_MESSAGES_MAX_ROOMS,
+                 seed_delay: float = MESSAGE_FLUSH_INTERVAL + RECENT_MESSAGES_SEED_DELAY):
+        self.per_room = per_room
+        self.max_rooms = max_rooms
+        self.seed_delay = seed_delay
+        self.rooms: "OrderedDict[str, RoomBuffer]" = OrderedDict()
+
+    def get(self, room: str) -> Optional[RoomBuffer]:
+        buffer = self.rooms.get(room)
+        if buffer is not None:
+            self.rooms.move_to_end(room)
+        return buffer
+
+    # start tracking a room before its history is loaded, so nothing delivered meanwhile is missed
+    def track(self, room: str) -> RoomBuffer:
+        buffer = self.get(room)
+        if buffer is None:
+            buffer = self.rooms[room] = RoomBuffer(self.per_room)
+            while len(self.rooms) > self.max_rooms:
+                self.rooms.popitem(last=False)
+        return buffer
+
+    # whether everything sent before the room was tracked has had time to reach the database
+    def can_seed(self, buffer: RoomBuffer) -> bool:
+        return time.monotonic() - buffer.tracked_at >= self.seed_delay
+
+    def drop(self, room: str) -> None:
+        self.rooms.pop(room, None)
+
+    # broker listener hooks
+    def message_delivered(self, room: str, payload: str) -> None:
+        buffer = self.rooms.get(room)
+        if buffer is None:
+            return
+        message = json.loads(payload)
+        buffer.add({
+            "message_id": message["message_id"],
+            "room_id": message["room_id"],
+            "sender_id": message["sender_id"],
+            "content": message["content"],
+            "sent_at": datetime.datetime.fromisoformat(message["sent_at"]),
+        })
+
+    def room_unsubscribed(self, room: str) -> None:
+        # no members left on this node, the buffer would go stale
+        self.drop(room)
+
+
+recent_messages = RecentMessages()
+broker.listeners.append(recent_messages)
@@ -0,0 +1,168 @@
+import asyncio
+import datetime
+import json
+import logging
+import os
+import uuid
+from typing import List, Optional
+
+from sqlalchemy import insert
+from sqlalchemy.exc import DBAPIError, InterfaceError, OperationalError
+
+from app.db.database import AsyncSessionLocal
+from app.models.models import Messages
+
+# write-behind persistence for chat messages: the WebSocket path hands rows over and
+# broadcasts right away, a background task inserts them in batches. When the database
+# falls behind the queue fills up and submit() waits, which slows the senders down.
+# Messages are broadcast as soon as they are queued, so a batch is never dropped for a
+# database outage: it is retried until it is written. A batch the database rejects is
+# split until the offending rows are isolated, and only those are logged and discarded.
+
+MESSAGE_BATCH_SIZE = int(os.getenv("MESSAGE_BATCH_SIZE", "500"))
+MESSAGE_FLUSH_INTERVAL = float(os.getenv("MESSAGE_FLUSH_INTERVAL", "0.05"))
+MESSAGE_QUEUE_SIZE = int(os.getenv("MESSAGE_QUEUE_SIZE", "10000"))
+# longest wait, in seconds, between attempts to write a batch while the database is unreachable
+MESSAGE_FLUSH_MAX_BACKOFF = float(os.getenv("MESSAGE_FLUSH_MAX_BACKOFF", "5"))
+# how long shutdown waits for the queue to be written; whatever is left is appended to
+# MESSAGE_SPILL_PATH as NDJSON, ready for `python -m app.jobs.bulk import messages`
+MESSAGE_SHUTDOWN_TIMEOUT = float(os.getenv("MESSAGE_SHUTDOWN_TIMEOUT", "10"))
+MESSAGE_SPILL_PATH = os.getenv("MESSAGE_SPILL_PATH", "unsaved_messages.ndjson")
+
+logger = logging.getLogger(__name__)
+
+
+class MessageWriter:
+    def __init__(self, batch_size: int = MESSAGE_BATCH_SIZE, flush_interval: float = MESSAGE_FLUSH_INTERVAL,
+                 queue_size: int = MESSAGE_QUEUE_SIZE):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.queue_size = queue_size
+        self.queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        self._stopped = False
+        # the batch being written, and the ids of its rows that are stored or discarded
+        self._batch: List[dict] = []
+        self._done: set = set()
+
+    def start(self) -> None:
+        self._stopped = False
+        if self._task is None or self._task.done():
+            self.queue = asyncio.Queue(self.queue_size)
+            self._task = asyncio.create_task(self._run())
+
+    async def submit(self, row: dict) -> None:
+        if self._stopped:
+            raise RuntimeError("The chat message writer is stopped")
+        if self._task is None or self._task.done():
+            self.start()
+        await self.queue.put(row)
+
+    # flush everything queued so far and stop, called on shutdown. Waits at most
+    # `timeout` seconds, then spills the rows that are still unwritten
+    async def stop(self, timeout: float = MESSAGE_SHUTDOWN_TIMEOUT) -> None:
+        self._stopped = True
+        if self._task is None or self._task.done():
+            return
+        try:
+            await asyncio.wait_for(self._drain(), timeout)
+        except asyncio.TimeoutError:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._spill(self._unwritten())
+
+    async def _drain(self) -> None:
+        await self.queue.put(None)
+        await asyncio.shield(self._task)
+
+    def _unwritten(self) -> List[dict]:
+        rows = [row for row in self._batch if id(row) not in self._done]
+        while not self.queue.empty():
+            row = self.queue.get_nowait()
+            if row is not None:
+                rows.append(row)
+        return rows
+
+    def _spill(self, rows: List[dict]) -> None:
+        if not rows:
+            return
+        try:
+            with open(MESSAGE_SPILL_PATH, "a", encoding="utf-8") as f:
+                for row in rows:
+                    f.write(json.dumps({key: _spill_value(value) for key, value in row.items()}) + "\n")
+        except OSError:
+            logger.exception("Could not spill %d unsaved chat messages: %r", len(rows), rows)
+            return
+        # a row whose commit was cut off may be stored already, its import fails as a duplicate
+        logger.error("Database unavailable at shutdown, %d chat messages appended to %s", len(rows), MESSAGE_SPILL_PATH)
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        running = True
+        while running:
+            row = await self.queue.get()
+            if row is None:
+                break
+            batch = [row]
+            self._batch, self._done = batch, set()
+            deadline = loop.time() + self.flush_interval
+            while len(batch) < self.batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    row = await asyncio.wait_for(self.queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+                if row is None:
+                    running = False
+                    break
+                batch.append(row)
+            await self._flush(batch)
+            self._batch = []
+
+    async def _flush(self, batch: List[dict]) -> None:
+        attempt = 0
+        while True:
+            try:
+                async with AsyncSessionLocal() as db:
+                    await db.execute(insert(Messages), batch)
+                    await db.commit()
+                self._done.update(id(row) for row in batch)
+                return
+            except Exception as e:
+                if not _is_transient(e):
+                    rejection = e
+                    break
+                attempt += 1
+                delay = min(0.1 * 2 ** (attempt - 1), MESSAGE_FLUSH_MAX_BACKOFF)
+                logger.exception("Writing %d chat messages failed, retrying in %.1fs", len(batch), delay)
+                await asyncio.sleep(delay)
+
+        if len(batch) == 1:
+            logger.error("Discarded chat message rejected by the database: %r", batch[0], exc_info=rejection)
+            self._done.add(id(batch[0]))
+            return
+        middle = len(batch) // 2
+        await self._flush(batch[:middle])
+        await self._flush(batch[middle:])
+
+
+# the database could not be reached, as opposed to rejecting the rows themselves
+def _is_transient(error: Exception) -> bool:
+    if isinstance(error, (OperationalError, InterfaceError, OSError, asyncio.TimeoutError)):
+        return True
+    return isinstance(error, DBAPIError) and error.connection_invalidated
+
+message_writer = MessageWriter()
+
+
+def _spill_value(value):
+    if isinstance(value, datetime.datetime):
+        return value.isoformat()
+    if isinstance(value, uuid.UUID):
+        return str(value)
+    return value
@@ -0,0 +1,203 @@
+import asyncio
+import datetime
+import logging
+import os
+import time
+from typing import Dict, List, Optional, Set
+
+from sqlalchemy import or_, select, update
+
+from app.db.database import AsyncSessionLocal
+from app.models.models import Users
+from app.repositories.user_repository import invalidate_user
+from app.services.chat_broker import broker
+
+# who is online, from the chat WebSockets open on this process. Every frame a socket
+# receives counts as a heartbeat (idle clients send empty frames); a user whose sockets
+# have all been quiet for PRESENCE_TIMEOUT seconds is offline even if a socket is still open.
+# users.is_online is written back in batches, and only for users whose state has stayed
+# the same for PRESENCE_DEBOUNCE seconds, so a flapping connection does not cost writes.
+# Online rows hold a lease in users.online_at: every PRESENCE_LEASE / 2 seconds a node
+# renews it for its own online users and resets rows whose lease ran out to offline, so a
+# node that crashed does not leave its users online. On shutdown a node writes its users
+# offline; one still connected elsewhere is set online again by that node's next renewal.
+
+PRESENCE_TIMEOUT = float(os.getenv("PRESENCE_TIMEOUT", "60"))
+PRESENCE_DEBOUNCE = float(os.getenv("PRESENCE_DEBOUNCE", "10"))
+PRESENCE_FLUSH_INTERVAL = float(os.getenv("PRESENCE_FLUSH_INTERVAL", "5"))
+PRESENCE_LEASE = float(os.getenv("PRESENCE_LEASE", str(PRESENCE_TIMEOUT * 2)))
+
+logger = logging.getLogger(__name__)
+
+
+class UserPresence:
+    def __init__(self):
+        self.connections = 0
+        self.last_seen = 0.0
+        self.last_seen_at: Optional[datetime.datetime] = None
+        # state as last computed, and since when (monotonic), for the debounce
+        self.online = False
+        self.changed = 0.0
+        # state stored in users.is_online, None when unknown
+        self.persisted: Optional[bool] = None
+
+
+class PresenceRegistry:
+    def __init__(self, timeout: float = PRESENCE_TIMEOUT, debounce: float = PRESENCE_DEBOUNCE,
+                 flush_interval: float = PRESENCE_FLUSH_INTERVAL, lease: float = PRESENCE_LEASE):
+        self.timeout = timeout
+        self.debounce = debounce
+        self.flush_interval = flush_interval
+        self.lease = lease
+        self.users: Dict[int, UserPresence] = {}
+        self._task: Optional[asyncio.Task] = None
+        # monotonic time of the last renew(); 0 runs one on the first cycle after start
+        self._renewed = 0.0
+
+    # WebSocket lifecycle hooks
+    def connect(self, user_id: int) -> None:
+        presence = self.users.get(user_id)
+        if presence is None:
+            presence = self.users[user_id] = UserPresence()
+        presence.connections += 1
+        self.heartbeat(user_id)
+
+    def heartbeat(self, user_id: int) -> None:
+        presence = self.users.get(user_id)
+        if presence is None:
+            return
+        presence.last_seen = time.monotonic()
+        presence.last_seen_at = datetime.datetime.utcnow()
+        self._set_state(presence, presence.connections > 0)
+
+    def disconnect(self, user_id: int) -> None:
+        presence = self.users.get(user_id)
+        if presence is None:
+            return
+        presence.connections = max(presence.connections - 1, 0)
+        self._set_state(presence, presence.connections > 0)
+
+    def _set_state(self, presence: UserPresence, online: bool) -> None:
+        if presence.online != online:
+            presence.online = online
+            presence.changed = time.monotonic()
+
+    def is_online(self, user_id: int) -> bool:
+        presence = self.users.get(user_id)
+        return presence is not None and presence.online
+
+    # presence of many users; users without a socket on this process come from
+    # users.is_online when the chat runs on several nodes, in one query
+    async def get_many(self, user_ids: List[int]) -> Dict[int, dict]:
+        result = {}
+        remote: List[int] = []
+        for user_id in user_ids:
+            presence = self.users.get(user_id)
+            if presence is not None and presence.connections:
+                result[user_id] = {"online": presence.online, "last_seen": presence.last_seen_at}
+            else:
+                result[user_id] = {"online": False, "last_seen": presence.last_seen_at if presence else None}
+                remote.append(user_id)
+        if remote and broker.shared:
+            async with AsyncSessionLocal() as db:
+                rows = await db.execute(select(Users.id).where(
+                    Users.id.in_(remote), Users.is_online.is_(True), Users.online_at >= self._lease_cutoff()
+                ))
+                for (user_id,) in rows:
+                    result[user_id]["online"] = True
+        return result
+
+    # mark users whose sockets went quiet as offline
+    def expire(self) -> None:
+        cutoff = time.monotonic() - self.timeout
+        for presence in self.users.values():
+            if presence.online and presence.last_seen < cutoff:
+                self._set_state(presence, False)
+
+    def start(self) -> None:
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    # this node's sockets go away with it: write all its users offline and stop
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        for presence in self.users.values():
+            presence.connections = 0
+            self._set_state(presence, False)
+        await self.flush(force=True)
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                self.expire()
+                await self.flush()
+                if time.monotonic() - self._renewed >= self.lease / 2:
+                    await self.renew()
+            except Exception:
+                logger.exception("Writing presence failed")
+
+    def _lease_cutoff(self) -> datetime.datetime:
+        return datetime.datetime.utcnow() - datetime.timedelta(seconds=self.lease)
+
+    # extend the lease of this node's online users and reset rows whose lease ran out
+    async def renew(self) -> None:
+        now = datetime.datetime.utcnow()
+        online = sorted(u for u, p in self.users.items() if p.online and p.persisted)
+        expired = or_(Users.online_at.is_(None), Users.online_at < self._lease_cutoff())
+        async with AsyncSessionLocal() as db:
+            if online:
+                await db.execute(
+                    update(Users).where(Users.id.in_(online)).values(is_online=True, online_at=now)
+                    .execution_options(synchronize_session=False)
+                )
+            stale = list(await db.scalars(select(Users.id).where(Users.is_online.is_(True), expired)))
+            if stale:
+                await db.execute(
+                    update(Users).where(Users.id.in_(stale), Users.is_online.is_(True), expired).values(is_online=False)
+                    .execution_options(synchronize_session=False)
+                )
+            await db.commit()
+        self._renewed = time.monotonic()
+        if stale:
+            logger.info("Reset %d users whose presence lease expired", len(stale))
+            await invalidate_user(*stale)
+
+    def _settled(self, force: bool) -> Dict[bool, Set[int]]:
+        cutoff = time.monotonic() - self.debounce
+        changes: Dict[bool, Set[int]] = {True: set(), False: set()}
+        for user_id, presence in self.users.items():
+            if presence.online != presence.persisted and (force or presence.changed <= cutoff):
+                changes[presence.online].add(user_id)
+        return changes
+
+    async def flush(self, force: bool = False) -> None:
+        self._prune()
+        changes = self._settled(force)
+        if not changes[True] and not changes[False]:
+            return
+        values = {True: {"is_online": True, "online_at": datetime.datetime.utcnow()}, False: {"is_online": False}}
+        async with AsyncSessionLocal() as db:
+            for online, user_ids in changes.items():
+                if user_ids:
+                    await db.execute(
+                        update(Users).where(Users.id.in_(sorted(user_ids))).values(**values[online])
+                        .execution_options(synchronize_session=False)
+                    )
+            await db.commit()
+        for online, user_ids in changes.items():
+            for user_id in user_ids:
+                if user_id in self.users:
+                    self.users[user_id].persisted = online
+        self._prune()
+        await invalidate_user(*changes[True], *changes[False])
+
+    # offline and written back, nothing left to track
+    def _prune(self) -> None:
+        for user_id in [u for u, p in self.users.items() if not p.connections and p.persisted is False]:
+            del self.users[user_id]
+
+
+presence = PresenceRegistry()
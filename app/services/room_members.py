@@ -0,0 +1,115 @@
+import asyncio
+import os
+import time
+import uuid
+from collections import OrderedDict
+from typing import Dict, Optional
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.db.database import AsyncSessionLocal
+from app.models.models import ConversationParticipants
+
+# members of chat rooms, loaded with one query the first time a room is checked and then
+# answered from memory by the REST and WebSocket chat paths. Rooms are evicted least recently
+# used first; changes made through this process invalidate the room at once, changes made
+# elsewhere (another worker, the database directly) show up within ROOM_MEMBERS_TTL seconds.
+
+ROOM_MEMBERS_TTL = float(os.getenv("ROOM_MEMBERS_TTL", "60"))
+ROOM_MEMBERS_MAX_ROOMS = int(os.getenv("ROOM_MEMBERS_MAX_ROOMS", "10000"))
+
+# user id -> participant row id
+Members = Dict[int, uuid.UUID]
+
+
+def room_key(room_id) -> Optional[str]:
+    try:
+        return str(room_id if isinstance(room_id, uuid.UUID) else uuid.UUID(str(room_id)))
+    except ValueError:
+        return None
+
+
+class RoomMembers:
+    def __init__(self, ttl: float = ROOM_MEMBERS_TTL, max_rooms: int = ROOM_MEMBERS_MAX_ROOMS):
+        self.ttl = ttl
+        self.max_rooms = max_rooms
+        self.rooms: "OrderedDict[str, tuple]" = OrderedDict()
+        # loads in progress, so a busy room that is not cached yet is queried once
+        self._loading: Dict[str, asyncio.Future] = {}
+        self._invalidations = 0
+        self.hits = 0
+        self.misses = 0
+
+    # db is used on a miss; without one a short-lived session is opened, as the WebSocket holds none
+    async def get(self, room_id, db: Optional[AsyncSession] = None) -> Members:
+        key = room_key(room_id)
+        if key is None:
+            return {}
+        entry = self.rooms.get(key)
+        if entry is not None and entry[0] > time.monotonic():
+            self.rooms.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+        self.misses += 1
+        loading = self._loading.get(key)
+        if loading is not None:
+            return await asyncio.shield(loading)
+        loading = self._loading[key] = asyncio.get_running_loop().create_future()
+        invalidations = self._invalidations
+        try:
+            if db is None:
+                async with AsyncSessionLocal() as session:
+                    members = await self._query(session, key)
+            else:
+                members = await self._query(db, key)
+        except BaseException as e:
+            del self._loading[key]
+            if isinstance(e, asyncio.CancelledError):
+                loading.cancel()
+            else:
+                loading.set_exception(e)
+                # retrieved here so asyncio does not warn when nobody else was waiting
+                loading.exception()
+            raise
+        del self._loading[key]
+
+        # something was invalidated while the query ran, the result may predate it: return it but do not keep it
+        if invalidations == self._invalidations:
+            self.rooms[key] = (time.monotonic() + self.ttl, members)
+            self.rooms.move_to_end(key)
+            while len(self.rooms) > self.max_rooms:
+                self.rooms.popitem(last=False)
+        loading.set_result(members)
+        return members
+
+    async def _query(self, db: AsyncSession, key: str) -> Members:
+        rows = await db.execute(
+            select(ConversationParticipants.user_id, ConversationParticipants.id)
+            .where(ConversationParticipants.room_id == uuid.UUID(key))
+        )
+        return {user_id: participant_id for user_id, participant_id in rows}
+
+    async def is_member(self, room_id, user_id: int, db: Optional[AsyncSession] = None) -> bool:
+        return user_id in await self.get(room_id, db)
+
+    # call after adding or removing participants of a room
+    def invalidate(self, room_id) -> None:
+        key = room_key(room_id)
+        if key is not None:
+            self.rooms.pop(key, None)
+            self._invalidations += 1
+
+
+room_members = RoomMembers()
+
+
+def render_room_members_metrics() -> str:
+    lines = [
+        "# HELP room_members_lookups_total Chat membership checks, by whether the room was cached.",
+        "# TYPE room_members_lookups_total counter",
+        f'room_members_lookups_total{{result="hit"}} {room_members.hits}',
+        f'room_members_lookups_total{{result="miss"}} {room_members.misses}',
+    ]
+    return "\n".join(lines) + "\n"
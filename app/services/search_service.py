@@ -0,0 +1,216 @@
+import asyncio
+import base64
+import heapq
+import json
+import math
+import os
+import re
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import Float, and_, cast, func, literal, literal_column, or_, select, tuple_, union_all
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.models import Comment, Posts as Post, Users
+
+# full-text search over posts, comments and users. PostgreSQL uses its own text search
+# (to_tsvector / ts_rank); other databases use an in-process inverted index that is
+# loaded on first use and then kept current by the create routes. That index lives in
+# one worker: it only sees rows created through that worker's routes after it was
+# loaded, and misses edits, deletes, bulk imports and other workers' writes until a
+# restart. It is meant for single-worker development; run PostgreSQL otherwise.
+
+SEARCH_TS_CONFIG = os.getenv("SEARCH_TS_CONFIG", "simple")
+if not re.fullmatch(r"\w+", SEARCH_TS_CONFIG):
+    raise RuntimeError(f"Invalid SEARCH_TS_CONFIG {SEARCH_TS_CONFIG!r}")
+KINDS = ("comment", "post", "user")
+
+DocKey = Tuple[str, int]
+Hit = Tuple[float, str, int]
+
+_token_re = re.compile(r"\w+")
+
+
+def tokenize(text: Optional[str]) -> List[str]:
+    return _token_re.findall(text.lower()) if text else []
+
+
+# cursor is an opaque token built from the (score, kind, id) of the last hit on a page
+def encode_cursor(hit: Hit) -> str:
+    return base64.urlsafe_b64encode(json.dumps(list(hit)).encode()).decode()
+
+
+def decode_cursor(cursor: str) -> Hit:
+    try:
+        score, kind, doc_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return float(score), str(kind), int(doc_id)
+    except Exception:
+        raise ValueError("Invalid cursor")
+
+
+# ordering of results: best score first, ties broken by (kind, id)
+def _sort_key(hit: Hit):
+    return -hit[0], hit[1], hit[2]
+
+
+class InvertedIndex:
+    # BM25 parameters
+    k1 = 1.2
+    b = 0.75
+
+    def __init__(self):
+        self.postings: Dict[str, Dict[DocKey, int]] = {}
+        self.doc_terms: Dict[DocKey, Counter] = {}
+        self.doc_length: Dict[DocKey, int] = {}
+        self.doc_text: Dict[DocKey, str] = {}
+        self.total_length = 0
+        self.loaded = False
+        self._load_lock = asyncio.Lock()
+
+    # adding a document again replaces it
+    def add(self, kind: str, doc_id: int, text: Optional[str]) -> None:
+        key = (kind, doc_id)
+        self.remove(kind, doc_id)
+        terms = Counter(tokenize(text))
+        if not terms:
+            return
+        self.doc_terms[key] = terms
+        self.doc_text[key] = text
+        self.doc_length[key] = sum(terms.values())
+        self.total_length += self.doc_length[key]
+        for term, count in terms.items():
+            self.postings.setdefault(term, {})[key] = count
+
+    def remove(self, kind: str, doc_id: int) -> None:
+        key = (kind, doc_id)
+        terms = self.doc_terms.pop(key, None)
+        if terms is None:
+            return
+        self.doc_text.pop(key, None)
+        self.total_length -= self.doc_length.pop(key)
+        for term in terms:
+            docs = self.postings.get(term)
+            if docs is not None:
+                docs.pop(key, None)
+                if not docs:
+                    del self.postings[term]
+
+    async def ensure_loaded(self, db: AsyncSession) -> None:
+        if self.loaded:
+            return
+        async with self._load_lock:
+            if self.loaded:
+                return
+            async for post_id, text in await db.stream(select(Post.id, Post.post_text)):
+                self.add("post", post_id, text)
+            async for comment_id, text in await db.stream(select(Comment.id, Comment.comment)):
+                self.add("comment", comment_id, text)
+            async for user_id, name, bio in await db.stream(select(Users.id, Users.name, Users.bio)):
+                self.add("user", user_id, _user_text(name, bio))
+            self.loaded = True
+
+    def search(self, query: str, kinds, limit: int, after: Optional[Hit]) -> List[Tuple[Hit, str]]:
+        terms = set(tokenize(query))
+        if not terms or not self.doc_terms:
+            return []
+        doc_count = len(self.doc_terms)
+        avg_length = self.total_length / doc_count
+        scores: Dict[DocKey, float] = {}
+        for term in terms:
+            docs = self.postings.get(term)
+            if not docs:
+                continue
+            idf = math.log(1 + (doc_count - len(docs) + 0.5) / (len(docs) + 0.5))
+            for key, count in docs.items():
+                if key[0] not in kinds:
+                    continue
+                norm = count + self.k1 * (1 - self.b + self.b * self.doc_length[key] / avg_length)
+                scores[key] = scores.get(key, 0.0) + idf * count * (self.k1 + 1) / norm
+
+        hits = [(round(score, 6), kind, doc_id) for (kind, doc_id), score in scores.items()]
+        if after:
+            hits = [hit for hit in hits if _sort_key(hit) > _sort_key(after)]
+        hits = heapq.nsmallest(limit, hits, key=_sort_key)
+        return [(hit, self.doc_text[(hit[1], hit[2])]) for hit in hits]
+
+
+def _user_text(name: Optional[str], bio: Optional[str]) -> str:
+    return " ".join(part for part in (name, bio) if part)
+
+
+index = InvertedIndex()
+
+
+def _uses_native_search(db: AsyncSession) -> bool:
+    return db.bind.dialect.name == "postgresql"
+
+
+# incremental updates, called after the row is committed
+def index_post(db: AsyncSession, post: Post) -> None:
+    if not _uses_native_search(db):
+        index.add("post", post.id, post.post_text)
+
+
+def index_comment(db: AsyncSession, comment: Comment) -> None:
+    if not _uses_native_search(db):
+        index.add("comment", comment.id, comment.comment)
+
+
+def index_user(db: AsyncSession, user: Users) -> None:
+    if not _uses_native_search(db):
+        index.add("user", user.id, _user_text(user.name, user.bio))
+
+
+async def _native_search(db: AsyncSession, query: str, kinds, limit: int, after: Optional[Hit]) -> List[Tuple[Hit, str]]:
+    # config and literals are inlined rather than bound, so the expressions match the
+    # GIN indexes on posts and comments (migration 0003) and users (migration 0006)
+    config = literal_column(f"'{SEARCH_TS_CONFIG}'::regconfig")
+    empty = literal_column("''")
+    tsquery = func.plainto_tsquery(config, query)
+    # concat_ws is not IMMUTABLE and cannot be indexed, || on coalesced columns can
+    user_text = func.coalesce(Users.name, empty).op("||")(literal_column("' '")).op("||")(func.coalesce(Users.bio, empty))
+    # (id, indexed text, returned text)
+    sources = {
+        "post": (Post.id, func.coalesce(Post.post_text, empty), Post.post_text),
+        "comment": (Comment.id, func.coalesce(Comment.comment, empty), Comment.comment),
+        "user": (Users.id, user_text, func.concat_ws(" ", Users.name, Users.bio)),
+    }
+    selects = []
+    for kind in kinds:
+        id_column, text, shown = sources[kind]
+        vector = func.to_tsvector(config, text)
+        selects.append(
+            select(
+                cast(func.ts_rank(vector, tsquery), Float).label("score"),
+                literal(kind).label("kind"),
+                id_column.label("id"),
+                shown.label("text"),
+            ).where(vector.op("@@")(tsquery))
+        )
+    results = union_all(*selects).subquery()
+    stmt = select(results.c.score, results.c.kind, results.c.id, results.c.text)
+    if after:
+        score, kind, doc_id = after
+        stmt = stmt.where(or_(
+            results.c.score < score,
+            and_(results.c.score == score, tuple_(results.c.kind, results.c.id) > tuple_(kind, doc_id)),
+        ))
+    stmt = stmt.order_by(results.c.score.desc(), results.c.kind, results.c.id).limit(limit)
+    return [((score, kind, doc_id), text) for score, kind, doc_id, text in await db.execute(stmt)]
+
+
+async def search(db: AsyncSession, query: str, kinds=KINDS, limit: int = 20,
+                 cursor: Optional[str] = None) -> Tuple[List[dict], Optional[str]]:
+    after = decode_cursor(cursor) if cursor else None
+    if _uses_native_search(db):
+        rows = await _native_search(db, query, kinds, limit + 1, after)
+    else:
+        await index.ensure_loaded(db)
+        rows = index.search(query, kinds, limit + 1, after)
+
+    next_cursor = encode_cursor(rows[limit - 1][0]) if len(rows) > limit else None
+    results = [
+        {"kind": kind, "id": doc_id, "score": score, "text": text}
+        for (score, kind, doc_id), text in rows[:limit]
+    ]
+    return results, next_cursor
@@ -1,7 +1,12 @@
-from fastapi import UploadFile
-from sqlalchemy.orm import Session
+from fastapi import BackgroundTasks, UploadFile
+from sqlalchemy.ext.asyncio import AsyncSession
 from app.repositories import user_repository, file_repository
 
-def handle_profile_picture_upload(db: Session, user_id: int, file: UploadFile):
-    filename = file_repository.save_file(user_id, file)
-    return user_repository.update_profile_picture(db, user_id, filename)
+async def handle_profile_picture_upload(db: AsyncSession, user_id: int, file: UploadFile, background_tasks: BackgroundTasks):
+    # unknown users get nothing stored; the lookup is kept in the session for the update below
+    if await user_repository.get_user_by_id(db, user_id) is None:
+        return None
+    filename = await file_repository.save_file(file)
+    # thumbnails are made after the response has been sent
+    background_tasks.add_task(file_repository.generate_thumbnails, filename)
+    return await user_repository.update_profile_picture(db, user_id, filename)
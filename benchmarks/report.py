@@ -0,0 +1,85 @@
+import json
+import math
+from typing import Dict, List, Optional
+
+# latency statistics, baseline files and regression checks for benchmarks.run
+
+# a scenario regresses when p95 latency grows, or throughput drops, by more than the tolerance
+DEFAULT_TOLERANCE = 0.15
+
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    rank = max(1, math.ceil(pct / 100 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+class Recorder:
+    def __init__(self):
+        self.latencies: List[float] = []
+        self.errors = 0
+
+    def add(self, seconds: float, ok: bool = True) -> None:
+        self.latencies.append(seconds)
+        if not ok:
+            self.errors += 1
+
+    def summary(self, elapsed: float) -> dict:
+        values = sorted(self.latencies)
+        return {
+            "requests": len(values),
+            "errors": self.errors,
+            "rps": round(len(values) / elapsed, 1) if elapsed else 0.0,
+            "p50_ms": round(percentile(values, 50) * 1000, 2),
+            "p95_ms": round(percentile(values, 95) * 1000, 2),
+            "p99_ms": round(percentile(values, 99) * 1000, 2),
+        }
+
+
+def print_results(results: dict) -> None:
+    print(f"{'scenario':<32} {'requests':>9} {'errors':>7} {'req/s':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+    for name, row in results["scenarios"].items():
+        print(f"{name:<32} {row['requests']:>9} {row['errors']:>7} {row['rps']:>9} "
+              f"{row['p50_ms']:>9} {row['p95_ms']:>9} {row['p99_ms']:>9}")
+        if "delivered_per_s" in row:
+            print(f"{'':<32} messages/s sent {row['rps']}, delivered {row['delivered_per_s']}")
+
+
+def save(results: dict, path: str) -> None:
+    with open(path, "w") as f:
+        json.dump(results, f, indent=2, sort_keys=True)
+        f.write("\n")
+
+
+def load(path: str) -> dict:
+    with open(path) as f:
+        return json.load(f)
+
+
+# regressions of `results` against `baseline`, as printable lines
+def compare(results: dict, baseline: dict, tolerance: float = DEFAULT_TOLERANCE) -> List[str]:
+    if results.get("config") != baseline.get("config"):
+        print("warning: benchmark configuration differs from the baseline, numbers may not be comparable")
+
+    regressions = []
+    print(f"\n{'scenario':<32} {'req/s':>18} {'p95 ms':>18}")
+    for name, row in results["scenarios"].items():
+        base: Optional[Dict] = baseline["scenarios"].get(name)
+        if base is None:
+            print(f"{name:<32} (not in baseline)")
+            continue
+        rps_change = _change(row["rps"], base["rps"])
+        p95_change = _change(row["p95_ms"], base["p95_ms"])
+        print(f"{name:<32} {row['rps']:>9} {rps_change:>+7.1%} {row['p95_ms']:>9} {p95_change:>+7.1%}")
+        if rps_change < -tolerance:
+            regressions.append(f"{name}: req/s {base['rps']} -> {row['rps']} ({rps_change:+.1%})")
+        if p95_change > tolerance:
+            regressions.append(f"{name}: p95 {base['p95_ms']} ms -> {row['p95_ms']} ms ({p95_change:+.1%})")
+        if row["errors"] > base["errors"]:
+            regressions.append(f"{name}: errors {base['errors']} -> {row['errors']}")
+    return regressions
+
+
+def _change(value: float, base: float) -> float:
+    return (value - base) / base if base else 0.0
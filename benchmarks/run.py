@@ -0,0 +1,243 @@
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+import httpx
+from sqlalchemy import func, select
+from websockets.asyncio.client import connect
+
+from app.db.database import engine
+from app.models.models import ConversationParticipants, Posts, Users
+from benchmarks import report
+from benchmarks.seed import WORDS
+
+# drive the REST routes and the chat WebSocket at a fixed concurrency and report latency
+# percentiles and throughput per endpoint. Runs against DATABASE_URL, which should hold a
+# freshly seeded graph (benchmarks.seed); the write scenarios add rows, so reseed between
+# runs that are compared with each other.
+# usage: python -m benchmarks.run [--url URL] [--save-baseline FILE | --compare FILE]
+
+Request = Tuple[str, str, Optional[dict]]
+
+
+class Graph:
+    # what the request generators need to know about the seeded data
+    def __init__(self, max_user: int, max_post: int, rooms: Dict[str, List[int]]):
+        self.max_user = max_user
+        self.max_post = max_post
+        self.rooms = rooms
+
+    @classmethod
+    def load(cls) -> "Graph":
+        with engine.connect() as conn:
+            max_user = conn.scalar(select(func.max(Users.id))) or 0
+            max_post = conn.scalar(select(func.max(Posts.id))) or 0
+            rooms: Dict[str, List[int]] = {}
+            for room_id, user_id in conn.execute(select(ConversationParticipants.room_id, ConversationParticipants.user_id)):
+                rooms.setdefault(str(room_id), []).append(user_id)
+        if not max_user or not max_post or not rooms:
+            raise SystemExit("the database has no users, posts or rooms; run python -m benchmarks.seed first")
+        return cls(max_user, max_post, rooms)
+
+    def user(self, rng: random.Random) -> int:
+        return rng.randint(1, self.max_user)
+
+    def post(self, rng: random.Random) -> int:
+        return rng.randint(1, self.max_post)
+
+    def room(self, rng: random.Random) -> str:
+        return rng.choice(list(self.rooms))
+
+
+# name -> request generator; reads first, writes last so they do not skew the reads
+SCENARIOS: Dict[str, Callable[[Graph, random.Random], Request]] = {
+    "GET /posts": lambda g, rng: ("GET", "/posts?limit=20", None),
+    "GET /posts/{id}": lambda g, rng: ("GET", f"/posts/{g.post(rng)}", None),
+    "GET /posts/{id}/comments": lambda g, rng: ("GET", f"/posts/{g.post(rng)}/comments?limit=20", None),
+    "GET /user/{id}/posts": lambda g, rng: ("GET", f"/user/{g.user(rng)}/posts", None),
+    "GET /users/{id}": lambda g, rng: ("GET", f"/users/{g.user(rng)}", None),
+    "GET /users/{id}/feed": lambda g, rng: ("GET", f"/users/{g.user(rng)}/feed?limit=20", None),
+    "GET /users/{id}/followers": lambda g, rng: ("GET", f"/users/{g.user(rng)}/followers?limit=20", None),
+    "POST /users:batchGet": lambda g, rng: ("POST", "/users:batchGet", {"ids": [g.user(rng) for _ in range(50)]}),
+    "POST /posts:batchGet": lambda g, rng: ("POST", "/posts:batchGet", {"ids": [g.post(rng) for _ in range(50)]}),
+    "GET /search": lambda g, rng: ("GET", f"/search?q={rng.choice(WORDS)}", None),
+    "GET /users/{id}/inbox": lambda g, rng: ("GET", f"/users/{g.user(rng)}/inbox", None),
+    "GET /chat/{id}/get-message/": lambda g, rng: ("GET", f"/chat/{g.room(rng)}/get-message/?limit=50", None),
+    "POST /posts": lambda g, rng: ("POST", "/posts", {
+        "id": 0, "user_id": g.user(rng), "post_type": "text", "post_text": " ".join(rng.sample(WORDS, 10)),
+    }),
+    "POST /users/{id}/posts/{id}/like": lambda g, rng: ("POST", f"/users/{g.user(rng)}/posts/{g.post(rng)}/like", None),
+}
+WEBSOCKET_SCENARIO = "WS /ws/{chat_id}/{user_id}"
+
+
+async def _http_worker(client: httpx.AsyncClient, make_request, graph: Graph, rng: random.Random,
+                       deadline: float, recorder: Optional[report.Recorder]) -> None:
+    while time.perf_counter() < deadline:
+        method, path, body = make_request(graph, rng)
+        started = time.perf_counter()
+        try:
+            response = await client.request(method, path, json=body)
+            ok = response.status_code < 400
+        except httpx.HTTPError:
+            ok = False
+        if recorder is not None:
+            recorder.add(time.perf_counter() - started, ok)
+
+
+async def run_http_scenario(client: httpx.AsyncClient, name: str, graph: Graph, args) -> dict:
+    make_request = SCENARIOS[name]
+    rngs = [random.Random(f"{args.seed}:{name}:{i}") for i in range(args.concurrency)]
+    # warmup fills caches and the connection pools, its timings are dropped
+    deadline = time.perf_counter() + args.warmup
+    await asyncio.gather(*(_http_worker(client, make_request, graph, rng, deadline, None) for rng in rngs))
+
+    recorder = report.Recorder()
+    started = time.perf_counter()
+    deadline = started + args.duration
+    await asyncio.gather(*(_http_worker(client, make_request, graph, rng, deadline, recorder) for rng in rngs))
+    return recorder.summary(time.perf_counter() - started)
+
+
+# each client sends a message, waits for the broadcast to come back to it, and repeats;
+# messages from the other members of the room are counted as deliveries on the way
+async def _ws_client(url: str, marker_prefix: str, deadline: float, recorder: report.Recorder,
+                     delivered: List[int], timeout: float) -> None:
+    async with connect(url) as ws:
+        seq = 0
+        while time.perf_counter() < deadline:
+            marker = f"{marker_prefix}:{seq}"
+            started = time.perf_counter()
+            await ws.send(marker)
+            try:
+                while True:
+                    message = json.loads(await asyncio.wait_for(ws.recv(), timeout))
+                    delivered[0] += 1
+                    if message["content"] == marker:
+                        break
+            except asyncio.TimeoutError:
+                recorder.add(time.perf_counter() - started, ok=False)
+                return
+            recorder.add(time.perf_counter() - started)
+            seq += 1
+
+
+async def run_websocket_scenario(base_url: str, graph: Graph, args) -> dict:
+    ws_base = base_url.replace("http", "ws", 1)
+    rng = random.Random(args.seed)
+    rooms = rng.sample(sorted(graph.rooms), min(args.ws_rooms, len(graph.rooms)))
+    recorder = report.Recorder()
+    delivered = [0]
+    started = time.perf_counter()
+    deadline = started + args.duration
+    await asyncio.gather(*(
+        _ws_client(f"{ws_base}/ws/{room}/{user_id}", f"bench {room} {user_id}", deadline, recorder, delivered, args.timeout)
+        for room in rooms
+        for user_id in graph.rooms[room][:args.ws_clients]
+    ))
+    elapsed = time.perf_counter() - started
+    summary = recorder.summary(elapsed)
+    summary["delivered_per_s"] = round(delivered[0] / elapsed, 1)
+    return summary
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+# run the app under uvicorn with the current environment (DATABASE_URL, pool and cache settings)
+def start_server(workers: int) -> Tuple[subprocess.Popen, str]:
+    port = _free_port()
+    process = subprocess.Popen([
+        sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(port),
+        "--workers", str(workers), "--log-level", "warning",
+    ], env=os.environ.copy())
+    url = f"http://127.0.0.1:{port}"
+    for _ in range(100):
+        if process.poll() is not None:
+            raise SystemExit("the server exited during startup")
+        try:
+            if httpx.get(f"{url}/metrics").status_code == 200:
+                return process, url
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    process.terminate()
+    raise SystemExit("the server did not start")
+
+
+async def run(args, base_url: str) -> dict:
+    graph = Graph.load()
+    names = args.only or list(SCENARIOS) + [WEBSOCKET_SCENARIO]
+    results = {
+        "config": {
+            "concurrency": args.concurrency, "duration": args.duration, "workers": args.workers,
+            "ws_rooms": args.ws_rooms, "ws_clients": args.ws_clients, "dialect": engine.dialect.name,
+            "users": graph.max_user, "posts": graph.max_post, "rooms": len(graph.rooms),
+        },
+        "scenarios": {},
+    }
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=args.timeout) as client:
+        for name in names:
+            if name == WEBSOCKET_SCENARIO:
+                results["scenarios"][name] = await run_websocket_scenario(base_url, graph, args)
+            else:
+                results["scenarios"][name] = await run_http_scenario(client, name, graph, args)
+            print(f"{name}: {results['scenarios'][name]}", file=sys.stderr)
+    return results
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmark the REST and WebSocket endpoints")
+    parser.add_argument("--url", help="benchmark a running server instead of starting one")
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn workers for the started server")
+    parser.add_argument("--concurrency", type=int, default=16, help="requests in flight per HTTP scenario")
+    parser.add_argument("--duration", type=float, default=10, help="seconds measured per scenario")
+    parser.add_argument("--warmup", type=float, default=2, help="seconds run before measuring each HTTP scenario")
+    parser.add_argument("--timeout", type=float, default=10, help="seconds before a request counts as failed")
+    parser.add_argument("--ws-rooms", type=int, default=20, help="rooms used by the WebSocket scenario")
+    parser.add_argument("--ws-clients", type=int, default=5, help="connected members per room")
+    parser.add_argument("--only", nargs="+", choices=list(SCENARIOS) + [WEBSOCKET_SCENARIO], metavar="SCENARIO")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="write the results as JSON")
+    parser.add_argument("--save-baseline", metavar="FILE", help="write the results as the new baseline")
+    parser.add_argument("--compare", metavar="FILE", help="compare with a baseline, exit 1 on regressions")
+    parser.add_argument("--tolerance", type=float, default=report.DEFAULT_TOLERANCE)
+    args = parser.parse_args()
+
+    process = None
+    base_url = args.url
+    if base_url is None:
+        process, base_url = start_server(args.workers)
+    try:
+        results = asyncio.run(run(args, base_url.rstrip("/")))
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait()
+
+    report.print_results(results)
+    for path in (args.output, args.save_baseline):
+        if path:
+            report.save(results, path)
+    if args.compare:
+        regressions = report.compare(results, report.load(args.compare), args.tolerance)
+        if regressions:
+            print("\nregressions:\n  " + "\n  ".join(regressions))
+            return 1
+        print("\nno regressions")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,129 @@
+import argparse
+import datetime
+import random
+import uuid
+from collections import Counter
+from typing import Dict, List
+
+from sqlalchemy import insert, text
+
+from app.db.database import engine
+from app.models.models import Comment, Conversations, ConversationParticipants, Follow, Likes, Messages, Posts, Users
+
+# fill an empty, migrated database with a synthetic social graph for the benchmarks.
+# the same arguments and --seed always produce the same data.
+# usage: python -m benchmarks.seed --users 2000 --follows 50 --posts 10 ...
+
+WORDS = (
+    "alpha bravo charlie delta echo foxtrot golf hotel india juliet kilo lima mike november "
+    "oscar papa quebec romeo sierra tango uniform victor whiskey xray yankee zulu"
+).split()
+
+INSERT_BATCH_SIZE = 5000
+
+
+def _text(rng: random.Random, words: int) -> str:
+    return " ".join(rng.choice(WORDS) for _ in range(words))
+
+
+def _insert(conn, model, rows: List[dict]) -> None:
+    for start in range(0, len(rows), INSERT_BATCH_SIZE):
+        conn.execute(insert(model), rows[start:start + INSERT_BATCH_SIZE])
+
+
+def build_graph(args) -> Dict[type, List[dict]]:
+    rng = random.Random(args.seed)
+    now = datetime.datetime(2026, 1, 1)
+    user_ids = list(range(1, args.users + 1))
+
+    follows = set()
+    for follower in user_ids:
+        picked = [u for u in rng.sample(user_ids, min(args.follows + 1, len(user_ids))) if u != follower]
+        follows.update((follower, following) for following in picked[:args.follows])
+    followers = Counter(following for _, following in follows)
+    following = Counter(follower for follower, _ in follows)
+
+    posts, comments, likes = [], [], []
+    for user_id in user_ids:
+        for _ in range(args.posts):
+            post_id = len(posts) + 1
+            created_at = now - datetime.timedelta(seconds=rng.randrange(30 * 24 * 3600))
+            post_comments = rng.randint(0, 2 * args.comments)
+            for _ in range(post_comments):
+                comments.append({
+                    "id": len(comments) + 1, "user_id": rng.choice(user_ids), "post_id": post_id,
+                    "comment_type": "TEXT", "comment": _text(rng, 8), "likes": 0,
+                    "created_at": created_at + datetime.timedelta(seconds=rng.randrange(1, 3600)),
+                })
+            likers = rng.sample(user_ids, min(rng.randint(0, 2 * args.likes), len(user_ids)))
+            likes += [{"user_id": liker, "post_id": post_id, "created_at": created_at} for liker in likers]
+            posts.append({
+                "id": post_id, "user_id": user_id, "post_type": "text", "post_text": _text(rng, 20),
+                "likes": len(likers), "comment_count": post_comments, "created_at": created_at,
+            })
+
+    rooms, participants, messages = [], [], []
+    for _ in range(args.rooms):
+        room_id = uuid.UUID(int=rng.getrandbits(128), version=4)
+        members = rng.sample(user_ids, min(args.room_size, len(user_ids)))
+        rooms.append({"room_id": room_id, "is_group": len(members) > 2, "name": _text(rng, 2),
+                      "creator_id": members[0], "created_at": now})
+        participants += [{"id": uuid.UUID(int=rng.getrandbits(128), version=4), "room_id": room_id, "user_id": m}
+                         for m in members]
+        for i in range(args.messages):
+            messages.append({
+                "message_id": uuid.UUID(int=rng.getrandbits(128), version=4), "room_id": room_id,
+                "sender_id": rng.choice(members), "content": _text(rng, 10),
+                "sent_at": now - datetime.timedelta(seconds=args.messages - i),
+            })
+
+    users = [{
+        "id": user_id, "name": f"user{user_id}", "email": f"user{user_id}@bench.local",
+        "bio": _text(rng, 6), "is_active": True, "is_online": False, "created_at": now,
+        "followers": followers[user_id], "following": following[user_id],
+    } for user_id in user_ids]
+
+    return {
+        Users: users,
+        Follow: [{"follower_id": a, "following_id": b, "created_at": now} for a, b in sorted(follows)],
+        Posts: posts,
+        Comment: comments,
+        Likes: likes,
+        Conversations: rooms,
+        ConversationParticipants: participants,
+        Messages: messages,
+    }
+
+
+def seed(args) -> None:
+    graph = build_graph(args)
+    with engine.begin() as conn:
+        if conn.scalar(text("SELECT count(*) FROM users")):
+            raise SystemExit("the database already has users, seed an empty database")
+        for model, rows in graph.items():
+            _insert(conn, model, rows)
+            print(f"{model.__tablename__}: {len(rows)} rows")
+        if conn.dialect.name == "postgresql":
+            # rows were inserted with explicit ids, move the sequences past them
+            for table in ("users", "posts", "comment"):
+                conn.execute(text(
+                    f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), (SELECT max(id) FROM {table}))"
+                ))
+
+
+def add_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument("--users", type=int, default=2000)
+    parser.add_argument("--follows", type=int, default=50, help="follows per user")
+    parser.add_argument("--posts", type=int, default=10, help="posts per user")
+    parser.add_argument("--comments", type=int, default=3, help="average comments per post")
+    parser.add_argument("--likes", type=int, default=5, help="average likes per post")
+    parser.add_argument("--rooms", type=int, default=200)
+    parser.add_argument("--room-size", type=int, default=5, help="participants per room")
+    parser.add_argument("--messages", type=int, default=200, help="messages per room")
+    parser.add_argument("--seed", type=int, default=1)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Seed a database with a synthetic social graph")
+    add_arguments(parser)
+    seed(parser.parse_args())
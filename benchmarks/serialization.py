@@ -0,0 +1,136 @@
+import argparse
+import json
+import sys
+import time
+from typing import Callable, Dict, List, Tuple
+
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from app.api.responses import dump_list, list_adapter
+from app.db.database import engine
+from app.models.models import Messages, Posts, Users
+from app.repositories import message_repository, post_repository
+from app.schema.chatSchema import MessageSchema
+from app.schema.schema import PostOut, UserBase
+
+# per-row cost of building a list response, the way the list routes used to (Post entities,
+# response_model validation, dicts, stdlib JSON) and the way they do now (column rows, one
+# TypeAdapter pass straight to JSON bytes). Times loading and serializing a page of rows
+# from DATABASE_URL; seed it first with benchmarks.seed.
+# usage: python -m benchmarks.serialization [--rows 200] [--repeat 100]
+
+
+# what JSONResponse.render does with the content FastAPI hands it
+def _stdlib_render(content) -> bytes:
+    return json.dumps(content, ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")).encode("utf-8")
+
+
+# response_model: validate the returned objects, dump them to JSON-able dicts, encode those
+def _response_model_render(model, rows) -> bytes:
+    adapter = list_adapter(model)
+    return _stdlib_render(adapter.dump_python(adapter.validate_python(rows, from_attributes=True), mode="json"))
+
+
+def _message_fields(msg: dict) -> dict:
+    return {"message_id": msg["message_id"], "user_id": msg["sender_id"], "room_id": msg["room_id"],
+            "message": msg["content"], "timestamp": msg["sent_at"]}
+
+
+def _load_post_entities(rows: int):
+    with Session(engine) as session:
+        return session.scalars(select(Posts).order_by(Posts.id).limit(rows)).all()
+
+
+def _load_post_rows(rows: int):
+    with engine.connect() as conn:
+        return conn.execute(select(*post_repository.POST_COLUMNS).order_by(Posts.id).limit(rows)).all()
+
+
+def _load_users(rows: int):
+    with engine.connect() as conn:
+        return conn.execute(select(Users.id, Users.name, Users.profile_picture).order_by(Users.id).limit(rows)).mappings().all()
+
+
+def _load_messages(rows: int):
+    with Session(engine) as session:
+        return [message_repository.to_dict(m) for m in session.scalars(select(Messages).limit(rows))]
+
+
+# name -> (load, serialize) for the old path and for the new one
+Path = Tuple[Callable[[int], object], Callable[[object], bytes]]
+CASES: Dict[str, Tuple[Path, Path]] = {
+    "posts (PostOut)": (
+        (_load_post_entities, lambda rows: _response_model_render(PostOut, rows)),
+        (_load_post_rows, lambda rows: dump_list(PostOut, rows)),
+    ),
+    "followers (UserBase)": (
+        (_load_users, lambda rows: _response_model_render(UserBase, rows)),
+        (_load_users, lambda rows: dump_list(UserBase, rows)),
+    ),
+    "messages (MessageSchema)": (
+        (_load_messages, lambda rows: _stdlib_render(jsonable_encoder([MessageSchema(**_message_fields(m)) for m in rows]))),
+        (_load_messages, lambda rows: dump_list(MessageSchema, [_message_fields(m) for m in rows])),
+    ),
+}
+
+
+# fastest of `repeat` runs in microseconds per row; the minimum is the least disturbed by other work
+def _time_per_row(fn: Callable[[], object], rows: int, repeat: int) -> float:
+    fn()
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - started)
+    return min(samples) / rows * 1e6
+
+
+def measure(rows: int, repeat: int) -> List[dict]:
+    results = []
+    # a loader shared by both paths is timed once, so its noise does not read as a difference
+    load_timings: Dict[Callable, float] = {}
+    for name, paths in CASES.items():
+        timings = {}
+        for label, (load, serialize) in zip(("before", "after"), paths):
+            loaded = load(rows)
+            if not loaded:
+                raise SystemExit("the database has no rows to serialize; run python -m benchmarks.seed first")
+            count = len(loaded)
+            if load not in load_timings:
+                load_timings[load] = _time_per_row(lambda: load(rows), count, repeat)
+            timings[label] = {
+                "load": load_timings[load],
+                "serialize": _time_per_row(lambda: serialize(loaded), count, repeat),
+            }
+        if _response_json(paths[0], rows) != _response_json(paths[1], rows):
+            raise SystemExit(f"{name}: the two paths produce different JSON")
+        results.append({"case": name, "rows": count, **timings})
+    return results
+
+
+def _response_json(path: Path, rows: int):
+    load, serialize = path
+    return json.loads(serialize(load(rows)))
+
+
+def print_results(results: List[dict]) -> None:
+    print(f"{'case':<26} {'phase':<10} {'before us/row':>14} {'after us/row':>13} {'speedup':>8}")
+    for result in results:
+        for phase in ("load", "serialize"):
+            before, after = result["before"][phase], result["after"][phase]
+            print(f"{result['case']:<26} {phase:<10} {before:>14.2f} {after:>13.2f} {before / after:>7.1f}x")
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Per-row cost of the list response paths, before and after")
+    parser.add_argument("--rows", type=int, default=200, help="rows per response, like a page at MAX_PAGE_SIZE")
+    parser.add_argument("--repeat", type=int, default=100)
+    args = parser.parse_args()
+    print_results(measure(args.rows, args.repeat))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,14 +1,46 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
-from app.api.routes import follower, user , post , chat
-import app.models.models as models
-from app.db.database import engine , get_db
+from fastapi.responses import ORJSONResponse
+from app.api.routes import follower, user , post , chat, feed, metrics, media, search, admin
+from app.services.chat_broker import broker
+from app.services.message_writer import message_writer
+from app.services.like_counter import like_counter
+from app.services.presence import presence
+from app.services import feed_service
+from app.repositories.cache import object_cache
+from app.repositories.file_repository import shutdown_thumbnail_pool
+from app.api.request_metrics import RequestMetricsMiddleware, loop_lag_monitor
+from app.api.upload_limit import UploadLimitMiddleware
 
 
 
-app = FastAPI(allow_methods=["*"], allow_headers=["*"] , allow_origins=["*"])
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    message_writer.start()
+    like_counter.start()
+    presence.start()
+    loop_lag_monitor.start()
+    yield
+    await loop_lag_monitor.stop()
+    await broker.close()
+    await message_writer.stop()
+    await like_counter.stop()
+    await presence.stop()
+    await object_cache.close()
+    await feed_service.store.close()
+    shutdown_thumbnail_pool()
+
+
+# routes without a faster path of their own are rendered with orjson instead of the stdlib encoder
+app = FastAPI(lifespan=lifespan, default_response_class=ORJSONResponse, allow_methods=["*"], allow_headers=["*"] , allow_origins=["*"])
+app.add_middleware(UploadLimitMiddleware)
+app.add_middleware(RequestMetricsMiddleware)
 app.include_router(user.router)
 app.include_router(post.router) 
 app.include_router(chat.router)
 app.include_router(follower.router)
-
-models.Base.metadata.create_all(bind=engine)
+app.include_router(feed.router)
+app.include_router(metrics.router)
+app.include_router(media.router)
+app.include_router(search.router)
+app.include_router(admin.router)
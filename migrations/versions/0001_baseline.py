@@ -0,0 +1,124 @@
+"""baseline schema, as created by create_all before migrations
+
+Databases that already have these tables: `alembic stamp 0001` and upgrade from there.
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = '0001'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    if op.get_bind().dialect.name == "postgresql":
+        # uuid_generate_v4() server defaults
+        op.execute('CREATE EXTENSION IF NOT EXISTS "uuid-ossp"')
+
+    op.create_table(
+        'users',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('name', sa.String(40), nullable=False),
+        sa.Column('email', sa.String(50), nullable=False),
+        sa.Column('phone', sa.BigInteger()),
+        sa.Column('bio', sa.String(100)),
+        sa.Column('is_active', sa.Boolean()),
+        sa.Column('is_online', sa.Boolean()),
+        sa.Column('created_at', sa.DateTime()),
+        sa.Column('profile_picture', sa.Text()),
+        sa.Column('followers', sa.Integer(), server_default=sa.text('0')),
+        sa.Column('following', sa.Integer(), server_default=sa.text('0')),
+        sa.CheckConstraint('followers >= 0', name='chk_followers_nonnegative'),
+        sa.CheckConstraint('following >= 0', name='chk_following_nonnegative'),
+        sa.PrimaryKeyConstraint('id', name='users_pkey'),
+        sa.UniqueConstraint('email', name='users_email_key'),
+    )
+    op.create_table(
+        'conversations',
+        sa.Column('room_id', sa.Uuid(), server_default=sa.text('uuid_generate_v4()'), nullable=False),
+        sa.Column('is_group', sa.Boolean()),
+        sa.Column('name', sa.String(255)),
+        sa.Column('creator_id', sa.Integer()),
+        sa.Column('created_at', sa.DateTime(), server_default=sa.text('CURRENT_TIMESTAMP')),
+        sa.ForeignKeyConstraint(['creator_id'], ['users.id'], name='conversations_creator_id_fkey'),
+        sa.PrimaryKeyConstraint('room_id', name='conversations_pkey'),
+    )
+    op.create_table(
+        'follow',
+        sa.Column('follower_id', sa.Integer(), nullable=False),
+        sa.Column('following_id', sa.Integer(), nullable=False),
+        sa.Column('created_at', sa.DateTime()),
+        sa.CheckConstraint('follower_id <> following_id', name='not_same_follower'),
+        sa.ForeignKeyConstraint(['follower_id'], ['users.id'], name='follow_follower_id_fkey'),
+        sa.ForeignKeyConstraint(['following_id'], ['users.id'], name='follow_following_id_fkey'),
+        sa.PrimaryKeyConstraint('follower_id', 'following_id', name='follow_pkey'),
+    )
+    op.create_table(
+        'posts',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.Integer()),
+        sa.Column('post_type', sa.Enum('text', 'image', 'video', name='posttype')),
+        sa.Column('post_text', sa.String(1000)),
+        sa.Column('likes', sa.Integer()),
+        sa.Column('created_at', sa.DateTime()),
+        sa.CheckConstraint('likes >= 0', name='chk_likes_nonnegative'),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE', name='posts_user_id_fkey'),
+        sa.PrimaryKeyConstraint('id', name='posts_pkey'),
+    )
+    op.create_table(
+        'comment',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.Integer()),
+        sa.Column('post_id', sa.Integer()),
+        sa.Column('comment_type', sa.Enum('GIF', 'TEXT', name='commenttype')),
+        sa.Column('comment', sa.Text()),
+        sa.Column('likes', sa.Integer()),
+        sa.Column('created_at', sa.DateTime()),
+        sa.ForeignKeyConstraint(['post_id'], ['posts.id'], ondelete='CASCADE', name='comment_post_id_fkey'),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE', name='comment_user_id_fkey'),
+        sa.PrimaryKeyConstraint('id', name='comment_pkey'),
+    )
+    op.create_table(
+        'conversation_participants',
+        sa.Column('id', sa.Uuid(), server_default=sa.text('uuid_generate_v4()'), nullable=False),
+        sa.Column('room_id', sa.Uuid(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(['room_id'], ['conversations.room_id'], ondelete='CASCADE', name='conversation_participants_room_id_fkey'),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE', name='conversation_participants_user_id_fkey'),
+        sa.PrimaryKeyConstraint('id', name='conversation_participants_pkey'),
+        sa.UniqueConstraint('room_id', 'user_id', name='conversation_participants_room_id_user_id_key'),
+    )
+    op.create_table(
+        'likes',
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('post_id', sa.Integer(), nullable=False),
+        sa.Column('created_at', sa.DateTime()),
+        sa.ForeignKeyConstraint(['post_id'], ['posts.id'], ondelete='CASCADE', name='likes_post_id_fkey'),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE', name='likes_user_id_fkey'),
+        sa.PrimaryKeyConstraint('user_id', 'post_id', name='likes_pkey'),
+    )
+    op.create_table(
+        'messages',
+        sa.Column('message_id', sa.Uuid(), server_default=sa.text('uuid_generate_v4()'), nullable=False),
+        sa.Column('room_id', sa.Uuid(), nullable=False),
+        sa.Column('sender_id', sa.Integer(), nullable=False),
+        sa.Column('content', sa.Text()),
+        sa.Column('sent_at', sa.DateTime(), server_default=sa.text('CURRENT_TIMESTAMP')),
+        sa.ForeignKeyConstraint(['room_id'], ['conversations.room_id'], ondelete='CASCADE', name='messages_room_id_fkey'),
+        sa.ForeignKeyConstraint(['sender_id'], ['users.id'], name='messages_sender_id_fkey'),
+        sa.PrimaryKeyConstraint('message_id', name='messages_pkey'),
+    )
+
+
+def downgrade() -> None:
+    for table in ('messages', 'likes', 'conversation_participants', 'comment', 'posts', 'follow', 'conversations', 'users'):
+        op.drop_table(table)
+    if op.get_bind().dialect.name == "postgresql":
+        op.execute('DROP TYPE IF EXISTS commenttype')
+        op.execute('DROP TYPE IF EXISTS posttype')
@@ -0,0 +1,29 @@
+"""posts.comment_count
+
+Existing posts get the number of comments they already have.
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = '0002'
+down_revision = '0001'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    with op.batch_alter_table('posts') as batch:
+        batch.add_column(sa.Column('comment_count', sa.Integer(), server_default=sa.text('0')))
+        batch.create_check_constraint('chk_comment_count_nonnegative', 'comment_count >= 0')
+    op.execute("UPDATE posts SET comment_count = (SELECT count(*) FROM comment WHERE comment.post_id = posts.id)")
+
+
+def downgrade() -> None:
+    with op.batch_alter_table('posts') as batch:
+        batch.drop_constraint('chk_comment_count_nonnegative', type_='check')
+        batch.drop_column('comment_count')
@@ -0,0 +1,71 @@
+"""indexes for the hot query paths
+
+On PostgreSQL the indexes are built CONCURRENTLY, outside a transaction, so the tables
+stay writable while they build. An interrupted build leaves an INVALID index behind;
+drop it and run the upgrade again.
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-18
+"""
+import os
+
+from alembic import op
+
+
+revision = '0003'
+down_revision = '0002'
+branch_labels = None
+depends_on = None
+
+# (name, table, columns)
+INDEXES = [
+    # GET /posts, newest first, keyset on (created_at, id)
+    ('ix_posts_created_at_id', 'posts', ['created_at', 'id']),
+    # a user's posts and the feed, both ordered by (created_at, id)
+    ('ix_posts_user_id_created_at', 'posts', ['user_id', 'created_at', 'id']),
+    # comment threads, first comments per post, comment counts
+    ('ix_comment_post_id_created_at', 'comment', ['post_id', 'created_at', 'id']),
+    # message history, keyset on (sent_at, message_id) within a room
+    ('ix_messages_room_id_sent_at', 'messages', ['room_id', 'sent_at', 'message_id']),
+    # followers of a user; following is served by the (follower_id, following_id) primary key
+    ('ix_follow_following_id', 'follow', ['following_id', 'follower_id']),
+    # rooms of a user; the (room_id, user_id) unique constraint only serves lookups by room
+    ('ix_conversation_participants_user_id', 'conversation_participants', ['user_id', 'room_id']),
+    # like counts per post; the (user_id, post_id) primary key only serves lookups by user
+    ('ix_likes_post_id', 'likes', ['post_id']),
+]
+
+# PostgreSQL full-text search, must match the expressions built in app/services/search_service.py
+SEARCH_TS_CONFIG = os.getenv("SEARCH_TS_CONFIG", "simple")
+FTS_INDEXES = [
+    ('ix_posts_post_text_fts', 'posts', 'post_text'),
+    ('ix_comment_comment_fts', 'comment', 'comment'),
+]
+
+
+def upgrade() -> None:
+    if op.get_bind().dialect.name != "postgresql":
+        for name, table, columns in INDEXES:
+            op.create_index(name, table, columns, if_not_exists=True)
+        return
+
+    with op.get_context().autocommit_block():
+        for name, table, columns in INDEXES:
+            op.create_index(name, table, columns, if_not_exists=True, postgresql_concurrently=True)
+        for name, table, column in FTS_INDEXES:
+            op.execute(
+                f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {name} ON {table} "
+                f"USING gin (to_tsvector('{SEARCH_TS_CONFIG}'::regconfig, coalesce({column}, '')))"
+            )
+
+
+def downgrade() -> None:
+    if op.get_bind().dialect.name != "postgresql":
+        for name, table, _ in INDEXES:
+            op.drop_index(name, table_name=table, if_exists=True)
+        return
+
+    with op.get_context().autocommit_block():
+        for name, table, _ in INDEXES + FTS_INDEXES:
+            op.drop_index(name, table_name=table, if_exists=True, postgresql_concurrently=True)
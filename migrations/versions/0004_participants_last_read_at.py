@@ -0,0 +1,35 @@
+"""conversation_participants.last_read_at
+
+The read cursor behind the inbox unread counts. Existing participants are marked as
+having read everything so far, rather than starting with their whole history unread.
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-18
+"""
+import datetime
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = '0004'
+down_revision = '0003'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    with op.batch_alter_table('conversation_participants') as batch:
+        batch.add_column(sa.Column('last_read_at', sa.DateTime()))
+    # naive UTC computed here, like the application writes, not the server's local clock
+    op.get_bind().execute(
+        sa.text("UPDATE conversation_participants SET last_read_at = :now").bindparams(
+            sa.bindparam('now', datetime.datetime.utcnow(), type_=sa.DateTime())
+        )
+    )
+
+
+def downgrade() -> None:
+    with op.batch_alter_table('conversation_participants') as batch:
+        batch.drop_column('last_read_at')
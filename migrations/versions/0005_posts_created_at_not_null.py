@@ -0,0 +1,38 @@
+"""posts.created_at NOT NULL
+
+GET /posts and the feed page on (created_at, id), and rows without a created_at fell out
+of the pages. Posts written before create_post set the column get the earliest
+created_at in the table, so they sort below every dated post and, among themselves, by id.
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-18
+"""
+import datetime
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = '0005'
+down_revision = '0004'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # naive UTC, like the application writes; used when no post has a created_at at all
+    now = datetime.datetime.utcnow()
+    op.get_bind().execute(
+        sa.text(
+            "UPDATE posts SET created_at = coalesce((SELECT min(created_at) FROM posts), :now) "
+            "WHERE created_at IS NULL"
+        ).bindparams(sa.bindparam('now', now, type_=sa.DateTime()))
+    )
+    with op.batch_alter_table('posts') as batch:
+        batch.alter_column('created_at', existing_type=sa.DateTime(), nullable=False)
+
+
+def downgrade() -> None:
+    with op.batch_alter_table('posts') as batch:
+        batch.alter_column('created_at', existing_type=sa.DateTime(), nullable=True)
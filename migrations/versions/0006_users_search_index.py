@@ -0,0 +1,44 @@
+"""full-text index on users
+
+Search matched users on to_tsvector(concat_ws(' ', name, bio)). concat_ws is only STABLE,
+so it cannot be indexed and every search scanned users. The query now uses the
+IMMUTABLE coalesce(name, '') || ' ' || coalesce(bio, ''), and this GIN index is built on
+that same expression. Like 0003 it is built CONCURRENTLY, outside a transaction.
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-18
+"""
+import os
+
+from alembic import op
+
+
+revision = '0006'
+down_revision = '0005'
+branch_labels = None
+depends_on = None
+
+# must match the user expression built in app/services/search_service.py
+SEARCH_TS_CONFIG = os.getenv("SEARCH_TS_CONFIG", "simple")
+INDEX_NAME = 'ix_users_name_bio_fts'
+
+
+def upgrade() -> None:
+    if op.get_bind().dialect.name != "postgresql":
+        return
+
+    with op.get_context().autocommit_block():
+        op.execute(
+            f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {INDEX_NAME} ON users "
+            f"USING gin (to_tsvector('{SEARCH_TS_CONFIG}'::regconfig, "
+            f"coalesce(name, '') || ' ' || coalesce(bio, '')))"
+        )
+
+
+def downgrade() -> None:
+    if op.get_bind().dialect.name != "postgresql":
+        return
+
+    with op.get_context().autocommit_block():
+        op.drop_index(INDEX_NAME, table_name='users', if_exists=True, postgresql_concurrently=True)
@@ -0,0 +1,37 @@
+"""users.online_at
+
+The lease behind users.is_online. Nodes renew it for the users connected to them, and a
+row whose lease ran out, e.g. because its node crashed, is reset to offline. The index
+serves that sweep, which only looks at online rows.
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = '0007'
+down_revision = '0006'
+branch_labels = None
+depends_on = None
+
+INDEX_NAME = 'ix_users_is_online_online_at'
+
+
+def upgrade() -> None:
+    with op.batch_alter_table('users') as batch:
+        batch.add_column(sa.Column('online_at', sa.DateTime()))
+    if op.get_bind().dialect.name != "postgresql":
+        op.create_index(INDEX_NAME, 'users', ['is_online', 'online_at'], if_not_exists=True)
+        return
+
+    with op.get_context().autocommit_block():
+        op.create_index(INDEX_NAME, 'users', ['is_online', 'online_at'], if_not_exists=True, postgresql_concurrently=True)
+
+
+def downgrade() -> None:
+    op.drop_index(INDEX_NAME, table_name='users', if_exists=True)
+    with op.batch_alter_table('users') as batch:
+        batch.drop_column('online_at')
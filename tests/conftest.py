@@ -0,0 +1,59 @@
+import datetime
+import os
+import tempfile
+import uuid
+
+# app.db.database reads DATABASE_URL on import, so it is pointed at a throwaway database
+# before anything from the app is imported; TEST_DATABASE_URL runs the suite on another one
+os.environ["DATABASE_URL"] = os.getenv("TEST_DATABASE_URL") or "sqlite:///" + os.path.join(tempfile.mkdtemp(), "test.db")
+os.environ.pop("ASYNC_DATABASE_URL", None)
+
+import pytest
+from alembic import command
+from alembic.config import Config
+
+from app.db.database import AsyncSessionLocal, async_engine
+from app.models.models import Conversations, Posts, Users
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.fixture(scope="session", autouse=True)
+def migrated_database():
+    command.upgrade(Config(os.path.join(ROOT, "alembic.ini")), "head")
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+
+# every test runs on its own event loop, so pooled connections are not reused across tests
+@pytest.fixture
+async def db():
+    async with AsyncSessionLocal() as session:
+        yield session
+    await async_engine.dispose()
+
+
+async def make_user(db, **fields) -> Users:
+    fields = {"name": "user", "email": f"{uuid.uuid4().hex}@example.com", "followers": 0, "following": 0, **fields}
+    user = Users(**fields)
+    db.add(user)
+    await db.commit()
+    return user
+
+
+async def make_post(db, user_id: int, created_at: datetime.datetime = None, **fields) -> Posts:
+    fields = {"post_type": "text", "likes": 0, "comment_count": 0, **fields}
+    post = Posts(user_id=user_id, created_at=created_at or datetime.datetime.utcnow(), **fields)
+    db.add(post)
+    await db.commit()
+    return post
+
+
+async def make_room(db, creator_id: int) -> Conversations:
+    room = Conversations(room_id=uuid.uuid4(), creator_id=creator_id)
+    db.add(room)
+    await db.commit()
+    return room
@@ -0,0 +1,122 @@
+import asyncio
+import json
+
+import pytest
+
+from app.services import chat_broker
+from app.services.chat_broker import ClientConnection, InMemoryBroker, LocalHub, LocalHubBroker
+
+pytestmark = pytest.mark.anyio
+
+
+class FakeWebSocket:
+    def __init__(self, delay: float = 0.0):
+        self.delay = delay
+        self.sent = []
+        self.closed_with = None
+
+    async def send_text(self, payload: str) -> None:
+        await asyncio.sleep(self.delay)
+        try:
+            self.sent.append(json.loads(payload))
+        except ValueError:
+            self.sent.append(payload)
+
+    async def close(self, code: int = 1000) -> None:
+        self.closed_with = code
+
+
+async def eventually(condition, timeout: float = 2.0) -> None:
+    deadline = asyncio.get_running_loop().time() + timeout
+    while not condition():
+        assert asyncio.get_running_loop().time() < deadline, "condition not met in time"
+        await asyncio.sleep(0.01)
+
+
+@pytest.fixture
+async def nodes():
+    hub = LocalHub()
+    brokers = [LocalHubBroker(hub), LocalHubBroker(hub)]
+    for broker in brokers:
+        broker.reconnect_delay = 0.01
+    yield hub, brokers
+    for broker in brokers:
+        await broker.close()
+
+
+async def test_messages_reach_members_on_every_node(nodes):
+    hub, (first, second) = nodes
+    here, there, elsewhere = FakeWebSocket(), FakeWebSocket(), FakeWebSocket()
+    await first.join("room", here)
+    await second.join("room", there)
+    await second.join("other", elsewhere)
+
+    await first.publish("room", {"content": "hello"})
+    await eventually(lambda: here.sent and there.sent)
+    assert here.sent == there.sent == [{"content": "hello"}]
+    assert elsewhere.sent == []
+
+
+async def test_a_node_stops_receiving_rooms_it_left(nodes):
+    hub, (first, second) = nodes
+    member = FakeWebSocket()
+    await second.join("room", member)
+    await second.leave("room", member)
+    assert not any("chat:room" in s.channels for s in hub.subscribers)
+
+
+async def test_reader_reconnects_and_resubscribes(nodes):
+    hub, (first, second) = nodes
+    member = FakeWebSocket()
+    await second.join("room", member)
+    hub.disconnect()
+    await eventually(lambda: any("chat:room" in s.channels for s in hub.subscribers))
+
+    await first.publish("room", {"content": "after the restart"})
+    await eventually(lambda: member.sent)
+    assert member.sent == [{"content": "after the restart"}]
+
+
+async def test_bad_payload_does_not_stop_the_reader(nodes):
+    hub, (first, second) = nodes
+    member = FakeWebSocket()
+    await second.join("room", member)
+    second.listeners.append(type("Listener", (), {
+        "message_delivered": lambda self, room, payload: json.loads(payload),
+        "room_unsubscribed": lambda self, room: None,
+    })())
+    await hub.publish("chat:room", "not json")
+    await first.publish("room", {"content": "still delivered"})
+    await eventually(lambda: {"content": "still delivered"} in member.sent)
+
+
+async def test_failed_publish_is_counted_not_raised(monkeypatch):
+    broker = InMemoryBroker()
+
+    async def fail(room, payload):
+        raise ConnectionError("broker is down")
+
+    monkeypatch.setattr(broker, "_publish", fail)
+    assert await broker.publish("room", {"content": "x"}) is False
+    assert broker.publish_failures == 1
+
+
+async def test_slow_consumer_drops_its_oldest_frames():
+    socket = FakeWebSocket(delay=10)
+    connection = ClientConnection(socket, maxsize=2, policy="drop_oldest")
+    await asyncio.sleep(0)
+    for i in range(5):
+        connection.send(json.dumps({"i": i}))
+    assert [json.loads(p)["i"] for p in connection.queue._queue] == [3, 4]
+    assert connection.dropped == 3
+    connection.close()
+
+
+async def test_slow_consumer_can_be_disconnected():
+    socket = FakeWebSocket(delay=10)
+    connection = ClientConnection(socket, maxsize=1, policy="disconnect")
+    await asyncio.sleep(0)
+    for i in range(3):
+        connection.send(json.dumps({"i": i}))
+    await eventually(lambda: socket.closed_with is not None)
+    assert socket.closed_with == chat_broker.SLOW_CONSUMER_CLOSE_CODE
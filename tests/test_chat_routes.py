@@ -0,0 +1,69 @@
+import time
+import uuid
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import func, select
+
+import main
+from app.db.database import SessionLocal, async_engine
+from app.models.models import ConversationParticipants, Conversations, Messages, Users
+from app.services.chat_broker import broker
+
+
+@pytest.fixture
+def room():
+    with SessionLocal() as db:
+        user = Users(name="sender", email=f"{uuid.uuid4().hex}@example.com", followers=0, following=0)
+        db.add(user)
+        db.flush()
+        room = Conversations(room_id=uuid.uuid4(), creator_id=user.id)
+        db.add_all([room, ConversationParticipants(id=uuid.uuid4(), room_id=room.room_id, user_id=user.id)])
+        db.commit()
+        return user.id, room.room_id
+
+
+@pytest.fixture
+def client():
+    with TestClient(main.app) as client:
+        yield client
+        # connections opened on the client's event loop must not outlive it
+        client.portal.call(async_engine.dispose)
+
+
+@pytest.fixture
+def failing_publish(monkeypatch):
+    async def fail(room, payload):
+        raise ConnectionError("broker is down")
+
+    monkeypatch.setattr(broker, "_publish", fail)
+    return broker.publish_failures
+
+
+def stored_messages(room_id) -> int:
+    with SessionLocal() as db:
+        return db.scalar(select(func.count()).where(Messages.room_id == room_id))
+
+
+def test_send_message_is_stored_when_publishing_fails(room, client, failing_publish):
+    user_id, room_id = room
+    response = client.post(f"/chat/{user_id}/{room_id}/send-message", json={"message": "hi"})
+    assert response.status_code == 200
+    assert stored_messages(room_id) == 1
+    assert broker.publish_failures == failing_publish + 1
+
+
+def test_websocket_keeps_going_when_publishing_fails(room, failing_publish):
+    user_id, room_id = room
+    with TestClient(main.app) as client:
+        with client.websocket_connect(f"/ws/{room_id}/{user_id}") as websocket:
+            websocket.send_text("first")
+            websocket.send_text("second")
+            # nothing comes back while publishing fails; closing early would cut the handler off
+            deadline = time.monotonic() + 2
+            while broker.publish_failures < failing_publish + 2 and time.monotonic() < deadline:
+                time.sleep(0.01)
+        client.portal.call(async_engine.dispose)
+    # the lifespan shutdown flushed the write-behind queue
+    assert stored_messages(room_id) == 2
+    assert broker.publish_failures == failing_publish + 2
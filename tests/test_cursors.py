@@ -0,0 +1,67 @@
+import datetime
+import uuid
+
+import pytest
+
+from app.models.models import Messages
+from app.repositories import message_repository, post_repository
+from tests.conftest import make_post, make_room, make_user
+
+
+def test_post_cursor_round_trip():
+    created_at = datetime.datetime(2026, 1, 2, 3, 4, 5, 6)
+    assert post_repository.decode_cursor(post_repository.encode_cursor(created_at, 42)) == (created_at, 42)
+
+
+def test_message_cursor_round_trip():
+    sent_at = datetime.datetime(2026, 1, 2, 3, 4, 5)
+    message_id = uuid.uuid4()
+    cursor = message_repository.encode_cursor(sent_at, message_id)
+    assert message_repository.decode_cursor(cursor) == (sent_at, str(message_id))
+
+
+@pytest.mark.parametrize("decode", [post_repository.decode_cursor, message_repository.decode_cursor])
+@pytest.mark.parametrize("cursor", ["", "not a cursor", "MjAyNg=="])
+def test_malformed_cursors_are_rejected(decode, cursor):
+    with pytest.raises(ValueError):
+        decode(cursor)
+
+
+# rows sharing a timestamp are ordered by id, so no page boundary skips or repeats one
+@pytest.mark.anyio
+async def test_post_pages_cover_every_post_once(db):
+    user = await make_user(db)
+    same_time = datetime.datetime(2026, 5, 1)
+    posts = [await make_post(db, user.id, created_at=same_time + datetime.timedelta(seconds=i // 3))
+             for i in range(8)]
+    seen, cursor = [], None
+    while True:
+        page, cursor = await post_repository.get_posts_page(db, 3, cursor, user_id=user.id)
+        seen += [row.id for row in page]
+        if cursor is None:
+            break
+    expected = sorted(posts, key=lambda p: (p.created_at, p.id), reverse=True)
+    assert seen == [p.id for p in expected]
+
+
+@pytest.mark.anyio
+async def test_message_pages_cover_every_message_once(db):
+    user = await make_user(db)
+    room = await make_room(db, user.id)
+    same_time = datetime.datetime(2026, 5, 1)
+    for i in range(7):
+        db.add(Messages(message_id=uuid.uuid4(), room_id=room.room_id, sender_id=user.id, content=f"m{i}",
+                        sent_at=same_time + datetime.timedelta(seconds=i // 2)))
+    await db.commit()
+
+    newest = await message_repository.get_messages_page(db, room.room_id, 3)
+    oldest_shown = (newest[0]["sent_at"], newest[0]["message_id"])
+    older = await message_repository.get_messages_page(db, room.room_id, 10, before=oldest_shown)
+    assert len(newest) == 3 and len(older) == 4
+    history = older + newest
+    keys = [(m["sent_at"], m["message_id"]) for m in history]
+    assert keys == sorted(keys)
+
+    first = (history[0]["sent_at"], history[0]["message_id"])
+    after = await message_repository.get_messages_page(db, room.room_id, 10, after=first)
+    assert [m["message_id"] for m in after] == [m["message_id"] for m in history[1:]]
@@ -0,0 +1,73 @@
+import datetime
+
+import pytest
+
+from app.models.models import Follow
+from app.services import feed_service
+from app.services.feed_service import InMemoryFeedStore
+from tests.conftest import make_post, make_user
+
+pytestmark = pytest.mark.anyio
+
+T = datetime.datetime(2026, 5, 1)
+
+
+def at(seconds: int) -> datetime.datetime:
+    return T + datetime.timedelta(seconds=seconds)
+
+
+async def test_pushes_out_of_order_keep_the_timeline_sorted():
+    store = InMemoryFeedStore(max_length=4)
+    await store.put(1, [(at(1), 1), (at(3), 3)])
+    for entry in [(at(5), 5), (at(2), 2), (at(4), 4), (at(4), 4)]:
+        await store.push([1, 2], entry)
+    assert await store.get(1) == [(at(5), 5), (at(4), 4), (at(3), 3), (at(2), 2)]
+    # timelines that were never loaded are left to be rebuilt on read
+    assert await store.get(2) is None
+
+
+async def test_timelines_expire():
+    store = InMemoryFeedStore(ttl=0)
+    await store.put(1, [(at(1), 1)])
+    assert await store.get(1) is None
+
+
+@pytest.fixture
+def store(monkeypatch):
+    store = InMemoryFeedStore()
+    monkeypatch.setattr(feed_service, "store", store)
+    return store
+
+
+async def _follow(db, follower_id: int, following_id: int) -> None:
+    db.add(Follow(follower_id=follower_id, following_id=following_id))
+    await db.commit()
+
+
+async def _all_pages(db, user_id: int, limit: int):
+    ids, cursor = [], None
+    while True:
+        page, cursor = await feed_service.get_feed(db, user_id, limit, cursor)
+        ids += [row.id for row in page]
+        if cursor is None:
+            return ids
+
+
+# pushed, stored and pulled posts page together newest first, each exactly once
+async def test_feed_merges_pushed_and_pulled_posts(db, store, monkeypatch):
+    reader = await make_user(db)
+    friend = await make_user(db)
+    celebrity = await make_user(db, followers=10)
+    monkeypatch.setattr(feed_service, "FEED_FANOUT_LIMIT", 5)
+    await _follow(db, reader.id, friend.id)
+    await _follow(db, reader.id, celebrity.id)
+
+    posts = [await make_post(db, friend.id, created_at=at(i)) for i in range(0, 6, 2)]
+    posts += [await make_post(db, celebrity.id, created_at=at(i)) for i in range(1, 6, 2)]
+    assert await _all_pages(db, reader.id, 2) == [p.id for p in sorted(posts, key=lambda p: p.created_at, reverse=True)]
+
+    # a post created after the timeline was loaded is pushed into it
+    newest = await make_post(db, friend.id, created_at=at(10))
+    await feed_service.fan_out_post(db, newest)
+    page, _ = await feed_service.get_feed(db, reader.id, 1)
+    assert [row.id for row in page] == [newest.id]
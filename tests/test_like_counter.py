@@ -0,0 +1,73 @@
+import pytest
+
+from app.models.models import Posts
+from app.services import like_counter as counter_module
+from app.services.like_counter import LikeCounter
+from tests.conftest import make_post, make_user
+
+pytestmark = pytest.mark.anyio
+
+
+class FailingSession:
+    def __call__(self):
+        return self
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        pass
+
+    async def execute(self, *args):
+        raise ConnectionError("database is down")
+
+
+def test_deltas_are_coalesced_per_post():
+    counter = LikeCounter()
+    counter.add(1, 1)
+    counter.add(1, 1)
+    counter.add(2, 1)
+    counter.add(1, -2)
+    assert counter.pending == {2: 1}
+    assert counter.pending_for(1) == 0
+    assert counter.pending_for(2) == 1
+
+
+async def test_flush_adds_the_summed_deltas(db):
+    user = await make_user(db)
+    post = await make_post(db, user.id, likes=5)
+    counter = LikeCounter()
+    counter.add(post.id, 3)
+    counter.add(post.id, -1)
+    await counter.flush()
+    await db.refresh(post)
+    assert post.likes == 7
+    assert counter.pending == {}
+
+
+async def test_flush_never_goes_below_zero(db):
+    user = await make_user(db)
+    post = await make_post(db, user.id, likes=1)
+    counter = LikeCounter()
+    counter.add(post.id, -3)
+    await counter.flush()
+    assert (await db.get(Posts, post.id, populate_existing=True)).likes == 0
+
+
+async def test_failed_flush_keeps_the_deltas(monkeypatch):
+    monkeypatch.setattr(counter_module, "AsyncSessionLocal", FailingSession())
+    counter = LikeCounter()
+    counter.add(1, 2)
+    with pytest.raises(ConnectionError):
+        await counter.flush()
+    counter.add(1, 1)
+    assert counter.pending == {1: 3}
+
+
+async def test_stop_survives_a_failed_final_flush(monkeypatch):
+    monkeypatch.setattr(counter_module, "AsyncSessionLocal", FailingSession())
+    counter = LikeCounter(flush_interval=10)
+    counter.start()
+    counter.add(1, 2)
+    await counter.stop()
+    assert counter.pending == {1: 2}
@@ -0,0 +1,74 @@
+import datetime
+
+from app.services.message_cache import RecentMessages, RoomBuffer, message_key
+
+T = datetime.datetime(2026, 5, 1)
+
+
+def message(n: int) -> dict:
+    return {"message_id": f"00000000-0000-0000-0000-{n:012d}", "sent_at": T + datetime.timedelta(seconds=n),
+            "content": f"m{n}"}
+
+
+def contents(messages) -> list:
+    return [m["content"] for m in messages]
+
+
+def test_out_of_order_delivery_keeps_the_buffer_sorted_and_unseeded():
+    buffer = RoomBuffer(10)
+    buffer.add(message(1))
+    buffer.add(message(3))
+    buffer.add(message(2))
+    assert contents(buffer.messages) == ["m1", "m2", "m3"]
+    assert not buffer.seeded and not buffer.complete
+
+
+def test_seed_merges_history_with_live_messages():
+    buffer = RoomBuffer(10)
+    buffer.add(message(4))
+    buffer.add(message(5))
+    buffer.seed([message(1), message(2), message(3), message(4)], complete=True)
+    assert contents(buffer.messages) == ["m1", "m2", "m3", "m4", "m5"]
+    assert buffer.seeded and buffer.complete
+
+
+def test_complete_buffer_answers_every_page():
+    buffer = RoomBuffer(10)
+    buffer.seed([message(n) for n in range(1, 6)], complete=True)
+    assert contents(buffer.page(3)) == ["m3", "m4", "m5"]
+    assert contents(buffer.page(3, before=message_key(message(3)))) == ["m1", "m2"]
+    assert contents(buffer.page(10, after=message_key(message(3)))) == ["m4", "m5"]
+
+
+def test_partial_buffer_defers_pages_it_cannot_cover():
+    buffer = RoomBuffer(3)
+    buffer.seed([message(n) for n in range(1, 6)], complete=False)
+    assert contents(buffer.messages) == ["m3", "m4", "m5"]
+    assert buffer.truncated
+    assert contents(buffer.page(2)) == ["m4", "m5"]
+    assert buffer.page(5) is None
+    assert buffer.page(2, before=message_key(message(4))) is None
+    assert buffer.page(2, after=message_key(message(1))) is None
+
+
+def test_overflow_clears_complete():
+    buffer = RoomBuffer(2)
+    buffer.seed([message(1)], complete=True)
+    buffer.add(message(2))
+    assert buffer.complete
+    buffer.add(message(3))
+    assert not buffer.complete and buffer.truncated
+
+
+def test_rooms_are_seeded_only_after_the_flush_window():
+    recent = RecentMessages(seed_delay=60)
+    assert not recent.can_seed(recent.track("room"))
+    recent = RecentMessages(seed_delay=0)
+    assert recent.can_seed(recent.track("room"))
+
+
+def test_buffers_are_dropped_when_the_room_empties():
+    recent = RecentMessages()
+    recent.track("room")
+    recent.room_unsubscribed("room")
+    assert recent.get("room") is None
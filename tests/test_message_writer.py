@@ -0,0 +1,108 @@
+import json
+import uuid
+
+import pytest
+from sqlalchemy import func, select
+from sqlalchemy.exc import IntegrityError, OperationalError
+
+from app.models.models import Messages
+from app.services import message_writer as writer_module
+from app.services.message_writer import MessageWriter
+from tests.conftest import make_room, make_user
+
+pytestmark = pytest.mark.anyio
+
+
+# stands in for AsyncSessionLocal: records committed batches, fails while `outage` lasts
+# and rejects any batch holding a row marked bad
+class FakeSession:
+    def __init__(self):
+        self.batches = []
+        self.outage = 0
+
+    def __call__(self):
+        return self
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        pass
+
+    async def execute(self, statement, rows):
+        if self.outage:
+            self.outage -= 1
+            raise OperationalError("INSERT", {}, ConnectionError("database is down"))
+        if any(row.get("bad") for row in rows):
+            raise IntegrityError("INSERT", {}, ValueError("constraint failed"))
+        self.pending = rows
+
+    async def commit(self):
+        self.batches.append(self.pending)
+
+
+@pytest.fixture
+def session(monkeypatch):
+    session = FakeSession()
+    monkeypatch.setattr(writer_module, "AsyncSessionLocal", session)
+    monkeypatch.setattr(writer_module, "MESSAGE_FLUSH_MAX_BACKOFF", 0.01)
+    return session
+
+
+async def test_rows_are_written_in_batches(session):
+    writer = MessageWriter(batch_size=3, flush_interval=10)
+    for i in range(7):
+        await writer.submit({"i": i})
+    await writer.stop()
+    assert [[row["i"] for row in batch] for batch in session.batches] == [[0, 1, 2], [3, 4, 5], [6]]
+
+
+async def test_batches_are_retried_through_an_outage(session):
+    session.outage = 4
+    writer = MessageWriter(batch_size=10, flush_interval=0.01)
+    for i in range(5):
+        await writer.submit({"i": i})
+    await writer.stop()
+    assert sorted(row["i"] for batch in session.batches for row in batch) == [0, 1, 2, 3, 4]
+
+
+async def test_only_rejected_rows_are_discarded(session):
+    writer = MessageWriter(batch_size=10, flush_interval=10)
+    for i in range(10):
+        await writer.submit({"i": i, "bad": i in (3, 7)})
+    await writer.stop()
+    assert sorted(row["i"] for batch in session.batches for row in batch) == [0, 1, 2, 4, 5, 6, 8, 9]
+
+
+async def test_submit_after_stop_raises(session):
+    writer = MessageWriter()
+    await writer.submit({"i": 0})
+    await writer.stop()
+    with pytest.raises(RuntimeError):
+        await writer.submit({"i": 1})
+
+
+async def test_messages_reach_the_database(db):
+    user = await make_user(db)
+    room = await make_room(db, user.id)
+    writer = MessageWriter(batch_size=2, flush_interval=0.01)
+    for i in range(5):
+        await writer.submit({"message_id": uuid.uuid4(), "room_id": room.room_id, "sender_id": user.id,
+                             "content": f"m{i}"})
+    await writer.stop()
+    assert await db.scalar(select(func.count()).where(Messages.room_id == room.room_id)) == 5
+
+
+async def test_stop_gives_up_after_its_timeout_and_spills(session, monkeypatch, tmp_path):
+    spill = tmp_path / "unsaved.ndjson"
+    monkeypatch.setattr(writer_module, "MESSAGE_SPILL_PATH", str(spill))
+    session.outage = 10 ** 6
+    writer = MessageWriter(batch_size=2, flush_interval=0.01)
+    message_id = uuid.uuid4()
+    await writer.submit({"message_id": message_id, "content": "kept"})
+    for i in range(4):
+        await writer.submit({"i": i})
+    await writer.stop(timeout=0.1)
+    rows = [json.loads(line) for line in spill.read_text().splitlines()]
+    assert rows[0] == {"message_id": str(message_id), "content": "kept"}
+    assert [row["i"] for row in rows[1:]] == [0, 1, 2, 3]
@@ -0,0 +1,14 @@
+import pytest
+
+from app.db.database import AsyncSessionLocal
+from app.db.pool_metrics import pool_metrics
+
+pytestmark = pytest.mark.anyio
+
+
+# sessions opened outside get_async_db, as the background services do, are measured too
+async def test_every_session_checkout_is_measured(db):
+    before = pool_metrics.checkouts
+    async with AsyncSessionLocal() as session:
+        await session.connection()
+    assert pool_metrics.checkouts == before + 1
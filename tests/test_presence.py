@@ -0,0 +1,71 @@
+import datetime
+
+import pytest
+from sqlalchemy import update
+
+from app.models.models import Users
+from app.services import presence as presence_module
+from app.services.presence import PresenceRegistry
+from tests.conftest import make_user
+
+pytestmark = pytest.mark.anyio
+
+
+async def is_online(db, user_id: int):
+    db.expire_all()
+    return (await db.get(Users, user_id)).is_online
+
+
+async def test_stop_writes_connected_users_offline(db):
+    user = await make_user(db, is_online=False)
+    registry = PresenceRegistry(debounce=0)
+    registry.connect(user.id)
+    await registry.flush()
+    assert await is_online(db, user.id) is True
+
+    await registry.stop()
+
+    assert await is_online(db, user.id) is False
+    assert registry.users == {}
+
+
+async def test_renew_resets_rows_whose_lease_ran_out(db):
+    now = datetime.datetime.utcnow()
+    crashed = (await make_user(db, is_online=True, online_at=now - datetime.timedelta(hours=1))).id
+    legacy = (await make_user(db, is_online=True)).id
+    elsewhere = (await make_user(db, is_online=True, online_at=now)).id
+
+    await PresenceRegistry(lease=60).renew()
+
+    assert await is_online(db, crashed) is False
+    assert await is_online(db, legacy) is False
+    assert await is_online(db, elsewhere) is True
+
+
+async def test_renew_extends_the_lease_of_connected_users(db):
+    user = await make_user(db, is_online=False)
+    user_id = user.id
+    registry = PresenceRegistry(debounce=0, lease=60)
+    registry.connect(user_id)
+    await registry.flush()
+    stale = datetime.datetime.utcnow() - datetime.timedelta(hours=1)
+    await db.execute(update(Users).where(Users.id == user_id).values(online_at=stale))
+    await db.commit()
+
+    await registry.renew()
+
+    db.expire_all()
+    assert (await db.get(Users, user_id)).online_at > stale
+    assert await is_online(db, user_id) is True
+
+
+async def test_remote_users_with_an_expired_lease_read_as_offline(db, monkeypatch):
+    monkeypatch.setattr(presence_module.broker, "shared", True)
+    now = datetime.datetime.utcnow()
+    fresh = await make_user(db, is_online=True, online_at=now)
+    expired = await make_user(db, is_online=True, online_at=now - datetime.timedelta(hours=1))
+
+    result = await PresenceRegistry(lease=60).get_many([fresh.id, expired.id])
+
+    assert result[fresh.id]["online"] is True
+    assert result[expired.id]["online"] is False
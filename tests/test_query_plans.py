@@ -0,0 +1,20 @@
+import pytest
+
+from app.jobs.check_query_plans import CHECKS, NATIVE_SEARCH_CHECKS, find_full_scans, sample_ids
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.mark.parametrize("check", [check for _, check in CHECKS], ids=[name for name, _ in CHECKS])
+async def test_hot_queries_are_served_by_indexes(db, check):
+    ids = await sample_ids(db)
+    assert await find_full_scans(db, check, ids) == []
+
+
+@pytest.mark.parametrize("check", [check for _, check in NATIVE_SEARCH_CHECKS],
+                         ids=[name for name, _ in NATIVE_SEARCH_CHECKS])
+async def test_native_search_is_served_by_indexes(db, check):
+    if db.bind.dialect.name != "postgresql":
+        pytest.skip("full-text indexes only exist on PostgreSQL")
+    ids = await sample_ids(db)
+    assert await find_full_scans(db, check, ids) == []
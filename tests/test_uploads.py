@@ -0,0 +1,83 @@
+import io
+
+import pytest
+from fastapi import UploadFile
+from fastapi.testclient import TestClient
+
+import main
+from app.api.routes import media
+from app.api.upload_limit import UploadLimitMiddleware
+from app.repositories import file_repository
+
+pytestmark = pytest.mark.anyio
+
+JPEG = b"\xff\xd8\xff\xe0" + b"\x00" * 64
+
+
+@pytest.fixture
+def uploads(tmp_path, monkeypatch):
+    monkeypatch.setattr(file_repository, "BASE_UPLOAD_PATH", str(tmp_path))
+    monkeypatch.setattr(media, "BASE_UPLOAD_PATH", str(tmp_path))
+    return tmp_path
+
+
+async def test_oversized_upload_is_refused_before_the_body_is_read():
+    async def app(scope, receive, send):
+        raise AssertionError("the route must not run")
+
+    async def receive():
+        raise AssertionError("the body must not be read")
+
+    sent = []
+
+    async def send(message):
+        sent.append(message)
+
+    scope = {
+        "type": "http",
+        "method": "POST",
+        "path": "/users/1/upload-profile",
+        "headers": [
+            (b"content-type", b"multipart/form-data; boundary=x"),
+            (b"content-length", str(file_repository.MAX_UPLOAD_BYTES * 2).encode()),
+        ],
+    }
+    await UploadLimitMiddleware(app)(scope, receive, send)
+
+    assert sent[0]["status"] == 413
+
+
+async def test_uploads_within_the_limit_pass_through():
+    called = []
+
+    async def app(scope, receive, send):
+        called.append(scope["path"])
+
+    scope = {
+        "type": "http",
+        "method": "POST",
+        "path": "/users/1/upload-profile",
+        "headers": [(b"content-type", b"multipart/form-data; boundary=x"), (b"content-length", b"1024")],
+    }
+    await UploadLimitMiddleware(app)(scope, None, None)
+
+    assert called == ["/users/1/upload-profile"]
+
+
+async def test_same_bytes_under_different_extensions_are_stored_once(uploads):
+    first = await file_repository.save_file(UploadFile(io.BytesIO(JPEG), filename="me.jpg"))
+    second = await file_repository.save_file(UploadFile(io.BytesIO(JPEG), filename="me.JPEG"))
+
+    assert first == second
+    assert "." not in first
+    assert len(list((uploads / file_repository.OBJECTS_DIR).iterdir())) == 1
+
+
+def test_objects_without_an_extension_are_served_with_their_sniffed_type(uploads):
+    filename = file_repository._store(io.BytesIO(JPEG))
+
+    response = TestClient(main.app).get(f"/media/{filename}")
+
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "image/jpeg"
+    assert response.headers["etag"] == f'"{filename.split("/")[1]}"'